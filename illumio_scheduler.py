@@ -10,7 +10,7 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_FILE = os.path.join(SCRIPT_DIR, "rule_schedules.json")
 CONFIG_FILE = os.path.join(SCRIPT_DIR, "config.json")
 
-from src.core import ConfigManager, ScheduleDB, PCEClient, ScheduleEngine
+from src.core import ConfigManager, ScheduleDB, PCEClient, ScheduleEngine, EventSpool, EVENTS, start_metrics_server
 
 def init_core() -> dict:
     """Initialize core dependencies (Config, DB, PCE, Runtime Engine)"""
@@ -20,7 +20,8 @@ def init_core() -> dict:
     import src.i18n as i18n
     i18n.set_lang(cfg.config.get('lang', 'en'))
 
-    db = ScheduleDB(DB_FILE)
+    db = ScheduleDB(DB_FILE, backend=cfg.config.get('db_backend', 'json'),
+                    compact_threshold=int(cfg.config.get('journal_compact_threshold', 500)))
     pce = PCEClient(cfg)
     engine = ScheduleEngine(db, pce)
     return {'cfg': cfg, 'db': db, 'pce': pce, 'engine': engine}
@@ -55,33 +56,66 @@ if __name__ == "__main__":
     )
     parser.add_argument("--gui", action="store_true", help="Launch the Web GUI mode")
     parser.add_argument("--port", type=int, default=5002, help="Port for the Web GUI (default: 5002)")
+    parser.add_argument("--production", action="store_true", help="With --gui: serve with the pooled multi-threaded WSGI server")
     parser.add_argument("--monitor", action="store_true", help="Run in continuous background daemon mode")
+    parser.add_argument("--event-driven", action="store_true", help="With --monitor: wake at each schedule edge instead of polling")
+    parser.add_argument("--metrics-port", type=int, default=None, help="With --monitor: serve Prometheus metrics on this port (default: config metrics_port, off)")
+    parser.add_argument("--export-db", metavar="FILE", help="Write all schedules to FILE (rule_schedules.json format) and exit")
+    parser.add_argument("--import-db", metavar="FILE", help="Replace all schedules with the contents of FILE (rule_schedules.json format) and exit")
     
     args = parser.parse_args()
     
     core_system = init_core()
     selected_port = resolve_port(args, core_system)
 
-    if args.monitor:
+    if args.export_db or args.import_db:
+        # Backup / move schedules between db_backend stores
+        db = core_system['db']
+        try:
+            if args.export_db:
+                db.export_json(args.export_db)
+                print(f"[*] Exported {len(db.get_all())} schedules to {args.export_db}")
+            if args.import_db:
+                db.import_json(args.import_db)
+                print(f"[*] Imported {len(db.get_all())} schedules from {args.import_db}")
+        except (OSError, ValueError) as e:
+            print(f"[!] {e}")
+            sys.exit(1)
+
+    elif args.monitor:
         print("[*] Service Started (Daemon mode).")
+        # Transitions and check summaries reach a GUI running in another process through this file
+        EVENTS.spool = EventSpool(f"{DB_FILE}.events")
         # 優先順序：config.json → 環境變數 → 預設 300 秒(5 分鐘)
         cfg_interval = core_system['cfg'].config.get('check_interval_seconds')
         interval = int(cfg_interval or os.environ.get("ILLUMIO_CHECK_INTERVAL", "300"))
-        print(f"[*] Check interval: {interval} seconds ({interval // 60} min)")
-        while True:
-            try:
-                core_system['engine'].check(silent=True)
-            except Exception as e:
-                import traceback
-                print(f"[DAEMON ERROR] {e}")
-                traceback.print_exc()
-            time.sleep(interval)
+        monitor_mode = 'event' if args.event_driven else core_system['cfg'].config.get('monitor_mode', 'interval')
+        metrics_port = args.metrics_port if args.metrics_port is not None else int(core_system['cfg'].config.get('metrics_port', 0))
+        if metrics_port:
+            start_metrics_server(metrics_port, core_system['cfg'].config.get('metrics_host', '0.0.0.0'))
+            print(f"[*] Metrics: http://<host>:{metrics_port}/metrics")
+        if monitor_mode == 'event':
+            reconcile = int(core_system['cfg'].config.get('reconcile_interval_seconds', 3600))
+            core_system['engine'].interval = reconcile
+            print(f"[*] Event-driven mode: waking at each schedule edge, reconcile sweep every {reconcile} seconds")
+            core_system['engine'].run_event_driven(reconcile_interval=reconcile)
+        else:
+            print(f"[*] Check interval: {interval} seconds ({interval // 60} min)")
+            core_system['engine'].interval = interval
+            while True:
+                try:
+                    core_system['engine'].check(silent=True)
+                except Exception as e:
+                    import traceback
+                    print(f"[DAEMON ERROR] {e}")
+                    traceback.print_exc()
+                time.sleep(interval)
 
     elif args.gui:
         try:
             from src.gui_ui import launch_gui
             print(f"[*] Starting Web GUI on port {selected_port}")
-            launch_gui(core_system, port=selected_port)
+            launch_gui(core_system, port=selected_port, production=args.production or None)
         except ImportError:
             print("[!] Web GUI requires Flask. Install with:")
             print("      pip install flask")
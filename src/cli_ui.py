@@ -25,6 +25,8 @@ def get_valid_time(prompt):
         except ValueError: 
             print(f"{Colors.RED}[-] {t('sch_time_error')}{Colors.RESET}")
 
+SCHEDULE_PAGE_SIZE = 50
+
 def paginate_and_select(items, format_func, title="", header_str=""):
     PAGE_SIZE = 50
     total = len(items)
@@ -189,19 +191,19 @@ class CLI:
     # Formatters
     # ==========================================
     def format_ruleset_row(self, idx, rs):
-        r_count = len(rs.get('rules', []))
+        r_count = len(rs.rules)
         
         # Format Status (apply color after padding)
-        is_en = rs.get('enabled')
+        is_en = rs.enabled
         st_text = "✔ ON" if is_en else "✖ OFF"
         st_pad = f"{st_text:<8}"
         status = f"{Colors.GREEN}{st_pad}{Colors.RESET}" if is_en else f"{Colors.RED}{st_pad}{Colors.RESET}"
         
-        rid = Colors.id(f"{extract_id(rs['href']):<6}")
-        name = truncate(rs['name'], 40)
+        rid = Colors.id(f"{extract_id(rs.href):<6}")
+        name = truncate(rs.name, 40)
         
         # Format PROV (apply color after padding)
-        ut = rs.get('update_type')
+        ut = rs.update_type
         prov_text = "DRAFT" if ut else "ACTIVE"
         prov_pad = f"{prov_text:<6}"
         prov_state = f"{Colors.YELLOW}{prov_pad}{Colors.RESET}" if ut else f"{Colors.GREEN}{prov_pad}{Colors.RESET}"
@@ -246,9 +248,16 @@ class CLI:
     # Unified Schedule Management (List + Edit + Delete in one view)
     # ==========================================
     def schedule_management_ui(self):
+        cursors = [None]  # cursor of each page visited; the last one is the current page
         while True:
             # Show the grouped list every iteration
-            self._list_grouped()
+            next_cursor, shown, total = self._list_grouped(cursors[-1])
+            if total > shown:
+                first = (len(cursors) - 1) * SCHEDULE_PAGE_SIZE
+                nav = []
+                if next_cursor: nav.append(f"{Colors.CYAN}n{Colors.RESET}={t('next_page')}")
+                if len(cursors) > 1: nav.append(f"{Colors.CYAN}p{Colors.RESET}={t('prev_page')}")
+                print(f"  ({first + 1}-{first + shown} / {total})  " + "  |  ".join(nav))
             
             # Show inline commands
             # Show inline commands
@@ -266,6 +275,10 @@ class CLI:
                     self._browse_and_add()
                 elif ans.lower() == 'r':
                     continue  # will re-render the list
+                elif ans.lower() == 'n' and next_cursor:
+                    cursors.append(next_cursor)
+                elif ans.lower() == 'p' and len(cursors) > 1:
+                    cursors.pop()
                 elif ans.lower().startswith('e '):
                     # Edit: e <ID>
                     edit_id = ans[2:].strip()
@@ -474,14 +487,16 @@ class CLI:
         print(f"\n{Colors.GREEN}[+] {t('sch_saved')} (ID: {extract_id(target_href)}){Colors.RESET}")
 
     # ── List Grouped ──
-    def _list_grouped(self):
-        db_data = self.db.get_all()
-        if not db_data: 
+    def _list_grouped(self, cursor=None, page_size=SCHEDULE_PAGE_SIZE):
+        """Print one page of schedules grouped by ruleset; returns (next_cursor, shown, total)"""
+        rows, total, next_cursor = self.db.query(sort='ruleset', cursor=cursor, limit=page_size)
+        if not rows: 
             print(f"\n{Colors.YELLOW}[-] {t('list_no_schedule')}{Colors.RESET}")
-            return
+            return None, 0, total
         
+        # Rows arrive sorted by ruleset name (ruleset self-schedule first), so groups are contiguous
         groups = {}
-        for href, conf in db_data.items():
+        for href, conf in rows:
             rs_name = conf.get('detail_rs', 'Uncategorized')
             if rs_name not in groups: groups[rs_name] = {'rs_config': None, 'rules': []}
             
@@ -490,13 +505,15 @@ class CLI:
             
             if conf.get('is_ruleset'): groups[rs_name]['rs_config'] = entry_data
             else: groups[rs_name]['rules'].append(entry_data)
+
+        workers = int(self.cfg.config.get('check_concurrency', 8))
+        live = self.pce.get_live_items([h for h, _ in rows], max_workers=workers)
                 
         print("\n" + Colors.BLUE + "━"*145 + Colors.RESET)
         print(f"{t('hdr_sch'):<3} │ {t('hdr_id'):<6} │ {'Type':<6} │ {t('hdr_note'):<25} │ {t('hdr_source'):<12} │ {t('hdr_dest'):<12} │ {t('hdr_service'):<16} │ {t('list_mode'):<10} │ {t('list_timing')}")
         print(Colors.BLUE + "─" * 145 + Colors.RESET)
 
-        for rs_name in sorted(groups.keys()):
-            group = groups[rs_name]
+        for rs_name, group in groups.items():
             rs_entry = group['rs_config']
             
             if rs_entry:
@@ -504,7 +521,7 @@ class CLI:
                 rid = Colors.id(f"{extract_id(h):<6}")
                 mark = f"{Colors.YELLOW}★{Colors.RESET}"
                 
-                live_res = self.pce.get_live_item(h)
+                live_res = live.get(h)
                 if live_res and live_res.status_code == 200:
                     live_name = live_res.json().get('name', c['name'])
                     raw_name = truncate(f"[RS] {live_name}", 25)
@@ -536,7 +553,7 @@ class CLI:
                 rid = Colors.id(f"{extract_id(h):<6}")
                 mark = f"{Colors.CYAN}●{Colors.RESET}"
                 
-                live_res = self.pce.get_live_item(h)
+                live_res = live.get(h)
                 if live_res and live_res.status_code == 200:
                     r_obj = live_res.json()
                     dest_field = r_obj.get('destinations', r_obj.get('consumers', []))
@@ -582,6 +599,7 @@ class CLI:
                 print(f" {mark}  │ {rid} │ {type_str} │ {display_name} │ {src:<12} │ {dst:<12} │ {svc:<16} │ {mode} │ {time_str}")
                 
         print(Colors.BLUE + "━"*145 + Colors.RESET)
+        return next_cursor, len(rows), total
 
     # ── Edit by ID ──
     def _edit_by_id(self, edit_id):
@@ -632,12 +650,15 @@ class CLI:
         if clean_input(input(f"\n  {t('delete_confirm')} ({len(to_delete)} items) ")).lower() != 'y':
             return
         
+        try:
+            results = self.pce.update_rule_notes({href: ("", True) for href, _, _ in to_delete})
+        except Exception:
+            results = {}
+        self.db.delete_many([href for href, _, _ in to_delete])
         for href, conf, k in to_delete:
-            try:
-                self.pce.update_rule_note(href, "", remove=True)
-            except Exception: pass
-            self.db.delete(href)
             print(f"  {Colors.GREEN}[OK] ID {k} {t('delete_done')}{Colors.RESET}")
+            if not results.get(href):
+                print(f"  {Colors.YELLOW}[!] ID {k}: {t('delete_note_failed')}{Colors.RESET}")
 
     # ==========================================
     # Main Menu
@@ -1,16 +1,35 @@
 """
 Illumio Rule Scheduler — Core Engine (Zero External Dependencies)
-All API calls use Python stdlib: urllib.request, http.client, ssl, base64
+All API calls use Python stdlib: http.client (pooled keep-alive), ssl, base64
 """
 import os
 import json
 import datetime
 import re
-import urllib.request
-import urllib.error
+import time
+import threading
+import http.client
+import urllib.parse
 import ssl
 import base64
-from typing import Any, Dict, List, Optional, Tuple, Union
+import heapq
+import bisect
+import tempfile
+import sqlite3
+import codecs
+import contextlib
+import sys
+import queue
+import collections
+import random
+import email.utils
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
 
 # ==========================================
 # 0. Color Engine & Formatters (Shared)
@@ -62,6 +81,157 @@ def truncate(text, width):
 def extract_id(href): 
     return href.split('/')[-1] if href else ""
 
+def parse_expire_at(value):
+    """Parse a one-time expire_at into a naive local datetime. It is the wall-clock time the user
+    entered: a 'Z'/offset suffix (older GUI versions appended ':00Z') is ignored, not converted."""
+    dt = datetime.datetime.fromisoformat(str(value).strip().rstrip("Zz"))
+    return dt.replace(tzinfo=None)
+
+def atomic_write_json(path, data):
+    """Write JSON via temp file + fsync + rename so a crash never leaves a truncated file"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=4, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+    except OSError:
+        pass  # Directory fsync is not supported on Windows
+
+def ruleset_href(href):
+    """Return the draft HREF of the ruleset owning a rule (or of the ruleset itself)"""
+    return "/".join(href.replace("/active/", "/draft/").split("/")[:7])
+
+class FileLock:
+    """Advisory lock on a side file, shared between processes (flock on POSIX, msvcrt on Windows).
+
+    Not thread-safe: callers serialize acquisition (ScheduleDB holds its write lock). Nested
+    acquisition is a no-op. Windows has no shared mode, so shared() is exclusive there."""
+
+    def __init__(self, path: str):
+        self.path: str = path
+        self._fd: Optional[int] = None
+        self._depth: int = 0
+
+    def _acquire(self, shared: bool):
+        if self._depth == 0:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+                else:
+                    while True:
+                        try:
+                            msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                            break
+                        except OSError:
+                            continue  # LK_LOCK gives up after ~10 s; keep waiting
+            except BaseException:
+                os.close(fd)
+                raise
+            self._fd = fd
+        self._depth += 1
+
+    def _release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            fd, self._fd = self._fd, None
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                else:
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            finally:
+                os.close(fd)
+
+    @contextlib.contextmanager
+    def shared(self):
+        self._acquire(True)
+        try:
+            yield
+        finally:
+            self._release()
+
+    @contextlib.contextmanager
+    def exclusive(self):
+        self._acquire(False)
+        try:
+            yield
+        finally:
+            self._release()
+
+class RWLock:
+    """Writer-preferring readers-writer lock. Reads and writes re-enter from a thread that
+    already holds the lock (a writer may also read); a reader must not upgrade to write."""
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers: int = 0
+        self._writer: Optional[int] = None
+        self._write_depth: int = 0
+        self._writers_waiting: int = 0
+        self._local = threading.local()
+
+    @contextlib.contextmanager
+    def read(self):
+        me = threading.get_ident()
+        depth = getattr(self._local, 'reads', 0)
+        if depth or self._writer == me:
+            self._local.reads = depth + 1
+            try:
+                yield
+            finally:
+                self._local.reads = depth
+            return
+        with self._cond:
+            while self._writer is not None or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        self._local.reads = 1
+        try:
+            yield
+        finally:
+            self._local.reads = 0
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextlib.contextmanager
+    def write(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer != me:
+                self._writers_waiting += 1
+                try:
+                    while self._writer is not None or self._readers:
+                        self._cond.wait()
+                finally:
+                    self._writers_waiting -= 1
+                self._writer = me
+            self._write_depth += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._write_depth -= 1
+                if not self._write_depth:
+                    self._writer = None
+                    self._cond.notify_all()
+
 # ==========================================
 # 1. Config Manager
 # ==========================================
@@ -83,7 +253,9 @@ class ConfigManager:
         return False
 
     def save(self, url, org, key, secret, alert_mail=None, ssl_verify=None, smtp_host=None, smtp_port=None, smtp_auth=None):
-        data = {
+        # Keep tuning keys (check_interval_seconds, provision_mode, ...) that the UI does not edit
+        data = dict(self.config)
+        data.update({
             "pce_url": url.rstrip("/"), 
             "org_id": org, 
             "api_key": key, 
@@ -94,7 +266,7 @@ class ConfigManager:
             "smtp_host": smtp_host if smtp_host is not None else self.config.get('smtp_host', ''),
             "smtp_port": smtp_port if smtp_port is not None else self.config.get('smtp_port', ''),
             "smtp_auth": smtp_auth if smtp_auth is not None else self.config.get('smtp_auth', True)
-        }
+        })
         with open(self.config_path, 'w', encoding='utf-8') as f: 
             json.dump(data, f, indent=4)
         self.config = data
@@ -117,58 +289,1166 @@ class ConfigManager:
             return self.load()
         return True
 
+# ==========================================
+# 1b. Event Bus (server push)
+# ==========================================
+class EventSubscription:
+    """One subscriber's bounded queue; `overflowed` is set when events had to be dropped,
+    `closed` when the bus shut down and the stream should end."""
+
+    def __init__(self, max_queue: int):
+        self.queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self.overflowed: bool = False
+        self.closed: bool = False
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Next event, or None when nothing arrived within `timeout`"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBus:
+    """In-process publish/subscribe fan-out for the GUI's Server-Sent Events stream.
+
+    Events are {'id', 'type', 'ts', 'data'}. Every subscriber gets a bounded queue: a slow
+    one loses its oldest events and is flagged to resync instead of blocking publishers.
+    The last `history` events are kept so a reconnecting client can resume by event id."""
+
+    def __init__(self, max_queue: int = 256, history: int = 200):
+        self.max_queue: int = max_queue
+        self._subs: set = set()
+        self._seq: int = 0
+        self._history: collections.deque = collections.deque(maxlen=history)
+        self._closed: bool = False
+        self._lock = threading.Lock()
+        # Set in the --monitor daemon: its events also go to the GUI process through this file
+        self.spool: Optional['EventSpool'] = None
+
+    def publish(self, kind: str, **data) -> Dict[str, Any]:
+        with self._lock:
+            self._seq += 1
+            event = {'id': self._seq, 'type': kind, 'ts': time.time(), 'data': data}
+            self._history.append(event)
+            for sub in self._subs:
+                self._offer(sub, event)
+        if self.spool is not None and kind in self.spool.types:
+            self.spool.append(event)
+        return event
+
+    @staticmethod
+    def _offer(sub: EventSubscription, event: Dict[str, Any]):
+        try:
+            sub.queue.put_nowait(event)
+        except queue.Full:
+            sub.overflowed = True
+            try:
+                sub.queue.get_nowait()
+            except queue.Empty:
+                pass
+            sub.queue.put_nowait(event)
+
+    def subscribe(self, last_id: Optional[int] = None) -> EventSubscription:
+        """New subscription; with `last_id`, events published after it are replayed first
+        (or the subscription starts flagged for resync when they are no longer retained)."""
+        sub = EventSubscription(self.max_queue)
+        with self._lock:
+            sub.closed = self._closed
+            if last_id is not None and last_id < self._seq:
+                missed = [e for e in self._history if e['id'] > last_id]
+                if not missed or missed[0]['id'] != last_id + 1:
+                    sub.overflowed = True
+                for event in missed:
+                    self._offer(sub, event)
+            self._subs.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: EventSubscription):
+        with self._lock:
+            self._subs.discard(sub)
+
+    def close(self):
+        """Mark every subscription closed and wake its reader (server shutdown)"""
+        with self._lock:
+            self._closed = True
+            for sub in self._subs:
+                sub.closed = True
+                self._offer(sub, None)
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subs)
+
+
+class EventSpool:
+    """Carries events between processes through an append-only JSON-lines file next to the
+    schedule DB: the --monitor daemon appends its `transition`/`check` events, the GUI process
+    tails the file and republishes them on its own bus. The file restarts empty past MAX_BYTES.
+    (Schedule changes need no spool: every process sees them by watching the DB, ScheduleDB.watch.)"""
+
+    MAX_BYTES = 1 << 20
+
+    def __init__(self, path: str, types: Tuple[str, ...] = ('transition', 'check')):
+        self.path: str = path
+        self.types: Tuple[str, ...] = types
+        self._lock = threading.Lock()
+
+    def append(self, event: Dict[str, Any]):
+        line = json.dumps({'pid': os.getpid(), 'type': event['type'], 'data': event['data']},
+                          ensure_ascii=False, default=str).encode('utf-8') + b'\n'
+        with self._lock:
+            try:
+                with open(self.path, 'ab') as f:
+                    if f.tell() > self.MAX_BYTES:
+                        f.truncate(0)
+                    f.write(line)
+            except OSError as e:
+                print(f"[EVENT SPOOL ERROR] {e}")
+
+    def follow(self, bus: 'EventBus', interval: float = 0.5) -> threading.Thread:
+        """Republish on `bus` what other processes append from now on (daemon thread)"""
+        def run():
+            offset = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+            pending = b''
+            while True:
+                time.sleep(interval)
+                try:
+                    size = os.path.getsize(self.path)
+                    if size < offset:  # Restarted by the writer
+                        offset, pending = 0, b''
+                    if size == offset:
+                        continue
+                    with open(self.path, 'rb') as f:
+                        f.seek(offset)
+                        chunk = f.read(size - offset)
+                except OSError:
+                    continue
+                offset += len(chunk)
+                *lines, pending = (pending + chunk).split(b'\n')
+                for line in lines:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        continue
+                    if event.get('pid') != os.getpid() and event.get('type') in self.types:
+                        bus.publish(event['type'], **event.get('data', {}))
+
+        thread = threading.Thread(target=run, name="event-spool", daemon=True)
+        thread.start()
+        return thread
+
+
+# Process-wide bus: ScheduleDB, PCEClient and ScheduleEngine publish, the GUI streams it
+EVENTS = EventBus()
+
+# ==========================================
+# 1c. Metrics (Prometheus text exposition, stdlib only)
+# ==========================================
+def _metric_labels(labels: Dict[str, Any]) -> str:
+    parts = []
+    for k, v in labels.items():
+        v = str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{k}="{v}"')
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _metric_value(v) -> str:
+    if v == float('inf'):
+        return '+Inf'
+    return str(int(v)) if isinstance(v, (int, bool)) or float(v).is_integer() else repr(float(v))
+
+
+class Metric:
+    """One metric family; samples are keyed by the tuple of label values in `labelnames` order."""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self.name: str = name
+        self.help: str = help_text
+        self.labelnames: Tuple[str, ...] = tuple(labelnames)
+        self._values: Dict[tuple, Any] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> tuple:
+        return tuple(str(labels.get(n, '')) for n in self.labelnames)
+
+    def samples(self) -> List[Tuple[str, Dict[str, Any], Any]]:
+        with self._lock:
+            return [(self.name, dict(zip(self.labelnames, k)), v) for k, v in sorted(self._values.items())]
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    """Cumulative buckets plus _sum/_count, as Prometheus expects"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)):
+        super().__init__(name, help_text, labelnames)
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [[0] * len(self.buckets), 0.0]
+            counts[0][bisect.bisect_left(self.buckets, value)] += 1
+            counts[1] += value
+
+    def samples(self):
+        out = []
+        for name, labels, (counts, total) in super().samples():
+            running = 0
+            for bound, n in zip(self.buckets, counts):
+                running += n
+                out.append((f"{name}_bucket", dict(labels, le=_metric_value(bound)), running))
+            out.append((f"{name}_sum", labels, total))
+            out.append((f"{name}_count", labels, running))
+        return out
+
+
+class MetricsRegistry:
+    """Process-wide metric families plus collectors that read live state at scrape time.
+
+    counter()/gauge()/histogram() return the existing family when the name is already registered;
+    modules create theirs once at import time next to the code that records. A collector is registered under a
+    key (a newer one replaces it) and returns [(name, kind, help, [(labels, value), ...]), ...]."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _family(self, cls, name, help_text, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, labelnames, **kwargs)
+            return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._family(Counter, name, help_text, labelnames)
+
+    def gauge(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self._family(Gauge, name, help_text, labelnames)
+
+    def histogram(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Optional[Tuple[float, ...]] = None) -> Histogram:
+        return self._family(Histogram, name, help_text, labelnames, **({'buckets': buckets} if buckets else {}))
+
+    def collector(self, key: str, fn):
+        with self._lock:
+            self._collectors[key] = fn
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+            collectors = list(self._collectors.items())
+        families = [(m.name, m.kind, m.help, [(n, l, v) for n, l, v in m.samples()]) for m in metrics]
+        for key, fn in collectors:
+            try:
+                for name, kind, help_text, samples in fn():
+                    families.append((name, kind, help_text, [(name, l, v) for l, v in samples]))
+            except Exception as e:
+                print(f"[METRICS ERROR] {key}: {e}")
+        lines = []
+        for name, kind, help_text, samples in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample, labels, value in samples:
+                lines.append(f"{sample}{_metric_labels(labels)} {_metric_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+# Process-wide registry: rendered by the GUI's /metrics route and the --monitor metrics listener
+METRICS = MetricsRegistry()
+METRICS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def metric_endpoint(endpoint: str) -> str:
+    """API path reduced to its resource structure, to keep label cardinality bounded.
+
+    PCE paths alternate /<collection>/<object>: collection nouns are kept and every object
+    segment becomes ':id' (numeric, UUID or any other token, e.g. job and datafile IDs), except
+    that a sec_policy version keeps draft/active and any other becomes ':version'.
+    The query string is dropped; a segment that is not a plain noun becomes ':other'."""
+    path = re.sub(r'^/api/v\d+', '', endpoint.split('?', 1)[0])
+    out = []
+    for i, seg in enumerate(path.strip('/').split('/')):
+        if i % 2 == 0:
+            out.append(seg if re.fullmatch(r'[a-z_]+', seg) else ':other')
+        elif out[-1] == 'sec_policy':
+            out.append(seg if seg in ('draft', 'active') else ':version')
+        else:
+            out.append(':id')
+    return '/' + '/'.join(out)
+
+
+def start_metrics_server(port: int, host: str = '0.0.0.0'):
+    """Serve METRICS at http://host:port/metrics on a daemon thread; returns the server"""
+    import http.server
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = METRICS.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', METRICS_CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
 # ==========================================
 # 2. Schedule Database
 # ==========================================
+class ScheduleIndex:
+    """Precompiled evaluation table for all schedules.
+
+    Recurring schedules become a weekday bitmask plus start/end minute-of-day; slots sharing
+    the same (start, end) pair are grouped into per-weekday big-int bitsets, so evaluating
+    every schedule at time T is a few bitwise ORs. One-time expiries are kept as sorted epochs.
+    """
+
+    def __init__(self):
+        self._slot: Dict[str, int] = {}
+        self._hrefs: List[Optional[str]] = []
+        self._free: List[int] = []
+        self._records: Dict[str, tuple] = {}
+        self._groups: Dict[Tuple[int, int], List[int]] = {}
+        self._recurring: int = 0
+        self._block: int = 0
+        self._one_time: int = 0
+        self._expiry: List[Tuple[float, str]] = []
+        self.invalid: set = set()
+
+    @staticmethod
+    def compile(c: Dict[str, Any]) -> Optional[tuple]:
+        """('r', day_mask, start_min, end_min, is_allow) | ('o', expire_epoch) | None if malformed"""
+        try:
+            if c.get('type') == 'recurring':
+                mask = 0
+                for d in c['days']:
+                    name = ScheduleEngine.normalize_day(d)
+                    if name in ScheduleEngine.WEEKDAYS:
+                        mask |= 1 << ScheduleEngine.WEEKDAYS.index(name)
+                sh, sm = (int(x) for x in c['start'].split(':'))
+                eh, em = (int(x) for x in c['end'].split(':'))
+                return ('r', mask, sh * 60 + sm, eh * 60 + em, c.get('action', 'allow') == 'allow')
+            if c.get('type') == 'one_time':
+                return ('o', parse_expire_at(c['expire_at']).timestamp())
+        except (KeyError, ValueError, TypeError, AttributeError):
+            pass
+        return None
+
+    def rebuild(self, db_data: Dict[str, Any]):
+        self.__init__()
+        for href, c in db_data.items():
+            self.update(href, c)
+
+    def update(self, href: str, c: Dict[str, Any]):
+        self.remove(href)
+        rec = self.compile(c)
+        if rec is None:
+            self.invalid.add(href)
+            return
+        if self._free:
+            slot = self._free.pop()
+            self._hrefs[slot] = href
+        else:
+            slot = len(self._hrefs)
+            self._hrefs.append(href)
+        self._slot[href] = slot
+        self._records[href] = rec
+        bit = 1 << slot
+        if rec[0] == 'r':
+            _, mask, start, end, is_allow = rec
+            by_day = self._groups.setdefault((start, end), [0] * 7)
+            for d in range(7):
+                if mask >> d & 1:
+                    by_day[d] |= bit
+            self._recurring |= bit
+            if not is_allow:
+                self._block |= bit
+        else:
+            self._one_time |= bit
+            bisect.insort(self._expiry, (rec[1], href))
+
+    def remove(self, href: str):
+        self.invalid.discard(href)
+        rec = self._records.pop(href, None)
+        if rec is None:
+            return
+        slot = self._slot.pop(href)
+        self._hrefs[slot] = None
+        self._free.append(slot)
+        clear = ~(1 << slot)
+        if rec[0] == 'r':
+            key = (rec[2], rec[3])
+            by_day = [b & clear for b in self._groups[key]]
+            if any(by_day):
+                self._groups[key] = by_day
+            else:
+                del self._groups[key]
+            self._recurring &= clear
+            self._block &= clear
+        else:
+            self._one_time &= clear
+            i = bisect.bisect_left(self._expiry, (rec[1], href))
+            if i < len(self._expiry) and self._expiry[i] == (rec[1], href):
+                del self._expiry[i]
+
+    def expiring_before(self, epoch: float) -> List[str]:
+        """HREFs of one-time schedules whose expiry epoch is earlier than `epoch`"""
+        cut = bisect.bisect_left(self._expiry, (epoch, ''))
+        return [h for _, h in self._expiry[:cut]]
+
+    def in_window_bits(self, now: datetime.datetime) -> int:
+        """Bitset of recurring slots whose window contains `now` (minute precision)"""
+        wd = now.weekday()
+        prev = (wd - 1) % 7
+        mod = now.hour * 60 + now.minute
+        bits = 0
+        for (start, end), by_day in self._groups.items():
+            if start <= end:
+                if start <= mod < end:
+                    bits |= by_day[wd]
+            else:
+                if mod >= start:
+                    bits |= by_day[wd]
+                if mod < end:
+                    bits |= by_day[prev]
+        return bits
+
+    def _hrefs_of(self, bits: int) -> List[str]:
+        out = []
+        while bits:
+            low = bits & -bits
+            out.append(self._hrefs[low.bit_length() - 1])
+            bits ^= low
+        return out
+
+    def filter_bits(self, schedule_type: Optional[str] = None, action: Optional[str] = None,
+                    day: Optional[str] = None, in_window: Optional[bool] = None,
+                    now: Optional[datetime.datetime] = None) -> Optional[int]:
+        """Bitset of slots passing every given filter, None when no filter is given.
+        Raises ValueError for an unknown type, action or day."""
+        bits = None
+        def narrow(b):
+            nonlocal bits
+            bits = b if bits is None else bits & b
+        if schedule_type:
+            if schedule_type not in ('recurring', 'one_time'):
+                raise ValueError(f"unknown type: {schedule_type}")
+            narrow(self._recurring if schedule_type == 'recurring' else self._one_time)
+        if action:
+            act = action.lower()
+            if act in ('allow', 'enable'):
+                narrow(self._recurring & ~self._block)
+            elif act in ('block', 'disable'):
+                narrow(self._block)
+            elif act == 'expire':
+                narrow(self._one_time)
+            else:
+                raise ValueError(f"unknown action: {action}")
+        if day:
+            name = ScheduleEngine.normalize_day(day)
+            if name not in ScheduleEngine.WEEKDAYS:
+                raise ValueError(f"unknown day: {day}")
+            d = ScheduleEngine.WEEKDAYS.index(name)
+            day_bits = 0
+            for by_day in self._groups.values():
+                day_bits |= by_day[d]
+            narrow(day_bits)
+        if in_window is not None:
+            window = self.in_window_bits(now or datetime.datetime.now())
+            narrow(window if in_window else (self._recurring | self._one_time) & ~window)
+        return bits
+
+    def has(self, bits: int, href: str) -> bool:
+        slot = self._slot.get(href)
+        return slot is not None and bool(bits >> slot & 1)
+
+    @staticmethod
+    def count(bits: int) -> int:
+        return bin(bits).count('1')
+
+    def in_window(self, now: datetime.datetime) -> List[str]:
+        """HREFs of recurring schedules whose time window contains `now`"""
+        return self._hrefs_of(self.in_window_bits(now))
+
+    def evaluate(self, now: datetime.datetime) -> Tuple[Dict[str, bool], List[str]]:
+        """Return ({href: target_enabled} for live schedules, [expired one-time HREFs])"""
+        expired = self.expiring_before(now.timestamp())
+        expired_bits = 0
+        for h in expired:
+            expired_bits |= 1 << self._slot[h]
+        # allow: target = in window; block: target = not in window
+        enabled_bits = ((self.in_window_bits(now) ^ self._block) & self._recurring) | (self._one_time & ~expired_bits)
+        live_bits = (self._recurring | self._one_time) & ~expired_bits
+        targets = dict.fromkeys(self._hrefs_of(live_bits), False)
+        for h in self._hrefs_of(enabled_bits):
+            targets[h] = True
+        return targets, expired
+
+class JSONStorage:
+    """Storage backend that rewrites the whole rule_schedules.json atomically on every change.
+
+    changed() compares the (inode, mtime, size) of the store files with what this process
+    last loaded or wrote, so writes by another process are noticed with one stat() each."""
+
+    def __init__(self, path: str):
+        self.path: str = path
+        self._seen: Optional[tuple] = None
+
+    def _watched(self):
+        return (self.path,)
+
+    def _signature(self):
+        sig = []
+        for path in self._watched():
+            try:
+                st = os.stat(path)
+                sig.append((st.st_ino, st.st_mtime_ns, st.st_size))
+            except OSError:
+                sig.append(None)
+        return tuple(sig)
+
+    def _mark(self):
+        self._seen = self._signature()
+
+    def _read_snapshot(self) -> Dict[str, Any]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def load(self) -> Dict[str, Any]:
+        self._mark()  # Before reading: a write racing the read shows up as a change
+        return self._read_snapshot()
+
+    def write_put(self, db, href, data):
+        atomic_write_json(self.path, db)
+        self._mark()
+
+    def write_delete(self, db, hrefs):
+        atomic_write_json(self.path, db)
+        self._mark()
+
+    def snapshot(self, db):
+        atomic_write_json(self.path, db)
+        self._mark()
+
+    def changed(self) -> bool:
+        return self._signature() != self._seen
+
+
+class JournalStorage(JSONStorage):
+    """Write-ahead journal backend: each change is one appended JSON line in <db>.journal,
+    compacted in the background into the JSON snapshot (temp file + fsync + rename).
+    The snapshot keeps the rule_schedules.json format, so it stays usable for import/export."""
+
+    def __init__(self, path: str, compact_threshold: int = 500):
+        super().__init__(path)
+        self.journal_path: str = f"{path}.journal"
+        self.compacting_path: str = f"{path}.journal.compacting"
+        self.compact_threshold: int = compact_threshold
+        self._records: int = 0
+        self._lock = threading.Lock()
+        self._compactor: Optional[threading.Thread] = None
+
+    def _watched(self):
+        return (self.path, self.compacting_path, self.journal_path)
+
+    @staticmethod
+    def _read_records(path, repair=False):
+        records = []
+        if not os.path.exists(path):
+            return records
+        good_end = 0
+        with open(path, 'rb') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line.decode('utf-8')))
+                except (UnicodeDecodeError, json.JSONDecodeError):
+                    break  # Torn tail from a crash mid-append; later lines cannot exist
+                good_end += len(line)
+        if repair and good_end < os.path.getsize(path):
+            # Drop the torn record so new appends do not land on the same line
+            with open(path, 'r+b') as f:
+                f.truncate(good_end)
+        return records
+
+    @staticmethod
+    def _replay(records, db):
+        for rec in records:
+            if rec.get('op') == 'put':
+                db[rec['href']] = rec['data']
+            elif rec.get('op') == 'delete':
+                for h in rec.get('hrefs', []):
+                    db.pop(h, None)
+
+    def load(self) -> Dict[str, Any]:
+        self.wait_for_compaction()
+        self._mark()
+        # The rotated journal is read before the snapshot: another process's compactor may fold it
+        # into the snapshot and delete it meanwhile. Replaying it over the newer snapshot is idempotent
+        # (also after a compaction interrupted before cleanup).
+        rotated = self._read_records(self.compacting_path)
+        db = self._read_snapshot()
+        self._replay(rotated, db)
+        records = self._read_records(self.journal_path, repair=True)
+        self._replay(records, db)
+        self._records = len(records)
+        return db
+
+    def _append(self, rec, db):
+        line = json.dumps(rec, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._records += 1
+            if self._records >= self.compact_threshold and self._compactor is None:
+                self._start_compaction(dict(db))
+            self._mark()
+
+    def write_put(self, db, href, data):
+        self._append({"op": "put", "href": href, "data": data}, db)
+
+    def write_delete(self, db, hrefs):
+        self._append({"op": "delete", "hrefs": list(hrefs)}, db)
+
+    def _start_compaction(self, state):
+        """Rotate the journal aside and fold it into the snapshot on a background thread (lock held)"""
+        if os.path.exists(self.compacting_path):
+            return  # Leftover from a crash: folded in by the next load()/snapshot()
+        if os.path.exists(self.journal_path):
+            os.replace(self.journal_path, self.compacting_path)
+        self._records = 0
+
+        def run():
+            try:
+                untouched = self._signature()[0] == self._seen[0]
+                atomic_write_json(self.path, state)
+                if os.path.exists(self.compacting_path):
+                    os.unlink(self.compacting_path)
+                if untouched:
+                    # Our own fold-in is not a change by another process; the journal stays as seen
+                    with self._lock:
+                        self._seen = self._signature()[:2] + self._seen[2:]
+            except Exception as e:
+                print(f"[DB Compaction Error] {e}")
+            finally:
+                with self._lock:
+                    self._compactor = None
+
+        self._compactor = threading.Thread(target=run, name="schedule-db-compactor", daemon=True)
+        self._compactor.start()
+
+    def wait_for_compaction(self):
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+
+    def snapshot(self, db):
+        """Synchronous full compaction"""
+        self.wait_for_compaction()
+        with self._lock:
+            atomic_write_json(self.path, db)
+            for path in (self.compacting_path, self.journal_path):
+                if os.path.exists(path):
+                    os.unlink(path)
+            self._records = 0
+            self._mark()
+
+
+class SQLiteStorage:
+    """SQLite backend (rule_schedules.db) in WAL mode, one row per schedule keyed by href.
+    On first open it migrates the existing rule_schedules.json once.
+
+    Storage only: like the other backends it is loaded whole into ScheduleDB, whose in-memory
+    index answers every query, so rows carry just the href and the schedule JSON."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS schedules (
+            href  TEXT PRIMARY KEY,
+            data  TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+    """
+
+    def __init__(self, json_path: str):
+        self.json_path: str = json_path
+        self.path: str = f"{os.path.splitext(json_path)[0]}.db"
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        self._data_version = None
+        self._drop_query_columns()
+        if self._meta('migrated_from_json') is None:
+            self.migrate_from_json(self.json_path)
+
+    def _drop_query_columns(self):
+        """Rebuild a table created with the former per-column copies (ruleset_href, type, ...)
+        as (href, data), keeping the row order"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                columns = [r[1] for r in self._conn.execute("PRAGMA table_info(schedules)")]
+                if columns != ['href', 'data']:
+                    self._conn.execute("CREATE TABLE schedules_new (href TEXT PRIMARY KEY, data TEXT NOT NULL)")
+                    self._conn.execute("INSERT INTO schedules_new (href, data) SELECT href, data FROM schedules ORDER BY rowid")
+                    self._conn.execute("DROP TABLE schedules")
+                    self._conn.execute("ALTER TABLE schedules_new RENAME TO schedules")
+                    self._conn.execute("DELETE FROM meta WHERE key = 'expire_at_wall_clock'")
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _meta(self, key):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _upsert(self, items):
+        self._conn.executemany("INSERT OR REPLACE INTO schedules (href, data) VALUES (?, ?)",
+                               [(h, json.dumps(d, ensure_ascii=False)) for h, d in items])
+
+    def migrate_from_json(self, json_path):
+        """One-shot import of a rule_schedules.json file; returns the number of schedules imported"""
+        data = JSONStorage(json_path).load()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._upsert(data.items())
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated_from_json', ?)",
+                                   (datetime.datetime.now().isoformat(timespec='seconds'),))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        if data:
+            print(f"[DB] Migrated {len(data)} schedules from {os.path.basename(json_path)} to {os.path.basename(self.path)}")
+        return len(data)
+
+    def load(self) -> Dict[str, Any]:
+        with self._lock:
+            self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            rows = self._conn.execute("SELECT href, data FROM schedules ORDER BY rowid").fetchall()
+        return {href: json.loads(data) for href, data in rows}
+
+    def changed(self) -> bool:
+        """True when another connection (e.g. the GUI or daemon process) committed since load()"""
+        with self._lock:
+            return self._conn.execute("PRAGMA data_version").fetchone()[0] != self._data_version
+
+    def write_put(self, db, href, data):
+        with self._lock:
+            self._upsert([(href, data)])
+
+    def write_delete(self, db, hrefs):
+        hrefs = list(hrefs)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for i in range(0, len(hrefs), 500):
+                    chunk = hrefs[i:i + 500]
+                    self._conn.execute(f"DELETE FROM schedules WHERE href IN ({','.join('?' * len(chunk))})", chunk)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def snapshot(self, db):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM schedules")
+                self._upsert(db.items())
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+
 class ScheduleDB:
-    """Manages the local JSON-based storage for configured rule schedules."""
+    """Manages the local storage for configured rule schedules (JSON file, write-ahead journal or SQLite).
+
+    `db` is copy-on-write: writers swap in a new dict, so get_all()/get() never lock and a caller
+    may iterate what it got while others write. Index-backed reads share an RWLock with writers.
+    Writes also hold an advisory lock on <db>.lock and first reload what another process (GUI,
+    CLI or --monitor daemon) wrote, so neither overwrites the other's changes."""
     
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, backend: str = 'json', compact_threshold: int = 500):
         self.db_path: str = db_path
         self.db: Dict[str, Any] = {}
+        self.index: ScheduleIndex = ScheduleIndex()
+        # draft ruleset HREF -> HREFs of its scheduled rules (ruleset self-schedules excluded)
+        self.children: Dict[str, set] = {}
+        # numeric ruleset ID -> HREFs of the schedules on that ruleset and its rules
+        self._by_rs_id: Dict[str, set] = {}
+        # sort name -> sorted key tuples (last element is the HREF), built on first query
+        self._orders: Dict[str, List[tuple]] = {}
+        # (sort, filters) -> sorted keys of the matching schedules; cleared on every write
+        self._views: collections.OrderedDict = collections.OrderedDict()
+        self._loaded: bool = False
+        self._rw = RWLock()
+        self._file_lock = FileLock(f"{db_path}.lock")
+        if backend == 'journal':
+            self.storage = JournalStorage(db_path, compact_threshold=compact_threshold)
+        elif backend == 'sqlite':
+            self.storage = SQLiteStorage(db_path)
+        else:
+            self.storage = JSONStorage(db_path)
+        METRICS.collector('schedules', self._metrics)
+
+    def _metrics(self):
+        counts = collections.Counter((c.get('type', ''), c.get('action', '')) for c in self.get_all().values())
+        return [('illumio_schedules', 'gauge', 'Configured schedules by type and action',
+                 [({'type': t, 'action': a}, n) for (t, a), n in sorted(counts.items())])]
 
     def load(self) -> Dict[str, Any]:
-        if os.path.exists(self.db_path):
-            try:
-                with open(self.db_path, 'r', encoding='utf-8') as f: 
-                    self.db = json.load(f)
-            except Exception: 
-                self.db = {}
-        else:
-            self.db = {}
+        with self._rw.write(), self._file_lock.shared():
+            self._load_locked()
         return self.db
 
+    def _load_locked(self):
+        db = self.storage.load()
+        self._rebuild_indexes(db)
+        self.db = db
+        self._loaded = True
+
+    def _refresh(self):
+        """Current snapshot; (re)loads first when never loaded or another process changed the store"""
+        if self._loaded and not self.storage.changed():
+            return self.db
+        with self._rw.write():
+            if not self._loaded or self.storage.changed():
+                reload, old = self._loaded, self.db
+                with self._file_lock.shared():
+                    self._load_locked()
+                if reload:
+                    self._publish_changes(old, self.db)
+        return self.db
+
+    @contextlib.contextmanager
+    def _writing(self):
+        """Exclusive in-process and cross-process write section on an up-to-date state"""
+        with self._rw.write(), self._file_lock.exclusive():
+            if not self._loaded or self.storage.changed():
+                reload, old = self._loaded, self.db
+                self._load_locked()
+                if reload:
+                    self._publish_changes(old, self.db)
+            yield
+
+    # Beyond this many changed schedules one 'reload' event replaces the per-entry events
+    CHANGE_EVENT_LIMIT = 500
+
+    @classmethod
+    def _publish_changes(cls, old, new):
+        """Announce a reload as put (with the new entries) and delete events, so subscribers
+        patch what changed instead of refetching everything"""
+        changed = {h: c for h, c in new.items() if old.get(h) != c}
+        removed = [h for h in old if h not in new]
+        if len(changed) + len(removed) > cls.CHANGE_EVENT_LIMIT:
+            EVENTS.publish('schedules', op='reload', hrefs=[])
+            return
+        if changed:
+            EVENTS.publish('schedules', op='put', hrefs=list(changed), entries=changed)
+        if removed:
+            EVENTS.publish('schedules', op='delete', hrefs=removed)
+
+    def watch(self, interval: float = 1.0) -> threading.Thread:
+        """Check for changes by other processes every `interval` seconds on a daemon thread, so
+        their put/delete events reach this process's subscribers even when nothing reads the DB"""
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self._refresh()
+                except Exception as e:
+                    print(f"[DB WATCH ERROR] {e}")
+
+        thread = threading.Thread(target=run, name="db-watch", daemon=True)
+        thread.start()
+        return thread
+
+    def _rebuild_indexes(self, db):
+        self.index.rebuild(db)
+        self._orders = {}
+        self._views.clear()
+        self.children = {}
+        self._by_rs_id = {}
+        for href in db:
+            self._link_child(href)
+
+    def _link_child(self, href):
+        rs = ruleset_href(href)
+        self._by_rs_id.setdefault(extract_id(rs), set()).add(href)
+        if rs != href.replace("/active/", "/draft/"):
+            self.children.setdefault(rs, set()).add(href)
+
+    def _unlink_child(self, href):
+        rs = ruleset_href(href)
+        same_id = self._by_rs_id.get(extract_id(rs))
+        if same_id is not None:
+            same_id.discard(href)
+            if not same_id:
+                del self._by_rs_id[extract_id(rs)]
+        kids = self.children.get(rs)
+        if kids is not None:
+            kids.discard(href)
+            if not kids:
+                del self.children[rs]
+
     def save(self):
-        with open(self.db_path, 'w', encoding='utf-8') as f: 
-            json.dump(self.db, f, indent=4, ensure_ascii=False)
+        with self._rw.write(), self._file_lock.exclusive():
+            self.storage.snapshot(self.db)
 
     def get_all(self):
-        if not self.db:
-            self.load()
-        return self.db
+        """All schedules {href: data}; treat as read-only (writers replace it, never edit it)"""
+        return self._refresh()
 
     def get(self, href):
         return self.get_all().get(href)
 
     def put(self, href, data):
-        self.get_all()[href] = data
-        self.save()
+        with self._writing():
+            db = dict(self.db)
+            if href in db:
+                self._unorder(href, db[href])
+            db[href] = data
+            self.index.update(href, data)
+            self._link_child(href)
+            for sort, order in self._orders.items():
+                bisect.insort(order, self._sort_key(sort, href, data))
+            self._views.clear()
+            self.db = db
+            self.storage.write_put(db, href, data)
+        EVENTS.publish('schedules', op='put', hrefs=[href], entries={href: data})
 
     def delete(self, href):
-        db = self.get_all()
-        if href in db:
-            del db[href]
-            self.save()
-            return True
-        return False
+        return self.delete_many([href]) == 1
+
+    def delete_many(self, hrefs):
+        """Remove several schedules with a single storage write; returns how many existed"""
+        with self._writing():
+            removed = [h for h in dict.fromkeys(hrefs) if h in self.db]
+            if not removed:
+                return 0
+            db = dict(self.db)
+            for h in removed:
+                self._unorder(h, db[h])
+                del db[h]
+                self.index.remove(h)
+                self._unlink_child(h)
+            self._views.clear()
+            self.db = db
+            self.storage.write_delete(db, removed)
+        EVENTS.publish('schedules', op='delete', hrefs=removed)
+        return len(removed)
+
+    def _by_ruleset(self, rs_href):
+        """All schedules on a ruleset or its rules: {href: data}; caller holds the read or write lock"""
+        db = self.db
+        target = ruleset_href(rs_href)
+        hrefs = [h for h in (rs_href, target, target.replace("/draft/", "/active/")) if h in db]
+        hrefs.extend(self.children.get(target, ()))
+        return {h: db[h] for h in dict.fromkeys(hrefs)}
+
+    def evaluate(self, now: datetime.datetime):
+        """ScheduleIndex.evaluate() on the current state, with the schedules it was computed from:
+        ({href: data}, {href: target_enabled}, [expired hrefs]) all from one consistent snapshot"""
+        self._refresh()
+        with self._rw.read():
+            return self.db, *self.index.evaluate(now)
+
+    SORTS = ('ruleset', 'name', 'type', 'expire_at', 'href')
+
+    def _sort_key(self, sort, href, c):
+        if sort == 'ruleset':
+            return (str(c.get('detail_rs', '')).lower(), 0 if c.get('is_ruleset') else 1, href)
+        if sort == 'name':
+            return (str(c.get('detail_name', c.get('name', ''))).lower(), href)
+        if sort == 'type':
+            return (str(c.get('type', '')), href)
+        if sort == 'expire_at':
+            rec = self.index._records.get(href)
+            return (rec[1] if rec and rec[0] == 'o' else float('inf'), href)
+        return (href,)
+
+    def _order(self, sort):
+        order = self._orders.get(sort)
+        if order is None:
+            order = sorted(self._sort_key(sort, h, c) for h, c in self.db.items())
+            self._orders[sort] = order
+        return order
+
+    def _unorder(self, href, old):
+        for sort, order in self._orders.items():
+            key = self._sort_key(sort, href, old)
+            i = bisect.bisect_left(order, key)
+            if i < len(order) and order[i] == key:
+                del order[i]
+            else:
+                # The stored dict was edited in place before put(): find the entry by HREF
+                order[:] = [k for k in order if k[-1] != href]
+
+    def _ruleset_members(self, ruleset):
+        """HREFs of the schedules on a ruleset (given as HREF or numeric ID) and its rules"""
+        if '/' in str(ruleset):
+            return set(self._by_ruleset(ruleset))
+        return set(self._by_rs_id.get(str(ruleset), ()))
+
+    VIEWS_KEPT = 32
+
+    def _view(self, sort, bits, ruleset, expiring):
+        """Sorted keys of the schedules passing the filters, built once per write generation"""
+        key = (sort, bits, str(ruleset) if ruleset else None, expiring)
+        view = self._views.get(key)
+        if view is not None:
+            return view
+        hrefs = None
+        if ruleset:
+            hrefs = self._ruleset_members(ruleset)
+        if expiring is not None:
+            soon = self.index.expiring_before(expiring)
+            hrefs = set(soon) if hrefs is None else hrefs.intersection(soon)
+        if hrefs is None:
+            hrefs = self.index._hrefs_of(bits)
+        elif bits is not None:
+            hrefs = [h for h in hrefs if self.index.has(bits, h)]
+        db = self.db
+        view = sorted(self._sort_key(sort, h, db[h]) for h in hrefs if h in db)
+        self._views[key] = view
+        while len(self._views) > self.VIEWS_KEPT:
+            try:
+                self._views.popitem(last=False)
+            except KeyError:
+                break
+        return view
+
+    @staticmethod
+    def _encode_cursor(sort, descending, key):
+        raw = json.dumps([sort, descending, list(key)]).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii')
+
+    @staticmethod
+    def _decode_cursor(cursor, sort, descending):
+        try:
+            c_sort, c_desc, key = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        except (ValueError, TypeError):
+            raise ValueError("malformed cursor") from None
+        if c_sort != sort or bool(c_desc) != bool(descending):
+            raise ValueError("cursor belongs to a different sort order")
+        return tuple(key)
+
+    def query(self, ruleset=None, schedule_type=None, action=None, day=None, in_window=None,
+              expiring_before=None, sort='ruleset', descending=False, cursor=None, limit=50, now=None):
+        """One page of schedules: ([(href, data)], total, next_cursor).
+
+        Without filters the page is cut from the pre-sorted view of every schedule. Filters are
+        intersected first (type/action/day/in_window as index bitsets, ruleset and expiring_before
+        as HREF sets) and the m matches are sorted once, O(m log m); that view is kept until the
+        next write, so each further page costs a bisect plus O(page). next_cursor is None on the
+        last page. Every backend is paged this way: the store is held in memory (`db`) whichever
+        backend persists it. Raises ValueError for unknown filter values, sorts or cursors."""
+        self._refresh()
+        with self._rw.read():
+            if sort not in self.SORTS:
+                raise ValueError(f"unknown sort: {sort}")
+            limit = max(1, int(limit))
+            db = self.db
+            bits = self.index.filter_bits(schedule_type, action, day, in_window, now)
+            expiring = None
+            if expiring_before:
+                when = expiring_before if isinstance(expiring_before, datetime.datetime) else parse_expire_at(expiring_before)
+                expiring = when.timestamp()
+
+            if bits is None and not ruleset and expiring is None:
+                order = self._order(sort)
+            else:
+                order = self._view(sort, bits, ruleset, expiring)
+            total = len(order)
+
+            after = self._decode_cursor(cursor, sort, descending) if cursor else None
+            if descending:
+                i = bisect.bisect_left(order, after) - 1 if after else len(order) - 1
+                positions = range(i, -1, -1)
+            else:
+                positions = range(bisect.bisect_right(order, after) if after else 0, len(order))
+
+            page, last = [], None
+            for i in positions:
+                href = order[i][-1]
+                if len(page) == limit:
+                    return page, total, self._encode_cursor(sort, descending, last)
+                page.append((href, db[href]))
+                last = order[i]
+            return page, total, None
+
+    def export_json(self, path):
+        """Write all schedules in the rule_schedules.json format"""
+        atomic_write_json(path, self.get_all())
+
+    def import_json(self, path):
+        """Replace all schedules with the contents of a rule_schedules.json-format file"""
+        with open(path, 'r', encoding='utf-8') as f:
+            db = json.load(f)
+        if not isinstance(db, dict):
+            raise ValueError(f"{path}: expected an object of schedules keyed by HREF")
+        with self._writing():
+            old = self.db
+            self._rebuild_indexes(db)
+            self.db = db
+            self.storage.snapshot(db)
+        self._publish_changes(old, db)
 
     def get_schedule_type(self, rs):
-        """0=無排程, 1=規則集本身(Self), 2=內部規則有(Child)"""
-        db_keys = self.get_all().keys()
-        if rs['href'] in db_keys: 
+        """0=無排程, 1=規則集本身(Self), 2=內部規則有(Child); O(1) via the children index"""
+        db = self.get_all()
+        if rs['href'] in db: 
             return 1
-        for r in rs.get('rules', []):
-            if r['href'] in db_keys: 
+        with self._rw.read():
+            if self.children.get(ruleset_href(rs['href'])):
                 return 2
         return 0
 
@@ -178,9 +1458,10 @@ class ScheduleDB:
 class APIResponse:
     """Lightweight HTTP response wrapper mimicking the requests.Response object interface."""
     
-    def __init__(self, status_code: int, body: bytes = b''):
+    def __init__(self, status_code: int, body: bytes = b'', headers: Optional[Any] = None):
         self.status_code: int = status_code
         self._body: bytes = body
+        self.headers = headers if headers is not None else {}
     
     def json(self):
         try:
@@ -194,20 +1475,855 @@ class APIResponse:
     def text(self):
         return self._body.decode('utf-8', errors='replace')
 
+def iter_json_array(chunks: Iterable[bytes]) -> Iterator[Any]:
+    """Incrementally decode a top-level JSON array from byte chunks, yielding one element at a time"""
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    buf, pos = '', 0
+    started = done = False
+
+    def skip_ws(i):
+        while i < len(buf) and buf[i] in ' \t\r\n':
+            i += 1
+        return i
+
+    def drain(final):
+        nonlocal pos, started, done
+        while not done:
+            pos = skip_ws(pos)
+            if pos >= len(buf):
+                return
+            if not started:
+                if buf[pos] != '[':
+                    raise ValueError("expected a JSON array")
+                started, pos = True, pos + 1
+                continue
+            if buf[pos] == ']':
+                done = True
+                return
+            if buf[pos] == ',':
+                pos = skip_ws(pos + 1)
+                if pos >= len(buf):
+                    return
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if final:
+                    raise
+                return  # Element continues in the next chunk
+            if not isinstance(obj, (dict, list, str)):
+                # A bare number/literal is only complete once its delimiter arrived: "[1." + "5]"
+                # decodes as 1 up to the '.', and "1" + "e3" as 1 up to the end of the chunk
+                nxt = skip_ws(end)
+                if nxt >= len(buf) or buf[nxt] not in ',]':
+                    if not final:
+                        return
+                    raise ValueError("truncated JSON array" if nxt >= len(buf) else "malformed JSON array element")
+            pos = end
+            yield obj
+
+    for chunk in chunks:
+        buf = buf[pos:] + utf8.decode(chunk)
+        pos = 0
+        yield from drain(False)
+        if done:
+            return
+    buf = buf[pos:] + utf8.decode(b'', final=True)
+    pos = 0
+    yield from drain(True)
+    if not done:
+        raise ValueError("truncated JSON array")
+
+# ==========================================
+# 3b. Keep-Alive Connection Pool (replaces per-call urlopen)
+# ==========================================
+class ConnectionPool:
+    """Thread-safe pool of persistent http.client connections, keyed by (scheme, host, port, ssl_verify).
+    At most `max_size` connections per key exist at once (checked out or idle): a caller past the
+    cap waits up to its request timeout for one to come back, then gets a TimeoutError."""
+
+    # Errors raised when the server silently closed an idle keep-alive socket
+    STALE_ERRORS = (http.client.RemoteDisconnected, http.client.CannotSendRequest,
+                    ConnectionResetError, ConnectionAbortedError, BrokenPipeError, ssl.SSLEOFError)
+
+    def __init__(self, max_size: int = 10, idle_timeout: float = 60.0):
+        self.max_size: int = max_size
+        self.idle_timeout: float = idle_timeout
+        self.connections_opened: int = 0
+        self._idle: Dict[tuple, List[Tuple[http.client.HTTPConnection, float]]] = {}
+        self._slots: Dict[tuple, threading.BoundedSemaphore] = {}
+        self._ssl_contexts: Dict[bool, ssl.SSLContext] = {}
+        self._lock = threading.Lock()
+
+    def ssl_context(self, verify: bool) -> ssl.SSLContext:
+        """Build the SSL context once per ssl_verify setting"""
+        with self._lock:
+            ctx = self._ssl_contexts.get(verify)
+            if ctx is None:
+                ctx = ssl.create_default_context()
+                if not verify:
+                    ctx.check_hostname = False
+                    ctx.verify_mode = ssl.CERT_NONE
+                self._ssl_contexts[verify] = ctx
+            return ctx
+
+    def _connect(self, key, timeout):
+        scheme, host, port, verify = key
+        with self._lock:
+            self.connections_opened += 1
+        if scheme == 'https':
+            return http.client.HTTPSConnection(host, port, timeout=timeout, context=self.ssl_context(verify))
+        return http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def _acquire(self, key, timeout):
+        """Check out (connection, reused) once a slot is free; idle sockets past idle_timeout are retired"""
+        with self._lock:
+            slots = self._slots.get(key)
+            if slots is None:
+                slots = self._slots[key] = threading.BoundedSemaphore(max(1, self.max_size))
+        if not slots.acquire(timeout=timeout):
+            raise TimeoutError(f"all {self.max_size} pooled connections to {key[1]} are busy")
+        try:
+            now = time.monotonic()
+            with self._lock:
+                idle = self._idle.get(key, [])
+                while idle:
+                    conn, last_used = idle.pop()
+                    if now - last_used <= self.idle_timeout:
+                        conn.timeout = timeout
+                        if conn.sock is not None:
+                            conn.sock.settimeout(timeout)
+                        return conn, True
+                    conn.close()
+            return self._connect(key, timeout), False
+        except BaseException:
+            slots.release()
+            raise
+
+    def _release(self, key, conn, reusable=True):
+        """Check a connection back in: kept idle when `reusable`, closed otherwise"""
+        try:
+            if reusable:
+                with self._lock:
+                    self._idle.setdefault(key, []).append((conn, time.monotonic()))
+                return
+            conn.close()
+        finally:
+            self._slots[key].release()
+
+    def request(self, method: str, url: str, body: Optional[bytes], headers: Dict[str, str],
+                timeout: float, verify: bool) -> Tuple[int, bytes, http.client.HTTPMessage]:
+        """Send one request over a pooled connection and return (status, body, headers)"""
+        parts = urllib.parse.urlsplit(url)
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        key = (parts.scheme, parts.hostname, port, verify)
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+
+        for attempt in range(2):
+            conn, reused = self._acquire(key, timeout)
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                resp = conn.getresponse()
+                data = resp.read()
+            except self.STALE_ERRORS:
+                self._release(key, conn, False)
+                # A reused socket the server already dropped: retry once on a fresh one
+                if reused and attempt == 0:
+                    continue
+                raise
+            except BaseException:
+                self._release(key, conn, False)
+                raise
+            self._release(key, conn, not resp.will_close)
+            return resp.status, data, resp.headers
+        raise http.client.RemoteDisconnected("connection pool retry exhausted")
+
+    @contextlib.contextmanager
+    def stream(self, method: str, url: str, body: Optional[bytes], headers: Dict[str, str],
+               timeout: float, verify: bool, chunk_size: int = 65536):
+        """Like request(), but yields (status, headers, chunk_iterator) without buffering the body.
+        The connection returns to the pool only if the body was read to the end."""
+        parts = urllib.parse.urlsplit(url)
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        key = (parts.scheme, parts.hostname, port, verify)
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+
+        for attempt in range(2):
+            conn, reused = self._acquire(key, timeout)
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                resp = conn.getresponse()
+                break
+            except self.STALE_ERRORS:
+                self._release(key, conn, False)
+                if reused and attempt == 0:
+                    continue
+                raise
+            except BaseException:
+                self._release(key, conn, False)
+                raise
+
+        def chunks():
+            while True:
+                data = resp.read(chunk_size)
+                if not data:
+                    return
+                yield data
+
+        try:
+            yield resp.status, resp.headers, chunks()
+            if not resp.isclosed() and resp.length is not None and resp.length <= chunk_size:
+                resp.read()  # Drain small unread bodies (304, error JSON) so the socket stays reusable
+        except BaseException:
+            self._release(key, conn, False)
+            raise
+        self._release(key, conn, resp.isclosed() and not resp.will_close)
+
+    def close(self):
+        with self._lock:
+            for idle in self._idle.values():
+                for conn, _ in idle:
+                    conn.close()
+            self._idle.clear()
+
+# ==========================================
+# 3c. Label / IP List / Service Name Cache
+# ==========================================
+class LabelCache:
+    """href -> display-name cache for labels, IP lists and services.
+
+    Entries expire after `ttl` seconds; a refresh revalidates each collection with
+    If-None-Match when the PCE returned an ETag, unknown hrefs are filled lazily one GET at
+    a time, and the whole cache is persisted to disk so a restart starts warm."""
+
+    def __init__(self, path: Optional[str] = None, ttl: float = 900):
+        self.path: Optional[str] = path
+        self.ttl: float = ttl
+        self.source: str = ""
+        self.refreshed_at: float = 0.0
+        self.etags: Dict[str, str] = {}
+        self.collections: Dict[str, Dict[str, str]] = {}
+        self.lazy: Dict[str, str] = {}
+        self.misses: Dict[str, float] = {}
+        self._names: Dict[str, str] = {}
+        self._lock = threading.RLock()
+        self._loaded = False
+        self.dirty = False
+        self.generation: int = 0  # bumped whenever a name may have changed
+
+    def _rebuild_names(self):
+        names = dict(self.lazy)
+        for entries in self.collections.values():
+            names.update(entries)
+        self._names = names
+        self.generation += 1
+
+    def load(self):
+        """Read the persisted cache once (silently ignored when missing or corrupt)"""
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            if not self.path or not os.path.exists(self.path):
+                return
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self.source = data.get('source', '')
+                self.refreshed_at = float(data.get('refreshed_at', 0))
+                self.etags = data.get('etags', {})
+                self.collections = data.get('collections', {})
+                self.lazy = data.get('lazy', {})
+                self._rebuild_names()
+            except Exception:
+                pass
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            data = {
+                'source': self.source, 'refreshed_at': self.refreshed_at, 'etags': self.etags,
+                'collections': self.collections, 'lazy': self.lazy,
+            }
+            self.dirty = False
+        try:
+            atomic_write_json(self.path, data)
+        except OSError as e:
+            print(f"[Cache Error] {e}")
+
+    def bind(self, source: str):
+        """Drop everything when the cache belongs to another PCE/org"""
+        self.load()
+        with self._lock:
+            if self.source != source:
+                self.source = source
+                self.refreshed_at = 0.0
+                self.etags, self.collections, self.lazy, self.misses = {}, {}, {}, {}
+                self._names = {}
+                self.generation += 1
+
+    def is_fresh(self) -> bool:
+        return time.time() - self.refreshed_at < self.ttl
+
+    def is_cold(self) -> bool:
+        """No collection loaded yet (first start, or just rebound to another PCE/org)"""
+        with self._lock:
+            return not self.collections
+
+    def etag(self, collection: str) -> Optional[str]:
+        with self._lock:
+            return self.etags.get(collection) if collection in self.collections else None
+
+    def replace_collection(self, collection: str, entries: Dict[str, str], etag: Optional[str] = None):
+        with self._lock:
+            self.collections[collection] = entries
+            if etag:
+                self.etags[collection] = etag
+            else:
+                self.etags.pop(collection, None)
+            for href in entries:
+                self.lazy.pop(href, None)
+                self.misses.pop(href, None)
+            self._rebuild_names()
+
+    def mark_refreshed(self):
+        with self._lock:
+            self.refreshed_at = time.time()
+            self.misses = {}
+
+    def put_lazy(self, href: str, names: Dict[str, str]):
+        with self._lock:
+            self.lazy.update(names)
+            self._names.update(names)
+            self.generation += 1
+            self.dirty = True
+
+    def record_miss(self, href: str):
+        with self._lock:
+            self.misses[href] = time.time()
+
+    def recently_missed(self, href: str) -> bool:
+        ts = self.misses.get(href)
+        return ts is not None and time.time() - ts < self.ttl
+
+    def get(self, href, default=None):
+        return self._names.get(href, default)
+
+    def labels(self) -> List[Tuple[str, str]]:
+        """(href, "key:value") of every cached label"""
+        return [(h, n) for h, n in list(self._names.items()) if '/labels/' in h]
+
+    def __getitem__(self, href):
+        return self._names[href]
+
+    def __contains__(self, href):
+        return href in self._names
+
+    def __len__(self):
+        return len(self._names)
+
+# ==========================================
+# 3d. Compact Ruleset Model (ruleset_cache)
+# ==========================================
+def _compact_actors(actors):
+    """Actor list -> tuple of (kind, href-or-value) pairs, as accepted by resolve_actor_str"""
+    out = []
+    for a in actors or ():
+        if 'label' in a:
+            out.append(('label', sys.intern(a['label']['href'])))
+        elif 'ip_list' in a:
+            out.append(('ip_list', sys.intern(a['ip_list']['href'])))
+        elif 'actors' in a:
+            out.append(('actors', sys.intern(str(a['actors']))))
+    return tuple(out)
+
+def _compact_services(services):
+    """ingress_services -> tuple of ('port', port, proto, to_port) / ('href', href) / ('ref',)"""
+    out = []
+    for sv in services or ():
+        if 'port' in sv:
+            out.append(('port', sv.get('port'), sv.get('proto'), sv.get('to_port')))
+        elif 'href' in sv:
+            out.append(('href', sys.intern(sv['href'])))
+        else:
+            out.append(('ref',))
+    return tuple(out)
+
+
+class _Record:
+    """Slotted record that still answers rec['field'] / rec.get('field') like the PCE JSON it replaces."""
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        return getattr(self, key, default) if key in self.__slots__ else default
+
+
+class RuleRecord(_Record):
+    """The fields of a rule the scheduler reads; everything else is fetched on demand."""
+    __slots__ = ('href', 'enabled', 'update_type', 'consumers', 'providers', 'ingress_services')
+
+    def __init__(self, r: Dict[str, Any]):
+        self.href: str = r['href']
+        self.enabled: bool = bool(r.get('enabled', False))
+        self.update_type: Optional[str] = r.get('update_type')
+        self.consumers = _compact_actors(r.get('destinations', r.get('consumers')))
+        self.providers = _compact_actors(r.get('providers'))
+        self.ingress_services = _compact_services(r.get('ingress_services'))
+
+
+class RulesetRecord(_Record):
+    """Compact ruleset entry kept in PCEClient.ruleset_cache instead of the full PCE JSON."""
+    __slots__ = ('href', 'name', 'enabled', 'update_type', 'updated_at', 'rules')
+
+    def __init__(self, rs: Dict[str, Any]):
+        self.href: str = rs['href']
+        self.name: str = rs.get('name', '')
+        self.enabled: bool = bool(rs.get('enabled', False))
+        self.update_type: Optional[str] = rs.get('update_type')
+        self.updated_at: Optional[str] = rs.get('updated_at')
+        self.rules: Tuple[RuleRecord, ...] = tuple(RuleRecord(r) for r in rs.get('rules', []) if r.get('href'))
+
+    @property
+    def rule_hrefs(self) -> List[str]:
+        return [r.href for r in self.rules]
+
+# ==========================================
+# 3e. Ruleset Search Index
+# ==========================================
+class RulesetSearchIndex:
+    """Inverted index over the ruleset snapshot for search_rulesets().
+
+    Terms come from ruleset names (weight 3), rule/ruleset descriptions (weight 1) and the
+    labels used in scopes and rules (weight 2, resolved through the LabelCache at query time).
+    Query words match terms by prefix (bisect over the sorted vocabulary, exact match ranks
+    higher) and fall back to a trigram-backed substring match on the name; `key:value` words
+    filter by label. Only rulesets whose updated_at changed are re-tokenized on refresh."""
+
+    NAME_W, LABEL_W, DESC_W = 3, 2, 1
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+        self._label_gen = -1
+        self._label_hrefs: Dict[str, List[str]] = {}              # "key:value" -> hrefs
+        self._label_terms: Dict[str, set] = {}                    # label token -> hrefs
+        self._label_vocab: List[str] = []
+
+    def _reset(self):
+        self.docs: List[Optional[RulesetRecord]] = []
+        self._doc_of: Dict[str, Tuple[int, Optional[str]]] = {}   # href -> (doc_id, updated_at)
+        self._doc_terms: Dict[int, Tuple[Dict[str, int], Tuple[str, ...], Tuple[str, ...]]] = {}
+        self.postings: Dict[str, Dict[int, int]] = {}            # term -> {doc_id: weight}
+        self.grams: Dict[str, set] = {}                           # name trigram -> doc_ids
+        self.label_docs: Dict[str, set] = {}                      # label href -> doc_ids
+        self._vocab: List[str] = []
+        self._vocab_dirty = False
+        self._results: Dict[Tuple[str, int], List[RulesetRecord]] = {}  # paging through one query
+
+    @staticmethod
+    def tokenize(text: Optional[str]) -> List[str]:
+        return re.findall(r'\w+', text.lower()) if text else []
+
+    @staticmethod
+    def trigrams(text: str) -> set:
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def stage(self, pending: Dict[str, Any], rec: RulesetRecord, raw: Dict[str, Any]):
+        """Tokenize one streamed ruleset unless the index already holds this updated_at.
+        Called outside the lock while the collection is decoded; apply() publishes the batch."""
+        known = self._doc_of.get(rec.href)
+        if known and known[1] is not None and known[1] == rec.updated_at:
+            return
+        terms: Dict[str, int] = {}
+        for tok in self.tokenize(raw.get('description')):
+            terms[tok] = max(terms.get(tok, 0), self.DESC_W)
+        for r in raw.get('rules', []):
+            for tok in self.tokenize(r.get('description')):
+                terms[tok] = max(terms.get(tok, 0), self.DESC_W)
+        for tok in self.tokenize(rec.name):
+            terms[tok] = self.NAME_W
+        labels = {sys.intern(e['label']['href']) for scope in raw.get('scopes') or () for e in scope if 'label' in e}
+        for r in rec.rules:
+            labels.update(v for kind, v in r.consumers + r.providers if kind == 'label')
+        pending[rec.href] = (terms, tuple(self.trigrams(rec.name.lower())), tuple(labels))
+
+    def _drop(self, doc_id: int):
+        terms, grams, labels = self._doc_terms.pop(doc_id)
+        for t in terms:
+            p = self.postings.get(t)
+            if p is not None:
+                p.pop(doc_id, None)
+                if not p:
+                    del self.postings[t]
+                    self._vocab_dirty = True
+        for g in grams:
+            self.grams.get(g, set()).discard(doc_id)
+        for h in labels:
+            self.label_docs.get(h, set()).discard(doc_id)
+        self.docs[doc_id] = None
+
+    def apply(self, pending: Dict[str, Any], records: List[RulesetRecord]):
+        """Make the index describe `records`: re-index staged rulesets, drop vanished ones"""
+        with self._lock:
+            self._results = {}
+            seen = set()
+            for rec in records:
+                seen.add(rec.href)
+                known = self._doc_of.get(rec.href)
+                entry = pending.get(rec.href)
+                if entry is None and known:
+                    self.docs[known[0]] = rec
+                    continue
+                if known:
+                    self._drop(known[0])
+                if entry is None:
+                    continue
+                doc_id = len(self.docs)
+                self.docs.append(rec)
+                self._doc_of[rec.href] = (doc_id, rec.updated_at)
+                self._doc_terms[doc_id] = entry
+                terms, grams, labels = entry
+                for t, w in terms.items():
+                    p = self.postings.get(t)
+                    if p is None:
+                        p = self.postings[t] = {}
+                        self._vocab_dirty = True
+                    p[doc_id] = w
+                for g in grams:
+                    self.grams.setdefault(g, set()).add(doc_id)
+                for h in labels:
+                    self.label_docs.setdefault(h, set()).add(doc_id)
+            for href in [h for h in self._doc_of if h not in seen]:
+                self._drop(self._doc_of.pop(href)[0])
+            if len(self.docs) > 2 * max(len(self._doc_of), 64):
+                self._compact()
+
+    def _compact(self):
+        """Renumber documents once tombstones dominate"""
+        live = [(href, doc_id, ver) for href, (doc_id, ver) in self._doc_of.items()]
+        docs, doc_terms = self.docs, self._doc_terms
+        self._reset()
+        for href, doc_id, ver in live:
+            terms, grams, labels = doc_terms[doc_id]
+            new_id = len(self.docs)
+            self.docs.append(docs[doc_id])
+            self._doc_of[href] = (new_id, ver)
+            self._doc_terms[new_id] = doc_terms[doc_id]
+            for t, w in terms.items():
+                self.postings.setdefault(t, {})[new_id] = w
+            for g in grams:
+                self.grams.setdefault(g, set()).add(new_id)
+            for h in labels:
+                self.label_docs.setdefault(h, set()).add(new_id)
+        self._vocab_dirty = True
+
+    def _sync_labels(self, label_cache: 'LabelCache'):
+        if self._label_gen == label_cache.generation:
+            return
+        by_name: Dict[str, List[str]] = {}
+        terms: Dict[str, set] = {}
+        for href, name in label_cache.labels():
+            by_name.setdefault(name.lower(), []).append(href)
+            for tok in self.tokenize(name):
+                terms.setdefault(tok, set()).add(href)
+        self._label_hrefs, self._label_terms = by_name, terms
+        self._label_vocab = sorted(terms)
+        self._label_gen = label_cache.generation
+
+    @staticmethod
+    def _prefixed(vocab: List[str], prefix: str) -> Iterator[str]:
+        for i in range(bisect.bisect_left(vocab, prefix), len(vocab)):
+            if not vocab[i].startswith(prefix):
+                break
+            yield vocab[i]
+
+    def _match_token(self, tok: str) -> Dict[int, int]:
+        hits: Dict[int, int] = {}
+        for term in self._prefixed(self._vocab, tok):
+            bonus = 2 if term == tok else 1
+            if not hits:
+                hits = {d: w * bonus for d, w in self.postings[term].items()}
+                continue
+            for d, w in self.postings[term].items():
+                if w * bonus > hits.get(d, 0):
+                    hits[d] = w * bonus
+        for term in self._prefixed(self._label_vocab, tok):
+            score = self.LABEL_W * (2 if term == tok else 1)
+            for href in self._label_terms[term]:
+                for d in self.label_docs.get(href, ()):
+                    if score > hits.get(d, 0):
+                        hits[d] = score
+        return hits
+
+    def _match_substring(self, word: str) -> set:
+        grams = self.trigrams(word)
+        if not grams:
+            # Too short for a trigram (1-2 chars, e.g. "db" or "-"): scan the names
+            return {d for d, rec in enumerate(self.docs) if rec is not None and word in rec.name.lower()}
+        cands = None
+        for g in sorted(grams, key=lambda g: len(self.grams.get(g, ()))):
+            ids = self.grams.get(g)
+            if not ids:
+                return set()
+            cands = set(ids) if cands is None else cands & ids
+            if not cands:
+                return set()
+        return {d for d in cands if word in self.docs[d].name.lower()}
+
+    def search(self, query: str, label_cache: 'LabelCache') -> List[RulesetRecord]:
+        """Rulesets matching every word of `query`, best first"""
+        with self._lock:
+            if self._vocab_dirty:
+                self._vocab = sorted(self.postings)
+                self._vocab_dirty = False
+            self._sync_labels(label_cache)
+            key = (' '.join(query.lower().split()), self._label_gen)
+            cached = self._results.get(key)
+            if cached is None:
+                cached = self._search(key[0])
+                if len(self._results) >= 32:
+                    self._results.pop(next(iter(self._results)))
+                self._results[key] = cached
+            return cached
+
+    @staticmethod
+    def _intersect(a: Dict[int, int], b: Dict[int, int]) -> Dict[int, int]:
+        if len(a) > len(b):
+            a, b = b, a
+        return {d: s + b[d] for d, s in a.items() if d in b}
+
+    def _search(self, query: str) -> List[RulesetRecord]:
+        scores: Optional[Dict[int, int]] = None
+        for word in query.split():
+            key, sep, value = word.partition(':')
+            if sep and key and value:
+                ids = set()
+                for href in self._label_hrefs.get(word, ()):
+                    ids |= self.label_docs.get(href, set())
+                matched = {d: self.LABEL_W for d in ids}
+            else:
+                matched = None
+                for tok in self.tokenize(word):
+                    hits = self._match_token(tok)
+                    matched = hits if matched is None else self._intersect(matched, hits)
+                matched = matched or {}
+                for d in self._match_substring(word):
+                    # A literal name match (the old substring search) ranks with a name term
+                    matched[d] = matched.get(d, 0) + self.NAME_W
+            scores = matched if scores is None else self._intersect(scores, matched)
+            if not scores:
+                return []
+        if scores is None:
+            return [d for d in self.docs if d is not None]
+        docs = self.docs
+        ranked = sorted((-sc, docs[d].name.lower(), d) for d, sc in scores.items())
+        return [docs[d] for _, _, d in ranked]
+
+# ==========================================
+# 3f. PCE Rate Control (token bucket + AIMD concurrency)
+# ==========================================
+def parse_retry_after(value) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date); None if absent/invalid"""
+    if not value:
+        return None
+    value = str(value).strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if when is None:
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=datetime.timezone.utc)
+    return max(0.0, (when - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+
+
+class RateController:
+    """Client-side pacing for every PCE request.
+
+    - Token bucket: at most `rps` requests per second with bursts of `burst` (rps <= 0 disables it).
+    - AIMD concurrency: the in-flight limit grows by one per `limit` successful responses and is
+      halved on a 429 or 5xx (at most once per `decrease_interval`, so one burst of errors is one cut).
+    - A Retry-After on a 429/503 pauses every caller until it has passed, not only the one that got it.
+    """
+
+    THROTTLE_STATUSES = (429, 503)
+
+    def __init__(self, rps: float = 0.0, burst: Optional[float] = None, max_concurrency: int = 16,
+                 min_concurrency: int = 1, backoff_base: float = 0.5, backoff_cap: float = 30.0,
+                 decrease_interval: float = 1.0):
+        self.rps: float = float(rps)
+        self.burst: float = float(burst) if burst else max(1.0, self.rps)
+        self.max_concurrency: int = max(1, int(max_concurrency))
+        self.min_concurrency: int = max(1, min(int(min_concurrency), self.max_concurrency))
+        self.backoff_base: float = backoff_base
+        self.backoff_cap: float = backoff_cap
+        self.decrease_interval: float = decrease_interval
+        self.limit: float = float(self.max_concurrency)
+        self.in_flight: int = 0
+        self.counters: Dict[str, int] = {'requests': 0, 'throttled': 0, 'server_errors': 0,
+                                         'retries': 0, 'decreases': 0}
+        self._tokens: float = self.burst
+        self._stamp: float = time.monotonic()
+        self._paused_until: float = 0.0
+        self._last_decrease: float = 0.0
+        self._cond = threading.Condition(threading.Lock())
+        self._bucket_lock = threading.Lock()
+        self._held = threading.local()
+
+    def acquire(self):
+        """Block until a concurrency slot and a token are available. A thread that already holds
+        a slot (a request issued while consuming a stream) does not wait for a second one."""
+        nested = getattr(self._held, 'slots', 0)
+        with self._cond:
+            while not nested and self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+        self._held.slots = nested + 1
+        try:
+            self._take_token()
+        except BaseException:
+            self.release(None)
+            raise
+
+    def _take_token(self):
+        while True:
+            with self._bucket_lock:
+                now = time.monotonic()
+                wait = self._paused_until - now
+                if wait <= 0:
+                    if self.rps <= 0:
+                        return
+                    self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rps)
+                    self._stamp = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rps
+            time.sleep(wait)
+
+    def release(self, status: Optional[int]):
+        """Give the slot back and adapt the limit; `status` None means no response (connection error)"""
+        self._held.slots -= 1
+        with self._cond:
+            self.in_flight -= 1
+            if status is not None:
+                self.counters['requests'] += 1
+                if status in self.THROTTLE_STATUSES or status >= 500:
+                    self.counters['throttled' if status in self.THROTTLE_STATUSES else 'server_errors'] += 1
+                    now = time.monotonic()
+                    if now - self._last_decrease >= self.decrease_interval:
+                        self.limit = max(float(self.min_concurrency), self.limit / 2)
+                        self._last_decrease = now
+                        self.counters['decreases'] += 1
+                else:
+                    self.limit = min(float(self.max_concurrency), self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Delay before retry number `attempt` (0-based): exponential with jitter, or Retry-After
+        plus a little jitter so paused callers do not all return at the same instant"""
+        delay = min(self.backoff_cap, self.backoff_base * (2 ** attempt))
+        if retry_after is not None:
+            delay = retry_after + random.uniform(0, min(1.0, delay))
+            self.pause(delay)
+        else:
+            delay = random.uniform(delay / 2, delay)
+        with self._cond:
+            self.counters['retries'] += 1
+        return delay
+
+    def pause(self, seconds: float):
+        with self._bucket_lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return dict(self.counters, limit=round(self.limit, 2), in_flight=self.in_flight)
+
 # ==========================================
 # 4. PCE API Client (stdlib only)
 # ==========================================
+PCE_REQUESTS = METRICS.counter('illumio_pce_requests_total',
+                               'PCE API responses by method, endpoint and status (every retry counts; status "error" = no response)',
+                               ('method', 'endpoint', 'status'))
+PCE_LATENCY = METRICS.histogram('illumio_pce_request_duration_seconds',
+                                'PCE API round-trip time (streamed collections: until the response headers arrived)',
+                                ('method', 'endpoint'), buckets=(.01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30))
+PROVISIONS = METRICS.counter('illumio_provisions_total', 'Policy provision commits by result', ('result',))
+PROVISION_LATENCY = METRICS.histogram('illumio_provision_duration_seconds', 'Time of one provision commit',
+                                      buckets=(.1, .25, .5, 1, 2.5, 5, 10, 30, 60))
+CACHE_REQUESTS = METRICS.counter('illumio_cache_requests_total',
+                                 'Lookups in label_cache (hit/miss/negative) and ruleset_cache (hit/stale/miss)',
+                                 ('cache', 'result'))
+
 class PCEClient:
     """Handles all REST API communications with the Illumio Policy Compute Engine (PCE)."""
     
     def __init__(self, config_manager: ConfigManager, timeout: int = 30):
         self.cfg: ConfigManager = config_manager
         self.timeout: int = timeout
-        self.label_cache: Dict[str, str] = {}
-        self.ruleset_cache: List[Dict[str, Any]] = []
+        self.label_cache: LabelCache = LabelCache(
+            path=os.path.join(os.path.dirname(os.path.abspath(self.cfg.config_path)), "label_cache.json"),
+            ttl=float(self.cfg.config.get('label_cache_ttl_seconds', 900)),
+        )
+        self.ruleset_cache: List[RulesetRecord] = []
+        self.ruleset_version: int = 0
+        self.ruleset_fetched_at: float = 0.0
+        self._ruleset_etag: Optional[str] = None
+        self._ruleset_snapshots: Dict[int, Tuple[float, List[RulesetRecord]]] = {}
+        self._ruleset_attempted_at: float = 0.0
+        self._ruleset_revalidating: bool = False
+        self._ruleset_lock = threading.Lock()
+        self._ruleset_refresh_lock = threading.Lock()
+        self.search_index: RulesetSearchIndex = RulesetSearchIndex()
+        self._collection_totals: Dict[str, int] = {}
+        # Per thread: concurrent GUI requests / check cycles each get their own dependency cache
+        self._cycle = threading.local()
+        self._label_refresh = threading.Condition()
+        self._label_refreshing: bool = False
+        self.pool: ConnectionPool = ConnectionPool(
+            max_size=int(self.cfg.config.get('http_pool_size', 10)),
+            idle_timeout=float(self.cfg.config.get('http_idle_timeout_seconds', 60)),
+        )
+        self.rate: RateController = RateController(
+            rps=float(self.cfg.config.get('api_rate_limit_rps', 0)),
+            burst=self.cfg.config.get('api_rate_burst'),
+            max_concurrency=int(self.cfg.config.get('api_max_concurrency', 16)),
+            min_concurrency=int(self.cfg.config.get('api_min_concurrency', 1)),
+            backoff_base=float(self.cfg.config.get('api_backoff_base_seconds', 0.5)),
+            backoff_cap=float(self.cfg.config.get('api_backoff_max_seconds', 30)),
+        )
+        self.max_retries: int = int(self.cfg.config.get('api_max_retries', 4))
+        METRICS.collector('pce', self._metrics)
 
-    def _request(self, method: str, endpoint: str, payload: Optional[Dict[str, Any]] = None) -> Optional[APIResponse]:
-        """Core HTTP method using urllib.request"""
+    def _metrics(self):
+        rate = self.rate.stats()
+        return [
+            ('illumio_pce_concurrency_limit', 'gauge', 'Current AIMD limit on concurrent PCE requests', [({}, rate['limit'])]),
+            ('illumio_pce_in_flight', 'gauge', 'PCE requests currently in flight', [({}, rate['in_flight'])]),
+            ('illumio_pce_rate_events_total', 'counter', 'Rate controller events (throttled = 429/503 answers)',
+             [({'event': k}, rate[k]) for k in ('throttled', 'server_errors', 'retries', 'decreases')]),
+            ('illumio_cache_entries', 'gauge', 'Entries held in label_cache and ruleset_cache',
+             [({'cache': 'label'}, len(self.label_cache)), ({'cache': 'ruleset'}, len(self.ruleset_cache))]),
+            ('illumio_ruleset_cache_age_seconds', 'gauge', 'Age of the current ruleset snapshot',
+             [({}, round(time.time() - self.ruleset_fetched_at, 3) if self.ruleset_fetched_at else 0)]),
+        ]
+
+    def _request(self, method: str, endpoint: str, payload: Optional[Dict[str, Any]] = None,
+                 extra_headers: Optional[Dict[str, str]] = None) -> Optional[APIResponse]:
+        """Core HTTP method over the keep-alive connection pool"""
         if not self.cfg.is_ready(): return None
         url = f"{self.cfg.config['pce_url']}/api/v2{endpoint}"
         
@@ -216,26 +2332,91 @@ class PCEClient:
             'Accept': 'application/json',
             'Authorization': self.cfg.get_auth_header()
         }
+        if extra_headers:
+            headers.update(extra_headers)
         
         body = json.dumps(payload).encode('utf-8') if payload else None
-        req = urllib.request.Request(url, data=body, headers=headers, method=method)
-        
-        ctx = ssl.create_default_context()
-        if not self.cfg.config.get('ssl_verify', False):
-            ctx.check_hostname = False
-            ctx.verify_mode = ssl.CERT_NONE
-            
-        try:
-            resp = urllib.request.urlopen(req, timeout=self.timeout, context=ctx)
-            return APIResponse(resp.status, resp.read())
-        except urllib.error.HTTPError as e:
-            return APIResponse(e.code, e.read() if e.fp else b'')
-        except Exception as e:
-            print(f"[API_ERROR] {method} {endpoint}: {e}")
-            return None
+        verify = bool(self.cfg.config.get('ssl_verify', False))
 
-    def _api_get(self, endpoint):
-        return self._request('GET', endpoint)
+        path = metric_endpoint(endpoint)
+        attempt = 0
+        while True:
+            self.rate.acquire()
+            status = None
+            started = time.perf_counter()
+            try:
+                status, data, resp_headers = self.pool.request(method, url, body, headers, self.timeout, verify)
+            except Exception as e:
+                error = e
+            finally:
+                self.rate.release(status)
+                self._observe(method, path, status, started)
+            if status is not None:
+                res = APIResponse(status, data, resp_headers)
+                if attempt >= self.max_retries or not self._retryable(method, status):
+                    return res
+                delay = self.rate.backoff(attempt, parse_retry_after(resp_headers.get('Retry-After'))
+                                          if status in RateController.THROTTLE_STATUSES else None)
+                print(f"{Colors.YELLOW}[API_RETRY] {method} {endpoint}: {status}, retrying in {delay:.1f}s{Colors.RESET}")
+            else:
+                if attempt >= self.max_retries or method not in self.IDEMPOTENT_METHODS:
+                    print(f"[API_ERROR] {method} {endpoint}: {error}")
+                    return None
+                delay = self.rate.backoff(attempt)
+                print(f"{Colors.YELLOW}[API_RETRY] {method} {endpoint}: {error}, retrying in {delay:.1f}s{Colors.RESET}")
+            time.sleep(delay)
+            attempt += 1
+
+    @staticmethod
+    def _observe(method, path, status, started):
+        PCE_LATENCY.observe(time.perf_counter() - started, method=method, endpoint=path)
+        PCE_REQUESTS.inc(method=method, endpoint=path, status=status if status is not None else 'error')
+
+    # A 429 was never processed, so any method may be resent; a 5xx or lost connection only for
+    # requests that are safe to repeat (POST provisions and export jobs are not)
+    IDEMPOTENT_METHODS = ('GET', 'PUT', 'DELETE')
+
+    def _retryable(self, method, status):
+        if status == 429:
+            return True
+        return status >= 500 and method in self.IDEMPOTENT_METHODS
+
+    @contextlib.contextmanager
+    def _stream_get(self, endpoint, headers=None):
+        """Context manager yielding (status, headers, chunk_iterator) for a GET, body unbuffered.
+        Paced like _request(); 429/5xx answers are retried before anything is yielded."""
+        url = f"{self.cfg.config['pce_url']}/api/v2{endpoint}"
+        req_headers = {
+            'Accept': 'application/json',
+            'Authorization': self.cfg.get_auth_header()
+        }
+        if headers:
+            req_headers.update(headers)
+        verify = bool(self.cfg.config.get('ssl_verify', False))
+        path = metric_endpoint(endpoint)
+        attempt = 0
+        while True:
+            self.rate.acquire()
+            status = None
+            started = time.perf_counter()
+            try:
+                with self.pool.stream('GET', url, None, req_headers, self.timeout, verify) as (status, resp_headers, chunks):
+                    self._observe('GET', path, status, started)
+                    if attempt >= self.max_retries or not self._retryable('GET', status):
+                        yield status, resp_headers, chunks
+                        return
+            finally:
+                self.rate.release(status)
+                if status is None:
+                    self._observe('GET', path, None, started)
+            delay = self.rate.backoff(attempt, parse_retry_after(resp_headers.get('Retry-After'))
+                                      if status in RateController.THROTTLE_STATUSES else None)
+            print(f"{Colors.YELLOW}[API_RETRY] GET {endpoint}: {status}, retrying in {delay:.1f}s{Colors.RESET}")
+            time.sleep(delay)
+            attempt += 1
+
+    def _api_get(self, endpoint, headers=None):
+        return self._request('GET', endpoint, extra_headers=headers)
 
     def _api_put(self, endpoint, payload):
         return self._request('PUT', endpoint, payload)
@@ -243,47 +2424,129 @@ class PCEClient:
     def _api_post(self, endpoint, payload):
         return self._request('POST', endpoint, payload)
 
-    def update_label_cache(self, silent=False):
+    @staticmethod
+    def _label_entries(i):
+        return {i['href']: f"{i.get('key')}:{i.get('value')}"}
+
+    @staticmethod
+    def _ip_list_entries(i):
+        val = f"[IPList] {i.get('name')}"
+        return {i['href']: val, i['href'].replace('/draft/', '/active/'): val}
+
+    @staticmethod
+    def _service_entries(i):
+        name = i.get('name')
+        ports = []
+        for svc in i.get('service_ports', []):
+            p = svc.get('port')
+            if p:
+                proto = "UDP" if svc.get('proto') == 17 else "TCP"
+                top = f"-{svc['to_port']}" if svc.get('to_port') else ""
+                ports.append(f"{proto}/{p}{top}")
+        port_str = f" ({','.join(ports)})" if ports else ""
+        val = f"{name}{port_str}"
+        return {i['href']: val, i['href'].replace('/draft/', '/active/'): val}
+
+    def _label_collections(self):
+        org = self.cfg.config['org_id']
+        return [
+            (f"/orgs/{org}/labels", self._label_entries),
+            (f"/orgs/{org}/sec_policy/draft/ip_lists", self._ip_list_entries),
+            (f"/orgs/{org}/sec_policy/draft/services", self._service_entries),
+        ]
+
+    def update_label_cache(self, silent=False, force=False):
+        """Refresh label/IP list/service names when the cache is older than its TTL (or `force`).
+        Collections whose ETag still matches (304) are kept without re-downloading."""
         if not self.cfg.is_ready(): return
+        cache = self.label_cache
+        cache.bind(f"{self.cfg.config.get('pce_url')}|{self.cfg.config.get('org_id')}")
+        if not force and cache.is_fresh():
+            if cache.dirty:
+                cache.save()  # Persist lazily filled names
+            return
+        # One refresh at a time: concurrent callers keep using the current names, except on a
+        # cold cache (nothing to use yet) or when forced, where they wait for the running one
+        with self._label_refresh:
+            if self._label_refreshing:
+                if not force and not cache.is_cold():
+                    return
+                self._label_refresh.wait_for(lambda: not self._label_refreshing)
+                if not force:
+                    return
+            self._label_refreshing = True
         try:
-            r1 = self._api_get(f"/orgs/{self.cfg.config['org_id']}/labels?max_results=10000")
-            if r1 and r1.status_code == 200:
-                for i in r1.json(): 
-                    self.label_cache[i['href']] = f"{i.get('key')}:{i.get('value')}"
-            
-            r2 = self._api_get(f"/orgs/{self.cfg.config['org_id']}/sec_policy/draft/ip_lists?max_results=10000")
-            if r2 and r2.status_code == 200:
-                for i in r2.json():
-                    val = f"[IPList] {i.get('name')}"
-                    self.label_cache[i['href']] = val
-                    self.label_cache[i['href'].replace('/draft/', '/active/')] = val
-                    
-            r3 = self._api_get(f"/orgs/{self.cfg.config['org_id']}/sec_policy/draft/services?max_results=10000")
-            if r3 and r3.status_code == 200:
-                for i in r3.json():
-                    name = i.get('name')
-                    ports = []
-                    for svc in i.get('service_ports', []):
-                        p = svc.get('port')
-                        if p:
-                            proto = "UDP" if svc.get('proto') == 17 else "TCP"
-                            top = f"-{svc['to_port']}" if svc.get('to_port') else ""
-                            ports.append(f"{proto}/{p}{top}")
-                    port_str = f" ({','.join(ports)})" if ports else ""
-                    val = f"{name}{port_str}"
-                    self.label_cache[i['href']] = val
-                    self.label_cache[i['href'].replace('/draft/', '/active/')] = val
+            complete = True
+            replaced = []
+            for endpoint, to_entries in self._label_collections():
+                etag = cache.etag(endpoint)
+                with self.open_collection(endpoint, headers={'If-None-Match': etag} if etag else None) as (status, headers, items):
+                    if status == 304:
+                        continue
+                    if status != 200:
+                        complete = False
+                        continue
+                    # Consume the stream element by element, keeping only the display names
+                    entries = {}
+                    for i in items:
+                        entries.update(to_entries(i))
+                    cache.replace_collection(endpoint, entries, headers.get('ETag'))
+                    replaced.append(endpoint.rsplit('/', 1)[-1])
+            if replaced:
+                EVENTS.publish('labels', collections=replaced, size=len(cache))
+            if complete:
+                cache.mark_refreshed()
+            cache.save()
         except Exception as e: 
             if not silent: print(f"[Cache Error] {e}")
+        finally:
+            with self._label_refresh:
+                self._label_refreshing = False
+                self._label_refresh.notify_all()
+
+    def _cached_name(self, href, default):
+        """Cached display name for an href, fetching just that object on a miss"""
+        cache = self.label_cache
+        name = cache.get(href)
+        if name is not None:
+            CACHE_REQUESTS.inc(cache='label', result='hit')
+            return name
+        if cache.recently_missed(href) or not self.cfg.is_ready():
+            CACHE_REQUESTS.inc(cache='label', result='negative')
+            return default
+        CACHE_REQUESTS.inc(cache='label', result='miss')
+        if '/labels/' in href:
+            to_entries = self._label_entries
+        elif '/ip_lists/' in href:
+            to_entries = self._ip_list_entries
+        elif '/services/' in href:
+            to_entries = self._service_entries
+        else:
+            return default
+        res = self._api_get(href)
+        if res and res.status_code == 200 and res.json().get('href'):
+            entries = to_entries(res.json())
+            entries.setdefault(href, next(iter(entries.values())))
+            cache.put_lazy(href, entries)
+            return entries[href]
+        cache.record_miss(href)
+        return default
 
     def resolve_actor_str(self, actors):
         if not actors: return "Any"
         names = []
         for a in actors:
-            if 'label' in a: 
-                names.append(self.label_cache.get(a['label']['href'], "Label"))
+            if isinstance(a, tuple):
+                # Compact (kind, value) ref from RuleRecord
+                kind, value = a
+                if kind == 'actors':
+                    names.append(value)
+                else:
+                    names.append(self._cached_name(value, "Label" if kind == 'label' else "IPList"))
+            elif 'label' in a: 
+                names.append(self._cached_name(a['label']['href'], "Label"))
             elif 'ip_list' in a: 
-                names.append(self.label_cache.get(a['ip_list']['href'], "IPList"))
+                names.append(self._cached_name(a['ip_list']['href'], "IPList"))
             elif 'actors' in a: 
                 names.append(str(a.get('actors')))
         return ", ".join(names)
@@ -292,80 +2555,317 @@ class PCEClient:
         if not services: return "All Services"
         svcs = []
         for s in services:
-            if 'port' in s:
+            if isinstance(s, tuple):
+                # Compact ('port', port, proto, to_port) / ('href', href) / ('ref',) from RuleRecord
+                if s[0] == 'port':
+                    _, p, proto, to_port = s
+                    svcs.append(f"{'UDP' if proto == 17 else 'TCP'}/{p}{f'-{to_port}' if to_port else ''}")
+                elif s[0] == 'href':
+                    svcs.append(self._cached_name(s[1], f"Service({extract_id(s[1])})"))
+                else:
+                    svcs.append("RefObj")
+            elif 'port' in s:
                 p, proto = s.get('port'), "UDP" if s.get('proto') == 17 else "TCP"
                 top = f"-{s['to_port']}" if s.get('to_port') else ""
                 svcs.append(f"{proto}/{p}{top}")
             elif 'href' in s:
-                svcs.append(self.label_cache.get(s['href'], f"Service({extract_id(s['href'])})"))
+                svcs.append(self._cached_name(s['href'], f"Service({extract_id(s['href'])})"))
             else: 
                 svcs.append("RefObj")
         return ", ".join(svcs)
 
+    @contextlib.contextmanager
+    def open_collection(self, endpoint, headers=None):
+        """Stream every object of a collection endpoint: yields (status, response_headers, element_iterator).
+
+        A sync GET is used while the collection fits in `sync_max_results`; when X-Total-Count
+        shows it would be truncated, the PCE async job flow is used instead. Elements are decoded
+        incrementally from the socket, so the full document is never held in memory.
+        Status 0 means a connection error or a failed export job."""
+        limit = int(self.cfg.config.get('sync_max_results', 10000))
+        if self._collection_totals.get(endpoint, 0) <= limit:
+            sep = '&' if '?' in endpoint else '?'
+            with contextlib.ExitStack() as stack:
+                try:
+                    status, resp_headers, chunks = stack.enter_context(
+                        self._stream_get(f"{endpoint}{sep}max_results={limit}", headers=headers))
+                except Exception as e:
+                    print(f"[API_ERROR] GET {endpoint}: {e}")
+                    status, resp_headers, chunks = 0, {}, None
+                total = resp_headers.get('X-Total-Count') if status == 200 else None
+                if total and total.isdigit():
+                    self._collection_totals[endpoint] = int(total)
+                if status != 200 or not total or not total.isdigit() or int(total) <= limit:
+                    yield status, resp_headers, (iter_json_array(chunks) if status == 200 else iter(()))
+                    return
+            print(f"{Colors.YELLOW}[*] {endpoint}: {total} objects exceed max_results={limit}, "
+                  f"switching to async export{Colors.RESET}")
+
+        result_href = self._run_export_job(endpoint)
+        if not result_href:
+            yield 0, {}, iter(())
+            return
+        with contextlib.ExitStack() as stack:
+            try:
+                status, resp_headers, chunks = stack.enter_context(self._stream_get(result_href))
+            except Exception as e:
+                print(f"[API_ERROR] GET {result_href}: {e}")
+                status, resp_headers, chunks = 0, {}, None
+            if status != 200:
+                print(f"{Colors.RED}[ASYNC EXPORT FAILED] {endpoint}: download {status}{Colors.RESET}")
+                yield 0, {}, iter(())
+                return
+            yield 200, {}, iter_json_array(chunks)
+
+    def _run_export_job(self, endpoint):
+        """PCE async collection export: Prefer: respond-async, then poll the job; returns the datafile href"""
+        res = self._api_get(endpoint, headers={'Prefer': 'respond-async'})
+        if not res or res.status_code != 202 or not res.headers.get('Location'):
+            status = res.status_code if res else 'Connection Error'
+            print(f"{Colors.RED}[ASYNC EXPORT FAILED] {endpoint}: {status}{Colors.RESET}")
+            return None
+        job_href = res.headers['Location'].split('/api/v2', 1)[-1]
+        timeout = float(self.cfg.config.get('async_job_timeout_seconds', 600))
+        deadline = time.monotonic() + timeout
+        delay = float(res.headers.get('Retry-After') or 1)
+
+        while time.monotonic() < deadline:
+            time.sleep(min(delay, max(0.0, deadline - time.monotonic())))
+            job = self._api_get(job_href)
+            if not job or job.status_code != 200:
+                continue
+            info = job.json()
+            status = info.get('status')
+            if status == 'done':
+                result_href = (info.get('result') or {}).get('href')
+                if result_href:
+                    return result_href
+                break
+            if status == 'failed':
+                break
+            delay = min(float(job.headers.get('Retry-After') or delay * 2), 30.0)
+        print(f"{Colors.RED}[ASYNC EXPORT FAILED] {endpoint}: job {extract_id(job_href)} did not finish{Colors.RESET}")
+        return None
+
+    RULESET_SNAPSHOTS_KEPT = 3
+    RULESET_RETRY_SECONDS = 30.0
+
     def get_all_rulesets(self, force_refresh=False):
-        if self.ruleset_cache and not force_refresh:
-            return self.ruleset_cache
-        res = self._api_get(f"/orgs/{self.cfg.config['org_id']}/sec_policy/draft/rule_sets?max_results=10000")
-        if res and res.status_code == 200: 
-            self.ruleset_cache = res.json()
-            return self.ruleset_cache
-        return []
-
-    def search_rulesets(self, keyword):
-        all_rs = self.get_all_rulesets()
-        return [rs for rs in all_rs if keyword.lower() in rs['name'].lower()]
+        """Current ruleset snapshot. Within `ruleset_cache_ttl_seconds` it is returned as-is; once
+        stale it is still returned while a background revalidation fetches the next version."""
+        if force_refresh or not self.ruleset_cache:
+            CACHE_REQUESTS.inc(cache='ruleset', result='miss')
+            self.refresh_rulesets()
+        elif not self.rulesets_fresh():
+            CACHE_REQUESTS.inc(cache='ruleset', result='stale')
+            self.revalidate_rulesets()
+        else:
+            CACHE_REQUESTS.inc(cache='ruleset', result='hit')
+        return self.ruleset_cache
+
+    def rulesets_fresh(self) -> bool:
+        ttl = float(self.cfg.config.get('ruleset_cache_ttl_seconds', 300))
+        return time.time() - self.ruleset_fetched_at < ttl
+
+    def ruleset_snapshot(self, version: Optional[int] = None) -> Tuple[int, float, List[RulesetRecord]]:
+        """(version, fetched_at, rulesets); a retained older version is returned when asked for,
+        so a client paging through the list keeps a consistent view across refreshes."""
+        self.get_all_rulesets()
+        with self._ruleset_lock:
+            if version is not None and version in self._ruleset_snapshots:
+                fetched_at, rulesets = self._ruleset_snapshots[version]
+                return version, fetched_at, rulesets
+            return self.ruleset_version, self.ruleset_fetched_at, self.ruleset_cache
+
+    def refresh_rulesets(self) -> bool:
+        """Fetch the ruleset collection (conditional on the last ETag) and publish it as a new version"""
+        with self._ruleset_refresh_lock:
+            self._ruleset_attempted_at = time.time()
+            endpoint = f"/orgs/{self.cfg.config['org_id']}/sec_policy/draft/rule_sets"
+            headers = {'If-None-Match': self._ruleset_etag} if self._ruleset_etag and self.ruleset_cache else None
+            try:
+                with self.open_collection(endpoint, headers=headers) as (status, resp_headers, items):
+                    if status == 304:
+                        self.ruleset_fetched_at = time.time()
+                        return True
+                    if status != 200:
+                        return False
+                    # Compact each ruleset as it is decoded; the full JSON is never kept,
+                    # only the search terms of rulesets that changed since the last refresh
+                    records, pending = [], {}
+                    for rs in items:
+                        rec = RulesetRecord(rs)
+                        records.append(rec)
+                        self.search_index.stage(pending, rec, rs)
+            except (ValueError, OSError, http.client.HTTPException) as e:
+                print(f"[API_ERROR] GET {endpoint}: {e}")
+                return False
+
+            with self._ruleset_lock:
+                self.ruleset_version += 1
+                self.ruleset_cache = records
+                self.ruleset_fetched_at = time.time()
+                self._ruleset_etag = resp_headers.get('ETag')
+                self._ruleset_snapshots[self.ruleset_version] = (self.ruleset_fetched_at, records)
+                for old in sorted(self._ruleset_snapshots)[:-self.RULESET_SNAPSHOTS_KEPT]:
+                    del self._ruleset_snapshots[old]
+            self.search_index.apply(pending, records)
+            EVENTS.publish('rulesets', version=self.ruleset_version, total=len(records))
+            return True
+
+    def revalidate_rulesets(self):
+        """Refresh the ruleset snapshot on a background thread; at most one runs at a time and a
+        failed attempt is not retried for RULESET_RETRY_SECONDS."""
+        with self._ruleset_lock:
+            if self._ruleset_revalidating or time.time() - self._ruleset_attempted_at < self.RULESET_RETRY_SECONDS:
+                return
+            self._ruleset_revalidating = True
+
+        def run():
+            try:
+                self.refresh_rulesets()
+            finally:
+                self._ruleset_revalidating = False
+        threading.Thread(target=run, name="ruleset-revalidate", daemon=True).start()
+
+    def search_rulesets(self, keyword, rulesets=None):
+        """Ranked search: words match name/description/label terms by prefix or the name by
+        substring; `key:value` words filter by label (e.g. `app:payments`)."""
+        all_rs = self.get_all_rulesets() if rulesets is None else rulesets
+        if not keyword.strip():
+            return all_rs
+        if all_rs is not self.ruleset_cache:
+            # An older pinned snapshot: the index follows the current one, so scan names
+            kw = keyword.lower()
+            return [rs for rs in all_rs if kw in rs.name.lower()]
+        self.update_label_cache(silent=True)
+        return self.search_index.search(keyword, self.label_cache)
 
     def get_ruleset_by_id(self, rs_id):
         res = self._api_get(f"/orgs/{self.cfg.config['org_id']}/sec_policy/draft/rule_sets/{rs_id}")
         return res.json() if res and res.status_code == 200 else None
 
-    def provision_changes(self, rs_href):
-        """Dependency-aware provisioning: discovers required dependencies first"""
+    DEPENDENCY_TYPES = ('rule_sets', 'ip_lists', 'services', 'label_groups',
+                        'virtual_services', 'firewall_settings', 'enforcement_boundaries',
+                        'virtual_servers', 'secure_connect_gateways')
+
+    @contextlib.contextmanager
+    def dependency_cycle(self):
+        """Scope a dependency cache to one check cycle: repeated lookups for the same ruleset(s)
+        reuse the first /sec_policy/draft/dependencies answer. Nested use shares the outer cache."""
+        if getattr(self._cycle, 'deps', None) is not None:
+            yield
+            return
+        self._cycle.deps = {}
+        try:
+            yield
+        finally:
+            self._cycle.deps = None
+
+    def _forget_dependencies(self, rs_hrefs):
+        """Drop cached lookups that involve these rulesets, after their draft was edited or
+        provisioned; otherwise a per_item cycle would reuse an answer from before its last PUT"""
+        cache = getattr(self._cycle, 'deps', None)
+        if not cache:
+            return
+        gone = set(rs_hrefs)
+        for key in [k for k in cache if (k in gone if isinstance(k, str) else not gone.isdisjoint(k))]:
+            del cache[key]
+
+    def _lookup_dependencies(self, rs_hrefs):
+        """{obj_type: set(href)} needed to provision rs_hrefs; None when the lookup failed"""
+        cache = getattr(self._cycle, 'deps', None)
+        key = rs_hrefs[0] if len(rs_hrefs) == 1 else frozenset(rs_hrefs)
+        if cache is not None and key in cache:
+            return cache[key]
+
+        deps: Dict[str, set] = {}
+        missing = rs_hrefs
+        if cache is not None and len(rs_hrefs) > 1:
+            # Rulesets already looked up on their own this cycle need no second call
+            missing = [h for h in rs_hrefs if h not in cache]
+            for h in rs_hrefs:
+                if h in cache:
+                    for obj_type, hrefs in cache[h].items():
+                        deps.setdefault(obj_type, set()).update(hrefs)
+
+        if missing:
+            org = self.cfg.config['org_id']
+            dep_payload = {"change_subset": {"rule_sets": [{"href": h} for h in missing]}}
+            dep_res = self._api_post(f"/orgs/{org}/sec_policy/draft/dependencies", dep_payload)
+            if not dep_res or dep_res.status_code != 200:
+                return None
+            found = dep_res.json() or {}
+            fetched = {}
+            for obj_type in self.DEPENDENCY_TYPES:
+                hrefs = {item['href'] for item in found.get(obj_type) or () if item.get('href')}
+                if hrefs:
+                    fetched[obj_type] = hrefs
+                    deps.setdefault(obj_type, set()).update(hrefs)
+            if cache is not None:
+                cache[missing[0] if len(missing) == 1 else frozenset(missing)] = fetched
+
+        if cache is not None:
+            cache[key] = deps
+        return deps
+
+    def _build_change_subset(self, rs_hrefs):
+        """Discover the dependencies of the given rulesets and merge them into one change_subset"""
+        rs_hrefs = list(dict.fromkeys(rs_hrefs))
+        subset = {"rule_sets": set(rs_hrefs)}
+        deps = self._lookup_dependencies(rs_hrefs)
+        for obj_type, hrefs in (deps or {}).items():
+            subset.setdefault(obj_type, set()).update(hrefs)
+        return {obj_type: [{"href": h} for h in sorted(hrefs)] for obj_type, hrefs in subset.items()}
+
+    def _commit_change_subset(self, change_subset, label):
+        """Provision a change_subset as a single policy version"""
         org = self.cfg.config['org_id']
-        
-        # Step 1: Check what dependencies this ruleset needs
-        dep_payload = {"change_subset": {"rule_sets": [{"href": rs_href}]}}
-        dep_res = self._api_post(f"/orgs/{org}/sec_policy/draft/dependencies", dep_payload)
-        
-        # Step 2: Build complete change_subset including all dependencies
-        final_subset = {"rule_sets": [{"href": rs_href}]}
-        
-        if dep_res and dep_res.status_code == 200:
-            deps = dep_res.json()
-            # Merge any dependent objects into the change_subset
-            for obj_type in ['rule_sets', 'ip_lists', 'services', 'label_groups', 
-                             'virtual_services', 'firewall_settings', 'enforcement_boundaries',
-                             'virtual_servers', 'secure_connect_gateways']:
-                dep_items = deps.get(obj_type, [])
-                if dep_items:
-                    existing = final_subset.get(obj_type, [])
-                    existing_hrefs = {item['href'] for item in existing}
-                    for item in dep_items:
-                        if item.get('href') and item['href'] not in existing_hrefs:
-                            existing.append({"href": item['href']})
-                    final_subset[obj_type] = existing
-        
-        # Step 3: Provision with full dependency set
         payload = {
             "update_description": "Auto-Scheduler: Status/Note Update", 
-            "change_subset": final_subset
+            "change_subset": change_subset
         }
+        started = time.perf_counter()
         res = self._api_post(f"/orgs/{org}/sec_policy", payload)
-        if res and res.status_code == 201:
+        PROVISION_LATENCY.observe(time.perf_counter() - started)
+        ok = bool(res and res.status_code == 201)
+        PROVISIONS.inc(result='ok' if ok else 'failed')
+        if ok:
+            self._forget_dependencies(item['href'] for item in change_subset.get('rule_sets', ()))
             return True
         err = res.text if res else "Connection Error"
-        print(f"{Colors.RED}[PROVISION FAILED] RuleSet {extract_id(rs_href)}: {err}{Colors.RESET}")
+        print(f"{Colors.RED}[PROVISION FAILED] {label}: {err}{Colors.RESET}")
         return False
 
-    def update_rule_note(self, href, schedule_info, remove=False):
-        draft_href = href.replace("/active/", "/draft/")
-        res = self._api_get(draft_href)
-        if not res or res.status_code != 200: 
-            return False
-            
-        data = res.json()
-        current_desc = data.get('description', '') or ''
-        
+    def provision_changes(self, rs_href):
+        """Dependency-aware provisioning: discovers required dependencies first"""
+        final_subset = self._build_change_subset([rs_href])
+        return self._commit_change_subset(final_subset, f"RuleSet {extract_id(rs_href)}")
+
+    def provision_batch(self, rs_hrefs, chunk_size=None):
+        """Provision many rulesets with one commit per chunk.
+        A failed chunk falls back to per-ruleset commits; returns the ruleset HREFs that still failed."""
+        rs_hrefs = list(dict.fromkeys(rs_hrefs))
+        if chunk_size is None:
+            chunk_size = int(self.cfg.config.get('provision_chunk_size', 100))
+        chunk_size = max(1, chunk_size)
+        failed = []
+        for i in range(0, len(rs_hrefs), chunk_size):
+            chunk = rs_hrefs[i:i + chunk_size]
+            subset = self._build_change_subset(chunk)
+            if self._commit_change_subset(subset, f"Batch of {len(chunk)} RuleSet(s)"):
+                continue
+            if len(chunk) == 1:
+                failed.extend(chunk)
+                continue
+            for rs in chunk:
+                if not self.provision_changes(rs):
+                    failed.append(rs)
+        return failed
+
+    @staticmethod
+    def _noted_description(current_desc, schedule_info, remove=False):
+        """Description with any [📅 ...]/[⏳ ...] tag replaced by schedule_info (or dropped)"""
         clean_desc = re.sub(r'\s*\[📅[^\]]*\]', '', current_desc)
         clean_desc = re.sub(r'\s*\[⏳[^\]]*\]', '', clean_desc)
         clean_desc = clean_desc.strip()
@@ -373,27 +2873,104 @@ class PCEClient:
         new_desc = clean_desc
         if not remove:
             new_desc = f"{clean_desc}\n{schedule_info}".strip() if clean_desc else schedule_info
-        
-        if new_desc == current_desc: 
-            return True
+        return new_desc
 
-        put_res = self._api_put(draft_href, {"description": new_desc})
-        if put_res and put_res.status_code == 204:
-            rs_href = "/".join(draft_href.split("/")[:7])
-            return self.provision_changes(rs_href)
-        return False
+    def update_rule_note(self, href, schedule_info, remove=False):
+        return self.update_rule_notes({href: (schedule_info, remove)})[href]
+
+    def update_rule_notes(self, notes, max_workers=None):
+        """Bulk note update. notes is {href: (schedule_info, remove)}.
+        Descriptions are read and rewritten on a bounded worker pool (PUT only when the text
+        changes), then the affected rulesets are provisioned together. Returns {href: success}."""
+        if not notes:
+            return {}
+        results, by_ruleset = self._stage_rule_notes(notes, max_workers)
+        self._forget_dependencies(by_ruleset)
+        failed_rs = set(self.provision_batch(list(by_ruleset))) if by_ruleset else set()
+        for rs_href in failed_rs:
+            for h in by_ruleset[rs_href]:
+                results[h] = False
+        return results
+
+    def _stage_rule_notes(self, notes, max_workers=None):
+        """Draft half of update_rule_notes: -> ({href: success}, {ruleset href: [hrefs]} to provision)"""
+        if max_workers is None:
+            max_workers = int(self.cfg.config.get('check_concurrency', 8))
+
+        def rewrite(href):
+            """-> (success, ruleset href to provision or None)"""
+            draft_href = href.replace("/active/", "/draft/")
+            res = self._api_get(draft_href)
+            if not res or res.status_code != 200: 
+                return False, None
+            current_desc = res.json().get('description', '') or ''
+            schedule_info, remove = notes[href]
+            new_desc = self._noted_description(current_desc, schedule_info, remove)
+            if new_desc == current_desc: 
+                return True, None
+            put_res = self._api_put(draft_href, {"description": new_desc})
+            if put_res and put_res.status_code == 204:
+                return True, ruleset_href(draft_href)
+            return False, None
 
-    def toggle_and_provision(self, href, target_enabled, is_ruleset=False):
+        hrefs = list(notes)
+        workers = max(1, min(int(max_workers), len(hrefs)))
+        if workers == 1:
+            outcomes = [rewrite(h) for h in hrefs]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as ex:
+                outcomes = list(ex.map(rewrite, hrefs))
+
+        results = {}
+        by_ruleset = {}
+        for href, (ok, rs_href) in zip(hrefs, outcomes):
+            results[href] = ok
+            if rs_href:
+                by_ruleset.setdefault(rs_href, []).append(href)
+        return results, by_ruleset
+
+    def toggle_and_provision(self, href, target_enabled, is_ruleset=False, note=None):
+        """Toggle one rule/ruleset and provision it; `note` (schedule_info, remove) also
+        rewrites its description in the same commit"""
         draft_href = href.replace("/active/", "/draft/")
         
         put_res = self._api_put(draft_href, {"enabled": target_enabled})
         if not put_res or put_res.status_code != 204:
             print(f"{Colors.RED}[UPDATE FAILED] Target: {extract_id(href)}{Colors.RESET}")
             return False
+        if note is not None:
+            self._stage_rule_notes({href: note}, max_workers=1)
             
-        rs_href = draft_href if is_ruleset else "/".join(draft_href.split("/")[:7])
+        rs_href = draft_href if is_ruleset else ruleset_href(draft_href)
+        self._forget_dependencies([rs_href])
         return self.provision_changes(rs_href)
 
+    def toggle_batch(self, items, chunk_size=None, notes=None):
+        """Apply many (href, target_enabled, is_ruleset) toggles: all draft PUTs first,
+        then one dependency-merged provision per chunk. `notes` ({href: (schedule_info, remove)})
+        are rewritten as drafts too and go out in the same commits. Returns {href: success}
+        for the toggles."""
+        results = {}
+        by_ruleset = {}
+        for href, target_enabled, is_ruleset in items:
+            draft_href = href.replace("/active/", "/draft/")
+            put_res = self._api_put(draft_href, {"enabled": target_enabled})
+            if not put_res or put_res.status_code != 204:
+                print(f"{Colors.RED}[UPDATE FAILED] Target: {extract_id(href)}{Colors.RESET}")
+                results[href] = False
+                continue
+            rs_href = draft_href if is_ruleset else ruleset_href(draft_href)
+            by_ruleset.setdefault(rs_href, []).append(href)
+        noted = self._stage_rule_notes(notes)[1] if notes else {}
+
+        rulesets = list(by_ruleset) + [rs for rs in noted if rs not in by_ruleset]
+        self._forget_dependencies(rulesets)
+        failed_rs = set(self.provision_batch(rulesets, chunk_size)) if rulesets else set()
+        for rs_href, hrefs in by_ruleset.items():
+            for h in hrefs:
+                results[h] = rs_href not in failed_rs
+        return results
+
     def get_live_item(self, href):
         """Try both active and draft paths to find the item"""
         # Try active first (most common for status checks)
@@ -409,6 +2986,73 @@ class PCEClient:
                 return res
         return res  # return last response for error handling
 
+    def get_live_items(self, hrefs, max_workers=8):
+        """get_live_item for many HREFs across a bounded worker pool; returns {href: response}"""
+        hrefs = list(dict.fromkeys(hrefs))
+        if not hrefs:
+            return {}
+        workers = max(1, min(int(max_workers), len(hrefs)))
+        if workers == 1:
+            return {h: self.get_live_item(h) for h in hrefs}
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            return dict(zip(hrefs, ex.map(self.get_live_item, hrefs)))
+
+    @staticmethod
+    def _index_live_ruleset(res):
+        """Index a ruleset GET response and its embedded rules by draft HREF"""
+        index = {}
+        if not res or res.status_code != 200:
+            return index
+        rs = res.json()
+        if not rs.get('href'):
+            return index
+        index[rs['href'].replace("/active/", "/draft/")] = rs
+        for r in rs.get('rules', []):
+            if r.get('href'):
+                index[r['href'].replace("/active/", "/draft/")] = r
+        return index
+
+    def iter_live_states(self, hrefs, max_workers=8):
+        """get_live_states, yielded progressively as {href: obj or None} batches: one per ruleset
+        as its GET completes, then one per HREF missing from its ruleset (single GET fallback)"""
+        by_ruleset = {}
+        for h in dict.fromkeys(hrefs):
+            by_ruleset.setdefault(ruleset_href(h), []).append(h)
+        if not by_ruleset:
+            return
+        workers = max(1, min(int(max_workers), len(by_ruleset)))
+        missing = []
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            futures = {ex.submit(self.get_live_item, rs): rs for rs in by_ruleset}
+            try:
+                for fut in as_completed(futures):
+                    index = self._index_live_ruleset(fut.result())
+                    found = {}
+                    for h in by_ruleset[futures[fut]]:
+                        obj = index.get(h.replace("/active/", "/draft/"))
+                        if obj is None:
+                            missing.append(h)
+                        else:
+                            found[h] = obj
+                    if found:
+                        yield found
+                futures = {ex.submit(self.get_live_item, h): h for h in missing}
+                for fut in as_completed(futures):
+                    res = fut.result()
+                    yield {futures[fut]: res.json() if res and res.status_code == 200 else None}
+            finally:
+                # Consumer went away (e.g. a closed stream): drop the queued GETs
+                for fut in futures:
+                    fut.cancel()
+
+    def get_live_states(self, hrefs, max_workers=8):
+        """Live objects for many HREFs: answered from a per-ruleset snapshot, with a
+        single get_live_item only for HREFs missing from it. Returns {href: obj or None}"""
+        states = dict.fromkeys(hrefs)
+        for batch in self.iter_live_states(hrefs, max_workers=max_workers):
+            states.update(batch)
+        return states
+
     def get_provision_state(self, href):
         """Check provision state: 'active' if provisioned, 'draft' if draft-only, 'unknown' on error"""
         active_href = href.replace("/draft/", "/active/")
@@ -425,6 +3069,85 @@ class PCEClient:
 # ==========================================
 # 5. Schedule Engine (Core Logic)
 # ==========================================
+CHECK_DURATION = METRICS.histogram('illumio_check_duration_seconds',
+                                   'Check cycle duration (scope "full" = every schedule, "partial" = due edges only)',
+                                   ('scope',), buckets=(.1, .25, .5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800))
+TOGGLES = METRICS.counter('illumio_toggles_total', 'Rule/ruleset state changes pushed by the engine', ('result',))
+TOGGLE_LAG = METRICS.histogram('illumio_toggle_lag_seconds',
+                               'Delay from the scheduled window edge (or expiry) to the successful toggle',
+                               buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 86400))
+
+class ActuationPipeline:
+    """Bounded work queue between the check evaluator and a pool of actuator threads.
+
+    Items are submitted per ruleset and applied under that ruleset's lock, so two commits never
+    race on one ruleset while independent rulesets are provisioned in parallel. A full queue
+    blocks submit(); that wait is the backpressure reported in `stats`."""
+
+    def __init__(self, apply, workers: int = 4, max_queue: int = 32,
+                 locks: Optional[Dict[str, threading.Lock]] = None):
+        workers, max_queue = max(1, workers), max(1, max_queue)
+        self._apply = apply
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._locks: Dict[str, threading.Lock] = locks if locks is not None else {}
+        self._lock = threading.Lock()
+        self.results: Dict[str, bool] = {}
+        self.stats: Dict[str, Any] = {'workers': workers, 'queue_size': max_queue, 'items': 0, 'max_depth': 0,
+                                      'blocked_submits': 0, 'submit_wait_ms': 0.0, 'busy_ms': 0.0,
+                                      'max_latency_ms': 0.0}
+        self._threads = [threading.Thread(target=self._run, name=f"actuator-{i}", daemon=True)
+                         for i in range(workers)]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, rs_href: str, changes: List[tuple]):
+        """Queue one ruleset's (href, target, c) changes; blocks while the queue is full"""
+        queued_at = time.perf_counter()
+        try:
+            self._queue.put_nowait((rs_href, changes, queued_at))
+            blocked = False
+        except queue.Full:
+            self._queue.put((rs_href, changes, queued_at))
+            blocked = True
+        with self._lock:
+            st = self.stats
+            st['items'] += 1
+            st['max_depth'] = max(st['max_depth'], self._queue.qsize())
+            if blocked:
+                st['blocked_submits'] += 1
+                st['submit_wait_ms'] += (time.perf_counter() - queued_at) * 1000
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            rs_href, changes, queued_at = job
+            started = time.perf_counter()
+            # setdefault is atomic, so pipelines sharing `locks` agree on one lock per ruleset
+            with self._locks.setdefault(rs_href, threading.Lock()):
+                try:
+                    results = self._apply(changes)
+                except Exception as e:
+                    print(f"{Colors.RED}[ACTUATOR ERROR] 規則集 {extract_id(rs_href)}: {e}{Colors.RESET}")
+                    results = {h: False for h, _, _ in changes}
+            done = time.perf_counter()
+            with self._lock:
+                self.results.update(results)
+                self.stats['busy_ms'] += (done - started) * 1000
+                self.stats['max_latency_ms'] = max(self.stats['max_latency_ms'], (done - queued_at) * 1000)
+
+    def close(self) -> Dict[str, bool]:
+        """Wait until every submitted item is applied; returns {href: success}"""
+        for _ in self._threads:
+            self._queue.put(None)
+        for t in self._threads:
+            t.join()
+        for key in ('submit_wait_ms', 'busy_ms', 'max_latency_ms'):
+            self.stats[key] = round(self.stats[key], 1)
+        return self.results
+
+
 class ScheduleEngine:
     """Analyzes schedule timings and executes API enforcement actions upon matching."""
     
@@ -432,25 +3155,155 @@ class ScheduleEngine:
         "mon": "monday", "tue": "tuesday", "wed": "wednesday", 
         "thu": "thursday", "fri": "friday", "sat": "saturday", "sun": "sunday"
     }
+    WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
 
     def __init__(self, db: ScheduleDB, pce_client: PCEClient):
         self.db: ScheduleDB = db
         self.pce: PCEClient = pce_client
+        self._check_lock = threading.Lock()
+        # draft ruleset HREF -> lock held by the actuator committing it (provision_mode 'pipeline')
+        self._ruleset_locks: Dict[str, threading.Lock] = {}
+        self.last_pipeline_stats: Optional[Dict[str, Any]] = None
+        # Seconds between full checks as run by the daemon (None when nothing runs them periodically)
+        self.interval: Optional[float] = None
+        self._cycle_started: Optional[float] = None
+        self._last_cycle: Optional[Tuple[float, float]] = None  # last full check: (finished at, duration)
+        # HREFs the last check could not read or toggle (retried by the event-driven daemon)
+        self.last_failed: List[str] = []
+        METRICS.collector('engine', self._metrics)
+
+    def _metrics(self):
+        started, last = self._cycle_started, self._last_cycle
+        out = [('illumio_check_running_seconds', 'gauge', 'Time the check cycle in progress has been running (0 when idle)',
+                [({}, round(time.time() - started, 3) if started else 0)])]
+        if self.interval:
+            out.append(('illumio_check_interval_seconds', 'gauge', 'Configured time between full check cycles',
+                        [({}, self.interval)]))
+        if last:
+            out.append(('illumio_check_last_run_timestamp_seconds', 'gauge', 'Unix time the last full check cycle finished',
+                        [({}, round(last[0], 3))]))
+            out.append(('illumio_check_last_duration_seconds', 'gauge', 'Duration of the last full check cycle',
+                        [({}, last[1])]))
+        stats = self.last_pipeline_stats
+        if stats:
+            out.append(('illumio_pipeline_last_cycle', 'gauge', 'Actuation pipeline figures of the last pipelined check',
+                        [({'stat': k}, stats[k]) for k in ('items', 'max_depth', 'blocked_submits', 'submit_wait_ms',
+                                                           'busy_ms', 'max_latency_ms')]))
+        return out
 
     @staticmethod
     def normalize_day(day_str: str) -> str:
         d = day_str.lower().strip()
         return ScheduleEngine.DAY_MAP.get(d[:3], d)
 
-    def check(self, silent: bool = False) -> List[str]:
+    @classmethod
+    def next_transition(cls, c: Dict[str, Any], after: datetime.datetime) -> Optional[datetime.datetime]:
+        """Next moment strictly after `after` at which this schedule's target state can change"""
+        try:
+            if c.get('type') == 'one_time':
+                expire_dt = parse_expire_at(c['expire_at'])
+                return expire_dt if expire_dt > after else None
+            if c.get('type') != 'recurring':
+                return None
+            days = {cls.WEEKDAYS.index(d) for d in (cls.normalize_day(x) for x in c['days']) if d in cls.WEEKDAYS}
+            sh, sm = (int(x) for x in c['start'].split(':'))
+            eh, em = (int(x) for x in c['end'].split(':'))
+        except (KeyError, ValueError, TypeError, AttributeError):
+            return None
+        start_min, end_min = sh * 60 + sm, eh * 60 + em
+        if not days or start_min == end_min:
+            return None
+
+        best = None
+        base = datetime.datetime.combine(after.date(), datetime.time())
+        # Yesterday is included so an overnight window that is still open yields its end edge
+        for offset in range(-1, 8):
+            day = base + datetime.timedelta(days=offset)
+            if day.weekday() not in days:
+                continue
+            start_dt = day + datetime.timedelta(minutes=start_min)
+            end_dt = day + datetime.timedelta(minutes=end_min + (1440 if end_min < start_min else 0))
+            for edge in (start_dt, end_dt):
+                if edge > after and (best is None or edge < best):
+                    best = edge
+        return best
+
+    @classmethod
+    def previous_transition(cls, c: Dict[str, Any], before: datetime.datetime) -> Optional[datetime.datetime]:
+        """Latest edge at or before `before` within the past week (what a toggle now is late for)"""
+        edge, at = None, before - datetime.timedelta(days=8)
+        while True:
+            nxt = cls.next_transition(c, at)
+            if nxt is None or nxt > before:
+                return edge
+            edge = at = nxt
+
+    def run_event_driven(self, reconcile_interval: int = 3600, max_sleep: float = 60.0):
+        """Daemon loop that sleeps until the next schedule edge instead of polling.
+        A full check() still runs every reconcile_interval seconds to repair drift.
+        Edges are tracked from the last processed moment, so one that comes due while a check
+        runs is handled right after it; schedules whose check failed are retried with backoff."""
+        scheduler = TransitionScheduler()
+        next_reconcile = time.monotonic()
+        processed = datetime.datetime.now()
+        while True:
+            ran, due = False, None
+            try:
+                # Pick up schedules added or removed by the GUI/CLI in another process (reloads on change only)
+                scheduler.rebuild(self.db.get_all(), processed)
+                cutoff = datetime.datetime.now()
+                if time.monotonic() >= next_reconcile:
+                    ran = True
+                    self.check(silent=True)
+                    next_reconcile = time.monotonic() + reconcile_interval
+                else:
+                    due = scheduler.pop_due(cutoff)
+                    if due:
+                        ran = True
+                        self.check(silent=True, hrefs=due)
+                processed = cutoff
+                if ran:
+                    scheduler.settle(due, self.last_failed, datetime.datetime.now())
+            except Exception as e:
+                import traceback
+                print(f"[DAEMON ERROR] {e}")
+                traceback.print_exc()
+                if due:
+                    scheduler.retry(due, datetime.datetime.now())
+                    processed = cutoff
+                else:
+                    next_reconcile = time.monotonic() + min(reconcile_interval, TransitionScheduler.RETRY_BASE)
+            if ran:
+                continue  # Edges that came due during the check are popped on the next pass
+
+            wait = min(max_sleep, next_reconcile - time.monotonic())
+            edge = scheduler.next_edge()
+            if edge is not None:
+                wait = min(wait, (edge - datetime.datetime.now()).total_seconds())
+            time.sleep(max(0.0, wait))
+
+    def check(self, silent: bool = False, hrefs: Optional[List[str]] = None) -> List[str]:
+        """Evaluate schedules and toggle what changed; `hrefs` limits the cycle to those schedules.
+        Cycles are serialized: a GUI "Run Check Now" waits for one already in progress."""
+        with self._check_lock:
+            self._cycle_started = time.time()
+            try:
+                return self._check(silent, hrefs)
+            finally:
+                self._cycle_started = None
+
+    def _check(self, silent: bool, hrefs: Optional[List[str]]) -> List[str]:
         if not self.pce.cfg.is_ready(): 
+            self.last_failed = list(hrefs or [])
             return []
             
-        db_data = self.db.get_all()
         now = datetime.datetime.now()
-        curr_t = now.strftime("%H:%M")
-        curr_d = now.strftime("%A").lower()
-        prev_d = (now - datetime.timedelta(days=1)).strftime("%A").lower()
+        # Schedules and their evaluation come from the same snapshot, so entries added meanwhile
+        # wait for the next cycle instead of looking malformed
+        db_data, targets, expired = self.db.evaluate(now)
+        if hrefs is not None:
+            db_data = {h: db_data[h] for h in hrefs if h in db_data}
+        checked = len(db_data)
         
         logs = []
         def log(msg):
@@ -459,51 +3312,215 @@ class ScheduleEngine:
 
         log(f"[{now.strftime('%Y-%m-%d %H:%M:%S')}] 檢查排程...")
         
+        t_start = time.perf_counter()
         expired_hrefs = []
+        toggles = []
+        decisions = []
 
+        # Phase 1: classify every schedule by the precompiled index evaluation above (no API calls)
+        expired = set(expired)
         for href, c in list(db_data.items()):
-            is_allow = (c.get('action', 'allow') == 'allow')
-            in_window = False
-            target = False
-            
-            if c['type'] == 'recurring':
-                days_list = [self.normalize_day(d) for d in c['days']]
-                day_match = curr_d in days_list
-                prev_day_match = prev_d in days_list
-                start_t, end_t = c['start'], c['end']
-                
-                if start_t <= end_t:
-                    in_window = day_match and (start_t <= curr_t < end_t)
-                else:
-                    in_window = (day_match and curr_t >= start_t) or \
-                                (prev_day_match and curr_t < end_t)
-                
-                target = in_window if is_allow else (not in_window)
-
-            elif c['type'] == 'one_time':
-                expire_dt = datetime.datetime.fromisoformat(c['expire_at'])
-                if now > expire_dt:
-                    log(f"{Colors.RED}[EXPIRED] {c['name']} (ID:{extract_id(href)}) 已過期。{Colors.RESET}")
-                    self.pce.toggle_and_provision(href, False, c.get('is_ruleset'))
-                    self.pce.update_rule_note(href, "", remove=True)
-                    expired_hrefs.append(href)
-                    continue
-                else:
-                    target = True
+            if href in expired:
+                log(f"{Colors.RED}[EXPIRED] {c['name']} (ID:{extract_id(href)}) 已過期。{Colors.RESET}")
+                toggles.append((href, False, c))
+                expired_hrefs.append(href)
+            elif href in targets:
+                decisions.append((href, c, targets[href]))
+            else:
+                log(f"{Colors.YELLOW}[SKIP] 排程格式錯誤 (ID:{extract_id(href)}){Colors.RESET}")
+        t_eval = time.perf_counter()
 
-            res = self.pce.get_live_item(href)
-            if res and res.status_code == 200:
-                curr_status = res.json().get('enabled')
+        concurrency = int(self.pce.cfg.config.get('check_concurrency', 8))
+        pipeline = self.pce.cfg.config.get('provision_mode', 'batch') == 'pipeline'
+        unread = []
+        if pipeline:
+            # Phases 2-3 overlapped: each ruleset's changes are applied as soon as its state arrives
+            results, stats = self._run_pipeline(decisions, toggles, expired_hrefs, concurrency, log, unread)
+            t_fetch = time.perf_counter()
+        else:
+            # Phase 2: fetch live state concurrently, one GET per owning ruleset
+            live = self.pce.get_live_states([h for h, _, _ in decisions], max_workers=concurrency)
+            unread = [h for h, _, _ in decisions if live.get(h) is None]
+            t_fetch = time.perf_counter()
+
+            # Phase 3: compare in DB order so the toggle list stays deterministic
+            toggles.extend(self._changed(decisions, live, log))
+
+            # One dependency lookup per ruleset per cycle
+            with self.pce.dependency_cycle():
+                results = self._apply_toggles(toggles, expired_hrefs, log)
+        self.last_failed = unread + [h for h, ok in results.items() if not ok]
+        self.db.delete_many(expired_hrefs)
+        if expired_hrefs:
+            log(f"{Colors.YELLOW}[CLEANUP] 已移除 {len(expired_hrefs)} 筆過期排程。{Colors.RESET}")
+        t_end = time.perf_counter()
+        CHECK_DURATION.observe(t_end - t_start, scope='full' if hrefs is None else 'partial')
+        if hrefs is None:
+            self._last_cycle = (time.time(), t_end - t_start)
+
+        n_rulesets = len({ruleset_href(h) for h, _, _ in decisions})
+        if pipeline:
+            log(f"{Colors.GREY}[TIMING] 評估 {(t_eval - t_start) * 1000:.1f} ms | "
+                f"讀取並套用 {(t_fetch - t_eval) * 1000:.1f} ms ({len(decisions)} 筆 / {n_rulesets} 規則集, 並行 {concurrency}) | "
+                f"總計 {(t_end - t_start) * 1000:.1f} ms{Colors.RESET}")
+            log(f"{Colors.GREY}[PIPELINE] {stats['items']} 項 / {stats['workers']} 執行緒 | "
+                f"佇列峰值 {stats['max_depth']}/{stats['queue_size']} | 評估端等待 {stats['blocked_submits']} 次 "
+                f"{stats['submit_wait_ms']:.1f} ms | 執行緒忙碌 {stats['busy_ms']:.1f} ms | "
+                f"最長延遲 {stats['max_latency_ms']:.1f} ms{Colors.RESET}")
+        else:
+            log(f"{Colors.GREY}[TIMING] 評估 {(t_eval - t_start) * 1000:.1f} ms | "
+                f"讀取狀態 {(t_fetch - t_eval) * 1000:.1f} ms ({len(decisions)} 筆 / {n_rulesets} 規則集, 並行 {concurrency}) | "
+                f"套用 {(t_end - t_fetch) * 1000:.1f} ms | 總計 {(t_end - t_start) * 1000:.1f} ms{Colors.RESET}")
+        EVENTS.publish('check', at=now.isoformat(timespec='seconds'), checked=checked,
+                       toggled=sum(1 for h, ok in results.items() if ok and h not in expired_hrefs),
+                       failed=[h for h, ok in results.items() if not ok],
+                       expired=expired_hrefs, duration_ms=round((t_end - t_start) * 1000, 1),
+                       pipeline=stats if pipeline else None)
+        return logs
+
+    @staticmethod
+    def _changed(decisions, live, log):
+        """(href, target, c) for each decision whose live state differs from its target"""
+        toggles = []
+        for href, c, target in decisions:
+            obj = live.get(href)
+            if obj is not None:
+                curr_status = obj.get('enabled')
                 if curr_status != target:
                     r_name = c.get('detail_name', c['name'])
                     status_str = f"{Colors.GREEN}Enabled{Colors.RESET}" if target else f"{Colors.RED}Disabled{Colors.RESET}"
                     log(f"[ACTION] 切換狀態 -> {status_str} (ID: {Colors.CYAN}{extract_id(href)}{Colors.RESET}) - {r_name}")
-                    if self.pce.toggle_and_provision(href, target, c.get('is_ruleset')):
-                        log(f"{Colors.GREEN}[SUCCESS] 已提交發布{Colors.RESET}")
+                    toggles.append((href, target, c))
+        return toggles
 
-        for h in expired_hrefs: 
-            self.db.delete(h)
-        if expired_hrefs:
-            log(f"{Colors.YELLOW}[CLEANUP] 已移除 {len(expired_hrefs)} 筆過期排程。{Colors.RESET}")
-            
-        return logs
+    def _run_pipeline(self, decisions, toggles, expired_hrefs, concurrency, log, unread):
+        """provision_mode 'pipeline': the evaluator streams each ruleset's live state, diffs it and
+        submits that ruleset's changes to an ActuationPipeline; expired schedules go first.
+        Appends the changes to `toggles` and HREFs whose state could not be read to `unread`;
+        returns ({href: success}, pipeline stats)."""
+        cfg = self.pce.cfg.config
+        expired = set(expired_hrefs)
+
+        def actuate(changes):
+            # Actuator threads keep their own dependency cache
+            with self.pce.dependency_cycle():
+                return self._apply_toggles(changes, expired, log)
+
+        pipeline = ActuationPipeline(actuate, workers=int(cfg.get('pipeline_workers', 4)),
+                                     max_queue=int(cfg.get('pipeline_queue_size', 32)), locks=self._ruleset_locks)
+
+        def submit(changes):
+            by_ruleset = {}
+            for change in changes:
+                by_ruleset.setdefault(self._commit_ruleset(change), []).append(change)
+            for rs_href, items in by_ruleset.items():
+                pipeline.submit(rs_href, items)
+
+        try:
+            submit(toggles)
+            by_href = {href: (href, c, target) for href, c, target in decisions}
+            for batch in self.pce.iter_live_states(list(by_href), max_workers=concurrency):
+                unread.extend(h for h, obj in batch.items() if obj is None)
+                changed = self._changed([by_href[h] for h in batch], batch, log)
+                toggles.extend(changed)
+                submit(changed)
+        finally:
+            results = pipeline.close()
+        self.last_pipeline_stats = pipeline.stats
+        return results, pipeline.stats
+
+    @staticmethod
+    def _commit_ruleset(change):
+        href, _, c = change
+        draft_href = href.replace("/active/", "/draft/")
+        return draft_href if c.get('is_ruleset') else ruleset_href(draft_href)
+
+    def _apply_toggles(self, toggles, expired_hrefs, log):
+        """Push the collected state changes to the PCE, batched unless provision_mode is 'per_item'.
+        Expired schedules lose their note in the same provision as their toggle. Returns {href: success}."""
+        if not toggles:
+            return {}
+        notes = {h: ("", True) for h, _, _ in toggles if h in expired_hrefs}
+        if self.pce.cfg.config.get('provision_mode', 'batch') == 'per_item':
+            results = {}
+            for href, target, c in toggles:
+                results[href] = self.pce.toggle_and_provision(href, target, c.get('is_ruleset'), notes.get(href))
+                if results[href] and href not in expired_hrefs:
+                    log(f"{Colors.GREEN}[SUCCESS] 已提交發布{Colors.RESET}")
+            self._publish_transitions(toggles, expired_hrefs, results)
+            return results
+
+        results = self.pce.toggle_batch([(h, target, c.get('is_ruleset')) for h, target, c in toggles], notes=notes)
+        ok = [h for h, success in results.items() if success]
+        failed = [h for h, success in results.items() if not success]
+        if ok:
+            log(f"{Colors.GREEN}[SUCCESS] 已批次提交發布 ({len(ok)} 筆){Colors.RESET}")
+        for h in failed:
+            log(f"{Colors.RED}[FAILED] 發布失敗 (ID: {extract_id(h)}){Colors.RESET}")
+        self._publish_transitions(toggles, expired_hrefs, results)
+        return results
+
+    @classmethod
+    def _publish_transitions(cls, toggles, expired_hrefs, results):
+        now = datetime.datetime.now()
+        for href, target, c in toggles:
+            ok = results.get(href, False)
+            TOGGLES.inc(result='ok' if ok else 'failed')
+            edge = cls.previous_transition(c, now) if ok else None
+            if edge is not None:
+                TOGGLE_LAG.observe((now - edge).total_seconds())
+            if href not in expired_hrefs:
+                EVENTS.publish('transition', href=href, enabled=target, ok=ok)
+
+
+class TransitionScheduler:
+    """Min-heap of upcoming schedule window edges for the event-driven daemon, plus retries of
+    schedules whose check failed (exponential backoff, given up after RETRY_LIMIT attempts)."""
+
+    RETRY_BASE = 15.0
+    RETRY_CAP = 900.0
+    RETRY_LIMIT = 8
+
+    def __init__(self):
+        self._heap: List[Tuple[datetime.datetime, str]] = []
+        self._retries: Dict[str, Tuple[datetime.datetime, int]] = {}
+
+    def rebuild(self, db_data: Dict[str, Any], after: datetime.datetime):
+        """Each schedule's first edge strictly after `after` (the last processed moment, so edges
+        already at or before now are still due) plus the pending retries"""
+        self._retries = {h: r for h, r in self._retries.items() if h in db_data}
+        heap = [(at, href) for href, (at, _) in self._retries.items()]
+        for href, c in db_data.items():
+            edge = ScheduleEngine.next_transition(c, after)
+            if edge is not None:
+                heap.append((edge, href))
+        heapq.heapify(heap)
+        self._heap = heap
+
+    def retry(self, hrefs: Iterable[str], now: datetime.datetime):
+        for href in hrefs:
+            attempts = self._retries.get(href, (now, 0))[1] + 1
+            if attempts > self.RETRY_LIMIT:
+                print(f"{Colors.RED}[RETRY] 放棄重試 (ID: {extract_id(href)})，等待下次完整檢查{Colors.RESET}")
+                self._retries.pop(href, None)
+                continue
+            at = now + datetime.timedelta(seconds=min(self.RETRY_CAP, self.RETRY_BASE * 2 ** (attempts - 1)))
+            self._retries[href] = (at, attempts)
+            heapq.heappush(self._heap, (at, href))
+
+    def settle(self, checked: Optional[List[str]], failed: List[str], now: datetime.datetime):
+        """Record a check of `checked` (None = every schedule): failures are retried, the rest cleared"""
+        failed = set(failed)
+        for href in (list(self._retries) if checked is None else checked):
+            if href not in failed:
+                self._retries.pop(href, None)
+        self.retry(failed, now)
+
+    def next_edge(self) -> Optional[datetime.datetime]:
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: datetime.datetime) -> List[str]:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due.append(heapq.heappop(self._heap)[1])
+        return list(dict.fromkeys(due))
@@ -5,9 +5,10 @@ Optional dependency: pip install flask
 import json
 import re
 import threading
+import time
 import webbrowser
 from datetime import datetime
-from src.core import truncate, extract_id
+from src.core import truncate, extract_id, parse_expire_at, EventSpool, EVENTS, METRICS, METRICS_CONTENT_TYPE
 import src.i18n as i18n
 
 # ==========================================
@@ -33,30 +34,36 @@ def create_app(core_system):
         kw = request.args.get('q', '')
         page = int(request.args.get('page', 1))
         size = int(request.args.get('size', 50))
+        # Pages of one listing share a snapshot version; a refresh in between does not shift them
+        version = request.args.get('version', type=int)
+        version, fetched_at, rs_list = pce.ruleset_snapshot(version)
         if kw:
-            rs_list = pce.search_rulesets(kw)
-        else:
-            rs_list = pce.get_all_rulesets(force_refresh=True)
+            rs_list = pce.search_rulesets(kw, rs_list)
         total = len(rs_list)
         start = (page - 1) * size
         end = start + size
         paginated = rs_list[start:end]
         result = []
         for rs in paginated:
-            href = rs['href']
+            href = rs.href
             st = db.get_schedule_type(rs)
             # update_type: null=provisioned, "create"=new draft, "update"=modified draft
-            ut = rs.get('update_type')
-            prov = 'draft' if ut else 'active'
+            prov = 'draft' if rs.update_type else 'active'
             result.append({
                 'href': href,
                 'id': extract_id(href),
-                'name': rs.get('name',''),
-                'enabled': rs.get('enabled', False),
+                'name': rs.name,
+                'enabled': rs.enabled,
                 'sch': 'star' if st == 1 else ('dot' if st == 2 else ''),
                 'prov': prov,
             })
-        return jsonify({'items': result, 'total': total, 'page': page, 'size': size, 'pages': (total + size - 1) // size})
+        return jsonify({'items': result, 'total': total, 'page': page, 'size': size, 'pages': (total + size - 1) // size,
+                        'version': version, 'age': round(time.time() - fetched_at, 1) if fetched_at else None})
+
+    @app.route('/api/rulesets/refresh', methods=['POST'])
+    def api_rulesets_refresh():
+        ok = pce.refresh_rulesets()
+        return jsonify({'ok': ok, 'version': pce.ruleset_version, 'total': len(pce.ruleset_cache)})
 
     @app.route('/api/rulesets/<rs_id>')
     def api_ruleset_detail(rs_id):
@@ -103,43 +110,98 @@ def create_app(core_system):
         return jsonify({'name': rs['name'], 'href': rs_href, 'rules': rules})
 
     # ── Schedules ──
+    def _schedule_entry(href, c, enabled_status='NA'):
+        is_rs = c.get('is_ruleset', False)
+        entry = {
+            'href': href,
+            'id': extract_id(href),
+            'type': 'RS' if is_rs else 'Rule',
+            'rs_name': c.get('detail_rs', 'Unknown'),
+            'name': c.get('detail_name', c.get('name', '')),
+            'src': 'NA' if is_rs else c.get('detail_src', 'All'),
+            'dst': 'NA' if is_rs else c.get('detail_dst', 'All'),
+            'svc': 'NA' if is_rs else c.get('detail_svc', 'All'),
+            'src_full': 'NA' if is_rs else c.get('detail_src_full', c.get('detail_src', 'All')),
+            'dst_full': 'NA' if is_rs else c.get('detail_dst_full', c.get('detail_dst', 'All')),
+            'svc_full': 'NA' if is_rs else c.get('detail_svc_full', c.get('detail_svc', 'All')),
+            'enabled': enabled_status,
+        }
+        if c.get('type') == 'recurring':
+            entry['action'] = 'ENABLE' if c.get('action') == 'allow' else 'DISABLE'
+            days = c.get('days', [])
+            d_str = 'Everyday' if len(days) == 7 else ','.join([d[:3] for d in days])
+            entry['timing'] = f"{d_str} {c.get('start','')}-{c.get('end','')}"
+        else:
+            entry['action'] = 'EXPIRE'
+            entry['timing'] = c.get('expire_at', '').replace('T', ' ')
+        return entry
+
+    def _live_enabled(obj):
+        return obj.get('enabled', False) if obj else 'NA'
+
+    _PAGE_ARGS = ('limit', 'cursor', 'sort', 'order', 'ruleset', 'type', 'action', 'day', 'in_window', 'expiring_before')
+
+    def _schedule_page():
+        """Apply paging/sort/filter query args: (rows {href: data}, page_info or None).
+        Without any of them the full listing is returned, as before."""
+        args = request.args
+        if not any(k in args for k in _PAGE_ARGS):
+            return db.get_all(), None
+        in_window = args.get('in_window')
+        rows, total, next_cursor = db.query(
+            ruleset=args.get('ruleset'), schedule_type=args.get('type'), action=args.get('action'),
+            day=args.get('day'),
+            in_window=None if in_window is None else in_window.lower() in ('1', 'true', 'yes'),
+            expiring_before=args.get('expiring_before'),
+            sort=args.get('sort', 'ruleset'), descending=args.get('order') == 'desc',
+            cursor=args.get('cursor'), limit=min(args.get('limit', 100, type=int), 1000))
+        return dict(rows), {'total': total, 'next_cursor': next_cursor}
+
     @app.route('/api/schedules')
     def api_schedules():
-        data = db.get_all()
-        result = []
-        core = app.config.get('CORE')
-        for href, c in data.items():
-            is_rs = c.get('is_ruleset', False)
-            
-            enabled_status = 'NA'
-            res = pce.get_live_item(href)
-            if res and res.status_code == 200:
-                enabled_status = res.json().get('enabled', False)
-            
-            entry = {
-                'href': href,
-                'id': extract_id(href),
-                'type': 'RS' if is_rs else 'Rule',
-                'rs_name': c.get('detail_rs', 'Unknown'),
-                'name': c.get('detail_name', c.get('name', '')),
-                'src': 'NA' if is_rs else c.get('detail_src', 'All'),
-                'dst': 'NA' if is_rs else c.get('detail_dst', 'All'),
-                'svc': 'NA' if is_rs else c.get('detail_svc', 'All'),
-                'src_full': 'NA' if is_rs else c.get('detail_src_full', c.get('detail_src', 'All')),
-                'dst_full': 'NA' if is_rs else c.get('detail_dst_full', c.get('detail_dst', 'All')),
-                'svc_full': 'NA' if is_rs else c.get('detail_svc_full', c.get('detail_svc', 'All')),
-                'enabled': enabled_status,
-            }
-            if c.get('type') == 'recurring':
-                entry['action'] = 'ENABLE' if c.get('action') == 'allow' else 'DISABLE'
-                days = c.get('days', [])
-                d_str = 'Everyday' if len(days) == 7 else ','.join([d[:3] for d in days])
-                entry['timing'] = f"{d_str} {c.get('start','')}-{c.get('end','')}"
-            else:
-                entry['action'] = 'EXPIRE'
-                entry['timing'] = c.get('expire_at', '').replace('T', ' ')
-            result.append(entry)
-        return jsonify(result)
+        try:
+            data, page = _schedule_page()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        workers = int(cfg.config.get('check_concurrency', 8))
+        states = pce.get_live_states(list(data), max_workers=workers)
+        items = [_schedule_entry(href, c, _live_enabled(states.get(href))) for href, c in data.items()]
+        if page is None:
+            return jsonify(items)
+        return jsonify({'items': items, **page})
+
+    @app.route('/api/schedules/stream')
+    def api_schedules_stream():
+        """NDJSON: the DB rows first (enabled=null), then {"status": {href: enabled}} lines as each
+        ruleset's live state arrives, then {"done": true}. Accepts the same paging args as /api/schedules."""
+        try:
+            data, page = _schedule_page()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        workers = int(cfg.config.get('check_concurrency', 8))
+
+        def generate():
+            head = {'rows': [_schedule_entry(href, c, None) for href, c in data.items()]}
+            head.update(page or {'total': len(data), 'next_cursor': None})
+            yield json.dumps(head) + '\n'
+            pending = set(data)
+            for batch in pce.iter_live_states(list(data), max_workers=workers):
+                pending.difference_update(batch)
+                yield json.dumps({'status': {h: _live_enabled(obj) for h, obj in batch.items()}}) + '\n'
+            if pending:
+                yield json.dumps({'status': {h: 'NA' for h in pending}}) + '\n'
+            yield json.dumps({'done': True}) + '\n'
+
+        return Response(generate(), mimetype='application/x-ndjson',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+    @app.route('/api/schedules/status', methods=['POST'])
+    def api_schedules_status():
+        """Live enabled state of the given schedule HREFs: {href: true/false/"NA"}"""
+        hrefs = (request.get_json() or {}).get('hrefs') or []
+        workers = int(cfg.config.get('check_concurrency', 8))
+        states = pce.get_live_states(hrefs[:1000], max_workers=workers)
+        return jsonify({h: _live_enabled(obj) for h, obj in states.items()})
 
     @app.route('/api/schedules', methods=['POST'])
     def api_schedule_create():
@@ -181,10 +243,9 @@ def create_app(core_system):
                 days_str = i18n.t('action_everyday') if len(days) == 7 else ','.join([dx[:3] for dx in days])
                 note_msg = f"[📅 {i18n.t('sch_tag_recurring')}: {days_str} {db_entry['start']}-{db_entry['end']} {act_str}]"
             else:
-                from datetime import datetime
                 ex = d.get('expire_at', '').replace(' ', 'T')
-                if len(ex) == 16: ex += ":00Z"
-                datetime.fromisoformat(ex.replace("Z", "+00:00"))
+                if len(ex) == 16: ex += ":00"
+                parse_expire_at(ex)
                 db_entry.update({'type': 'one_time', 'action': 'allow', 'expire_at': ex})
                 note_msg = f"[⏳ {i18n.t('sch_tag_expire')}: {d.get('expire_at')}]"
         except ValueError as e:
@@ -208,15 +269,13 @@ def create_app(core_system):
         hrefs = d.get('hrefs', [])
         if not hrefs:
             return jsonify({'error': 'No hrefs provided'}), 400
-        count = 0
-        for href in hrefs:
-            try:
-                pce.update_rule_note(href, '', remove=True)
-            except Exception:
-                pass
-            db.delete(href)
-            count += 1
-        return jsonify({'ok': True, 'count': count})
+        try:
+            results = pce.update_rule_notes({href: ('', True) for href in hrefs})
+        except Exception:
+            results = {}
+        db.delete_many(hrefs)
+        failed = [extract_id(h) for h in hrefs if not results.get(h)]
+        return jsonify({'ok': True, 'count': len(hrefs), 'note_failed': failed})
 
     # ── Check ──
     @app.route('/api/check', methods=['POST'])
@@ -226,6 +285,52 @@ def create_app(core_system):
         clean_logs = [ansi_re.sub('', l) for l in logs]
         return jsonify({'logs': clean_logs})
 
+    # ── Events (SSE) ──
+    def _client_event(ev):
+        # Changed schedules travel as table rows, so the page patches them without a refetch
+        data = ev['data']
+        if ev['type'] == 'schedules' and 'entries' in data:
+            rows = [_schedule_entry(h, c, None) for h, c in data['entries'].items()]
+            data = {k: v for k, v in data.items() if k != 'entries'}
+            ev = dict(ev, data=dict(data, rows=rows))
+        return ev
+
+    @app.route('/api/events')
+    def api_events():
+        """Server-Sent Events: schedules / labels / rulesets / transition / check events as they happen.
+        Reconnects resume from Last-Event-ID; a subscriber that fell behind gets a 'resync' event."""
+        last_id = request.headers.get('Last-Event-ID', type=int)
+        sub = EVENTS.subscribe(last_id)
+        # Streams end after gui_stream_max_seconds; EventSource reconnects and resumes by event id
+        deadline = time.monotonic() + float(cfg.config.get('gui_stream_max_seconds', 600))
+
+        def generate():
+            try:
+                yield 'retry: 3000\n\n'
+                while not sub.closed:
+                    if sub.overflowed:
+                        sub.overflowed = False
+                        yield 'event: resync\ndata: {}\n\n'
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        return
+                    ev = sub.get(timeout=min(15, left))
+                    if ev is None:
+                        if not sub.closed:
+                            yield ': keepalive\n\n'
+                        continue
+                    yield f"id: {ev['id']}\nevent: {ev['type']}\ndata: {json.dumps(_client_event(ev))}\n\n"
+            finally:
+                EVENTS.unsubscribe(sub)
+
+        return Response(generate(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+    # ── Metrics (Prometheus scrape target) ──
+    @app.route('/metrics')
+    def metrics():
+        return Response(METRICS.render(), content_type=METRICS_CONTENT_TYPE)
+
     # ── Config ──
     @app.route('/api/config', methods=['GET'])
     def api_config_get():
@@ -253,13 +358,14 @@ def create_app(core_system):
         if 'lang' in d:
             i18n.set_lang(d['lang'])
             cfg.save_lang(d['lang'])
-        pce.update_label_cache(silent=True)
+        pce.update_label_cache(silent=True, force=True)
         return jsonify({'ok': True, 'message': 'Configuration saved!'})
 
     # ── Stop ──
     @app.route('/api/stop', methods=['POST'])
     def api_stop():
-        func = request.environ.get('werkzeug.server.shutdown')
+        # Production server: graceful stop hook set by launch_gui; dev server: werkzeug hook or SIGINT
+        func = app.config.get('SERVER_SHUTDOWN') or request.environ.get('werkzeug.server.shutdown')
         if func:
             func()
         else:
@@ -273,15 +379,315 @@ def create_app(core_system):
 # ==========================================
 # Entry Point
 # ==========================================
-def launch_gui(core_system, port=5002):
+_BUSY_RESPONSE = (b'HTTP/1.1 503 Service Unavailable\r\nRetry-After: 1\r\n'
+                  b'Content-Length: 0\r\nConnection: close\r\n\r\n')
+
+
+# Long-lived responses served on their own threads (at most `gui_max_streams` at once), and
+# control requests that must get through even when every pool worker is busy
+STREAM_PATHS = ('/api/events', '/api/schedules/stream')
+CONTROL_PATHS = ('/api/stop',)
+
+
+def make_production_server(app, host, port, cfg):
+    """Threaded WSGI server with a fixed worker pool for `gui_server: "production"`.
+
+    A dispatcher thread peeks at the request line of each accepted connection: STREAM_PATHS
+    get a thread of their own (beyond `gui_max_streams` open streams: 503), CONTROL_PATHS
+    always get one, everything else waits in a queue of `gui_backlog` for one of `gui_workers`
+    threads (beyond that: 503). So open GUI tabs never tie up the pool and /api/stop always
+    runs. A request that stalls mid-read is dropped after `gui_request_timeout_seconds`.
+
+    HTTP/1.1 connections are kept alive after responses with a Content-Length: the worker
+    serves one request and hands the connection back to the dispatcher, which waits up to
+    `gui_keepalive_seconds` for the next request line. Call drain() after serve_forever() returns."""
+    import io
+    import queue
+    import selectors
+    import socket
+    from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+    workers = max(1, int(cfg.config.get('gui_workers', 16)))
+    backlog = max(1, int(cfg.config.get('gui_backlog', 64)))
+    max_streams = max(1, int(cfg.config.get('gui_max_streams', 32)))
+    request_timeout = float(cfg.config.get('gui_request_timeout_seconds', 30))
+    keepalive = float(cfg.config.get('gui_keepalive_seconds', 5))
+
+    class RequestBody(io.RawIOBase):
+        """rfile limited to the request's Content-Length, so neither the app nor werkzeug's
+        post-response drain of unread input can read into the next request on the connection"""
+
+        def __init__(self, stream, length):
+            self._stream, self.remaining = stream, length
+
+        def readable(self):
+            return True
+
+        def readinto(self, b):
+            n = min(len(b), self.remaining)
+            got = self._stream.readinto(memoryview(b)[:n]) if n > 0 else 0
+            self.remaining -= got or 0
+            return got
+
+        def read(self, size=-1):
+            n = self.remaining if size is None or size < 0 else min(size, self.remaining)
+            data = self._stream.read(n) if n > 0 else b''
+            self.remaining -= len(data)
+            return data
+
+    class Handler(WSGIRequestHandler):
+        protocol_version = 'HTTP/1.1'  # Chunked transfer for streamed responses
+        keep_alive = False
+        _reusable = _framed = False  # Until run_wsgi() (e.g. send_error() on a bad request line)
+
+        def setup(self):
+            super().setup()
+            self.connection.settimeout(request_timeout)
+
+        def run_wsgi(self):
+            # Reusable only for an HTTP/1.1 request whose body has a known length
+            self._reusable = (self.request_version == 'HTTP/1.1' and not self.close_connection
+                              and 'chunked' not in self.headers.get('Transfer-Encoding', '').lower())
+            self._framed = self.command == 'HEAD'
+            rfile = body = self.rfile
+            if self._reusable:
+                try:
+                    body = self.rfile = RequestBody(rfile, max(0, int(self.headers.get('Content-Length') or 0)))
+                except ValueError:
+                    self._reusable = False
+            try:
+                super().run_wsgi()
+                # Skip what the app left unread (werkzeug only drains bytes still on the socket)
+                if body is not rfile and not self.close_connection:
+                    while body.read(65536):
+                        pass
+                    if body.remaining:
+                        self.close_connection = True  # Client went away mid-body
+            finally:
+                self.rfile = rfile
+
+        def send_response_only(self, code, message=None):
+            if 100 <= code < 200 or code in (204, 304):
+                self._framed = True
+            super().send_response_only(code, message)
+
+        def send_header(self, keyword, value):
+            # werkzeug ends every response with 'Connection: close'; drop it when the client
+            # can tell where the body ends without the connection closing
+            key = keyword.lower()
+            if key == 'content-length':
+                self._framed = True
+            elif key == 'connection' and value.lower() == 'close' and self._reusable and self._framed:
+                return
+            super().send_header(keyword, value)
+
+        def handle_one_request(self):
+            super().handle_one_request()
+            self.keep_alive = not self.close_connection
+            # A pipelined request already in rfile's buffer is served here; otherwise a kept-alive
+            # connection goes back to the dispatcher and the worker is freed
+            if not (self.keep_alive and self._buffered()):
+                self.close_connection = True
+
+        def _buffered(self):
+            self.connection.settimeout(0)
+            try:
+                return bool(self.rfile.peek(1))
+            except OSError:
+                return False
+            finally:
+                self.connection.settimeout(request_timeout)
+
+    class PooledWSGIServer(BaseWSGIServer):
+        multithread = True
+
+        def __init__(self):
+            super().__init__(host, port, app, handler=Handler)
+            self.workers, self.backlog, self.max_streams = workers, backlog, max_streams
+            self.stopping = False
+            self.streams = 0
+            self.pooled = 0  # Requests queued for or running on a worker
+            self._jobs = queue.Queue()
+            self._incoming = queue.Queue()
+            self._wake_r, self._wake_w = socket.socketpair()
+            self._inflight = 0
+            self._idle = threading.Condition()
+            threading.Thread(target=self._dispatch, name='gui-dispatcher', daemon=True).start()
+            for i in range(workers):
+                threading.Thread(target=self._work, name=f'gui-worker-{i}', daemon=True).start()
+
+        def process_request(self, request, client_address):
+            with self._idle:
+                self._inflight += 1
+            self._watch(request, client_address, request_timeout)
+
+        def _watch(self, request, client_address, timeout):
+            """Have the dispatcher wait up to `timeout` seconds for the connection's next request line"""
+            self._incoming.put((request, client_address, timeout))
+            self._wake()
+
+        def _wake(self):
+            try:
+                self._wake_w.send(b'\0')
+            except OSError:
+                pass
+
+        def finish_request(self, request, client_address):
+            """Serve the connection's request(s); True when it stays open for another one"""
+            return self.RequestHandlerClass(request, client_address, self).keep_alive
+
+        def _dispatch(self):
+            """Wait (without a worker) until each connection's request line arrived, then route it"""
+            sel = selectors.DefaultSelector()
+            sel.register(self._wake_r, selectors.EVENT_READ)
+            deadlines = {}
+            while True:
+                for key, _ in sel.select(timeout=1.0):
+                    if key.fileobj is self._wake_r:
+                        self._wake_r.recv(4096)
+                        while not self._incoming.empty():
+                            request, client_address, timeout = self._incoming.get_nowait()
+                            deadlines[request] = (client_address, time.monotonic() + timeout)
+                            sel.register(request, selectors.EVENT_READ)
+                        continue
+                    request = key.fileobj
+                    sel.unregister(request)
+                    client_address, _ = deadlines.pop(request)
+                    try:
+                        head = request.recv(2048, socket.MSG_PEEK)
+                    except OSError:
+                        head = b''
+                    if head:
+                        self._route(request, client_address, head)
+                    else:
+                        self._done(request)
+                now = time.monotonic()
+                for request, (_, deadline) in list(deadlines.items()):
+                    # Stopping: connections idle between requests are closed at once
+                    if now >= deadline or self.stopping:
+                        sel.unregister(request)
+                        del deadlines[request]
+                        self._done(request)
+
+        def _route(self, request, client_address, head):
+            parts = head.split(b'\r\n', 1)[0].split(b' ')
+            path = parts[1].split(b'?', 1)[0].decode('latin-1') if len(parts) > 2 else ''
+            if self.stopping:
+                self._done(request)
+            elif path in CONTROL_PATHS:
+                threading.Thread(target=self._serve, args=(request, client_address),
+                                 name='gui-control', daemon=True).start()
+            elif path in STREAM_PATHS:
+                with self._idle:
+                    admitted = self.streams < self.max_streams
+                    if admitted:
+                        self.streams += 1
+                if not admitted:
+                    self._reject(request)
+                    return
+                threading.Thread(target=self._serve_stream, args=(request, client_address),
+                                 name='gui-stream', daemon=True).start()
+            else:
+                # Counted rather than bounded by the queue size: a worker that has not yet taken
+                # the previous job off the queue still leaves room
+                with self._idle:
+                    admitted = self.pooled < self.workers + self.backlog
+                    if admitted:
+                        self.pooled += 1
+                if not admitted:
+                    self._reject(request)
+                    return
+                self._jobs.put((request, client_address))
+
+        def _reject(self, request):
+            try:
+                request.sendall(_BUSY_RESPONSE)
+            except OSError:
+                pass
+            self._done(request)
+
+        def _done(self, request):
+            self.shutdown_request(request)
+            with self._idle:
+                self._inflight -= 1
+                self._idle.notify_all()
+
+        def _serve(self, request, client_address):
+            keep_alive = False
+            try:
+                keep_alive = self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                if keep_alive and not self.stopping:
+                    self._watch(request, client_address, keepalive)
+                else:
+                    self._done(request)
+
+        def _serve_stream(self, request, client_address):
+            try:
+                self._serve(request, client_address)
+            finally:
+                with self._idle:
+                    self.streams -= 1
+
+        def _work(self):
+            while True:
+                try:
+                    self._serve(*self._jobs.get())
+                finally:
+                    with self._idle:
+                        self.pooled -= 1
+
+        def drain(self, grace):
+            """Close queued connections and wait up to `grace` seconds for running requests;
+            returns how many were still running"""
+            self.stopping = True
+            self._wake()
+            while True:
+                try:
+                    request, _ = self._jobs.get_nowait()
+                except queue.Empty:
+                    break
+                with self._idle:
+                    self.pooled -= 1
+                self._done(request)
+            with self._idle:
+                self._idle.wait_for(lambda: self._inflight == 0, timeout=grace)
+                return self._inflight
+
+    return PooledWSGIServer()
+
+
+def launch_gui(core_system, port=5002, production=None):
     host = '0.0.0.0'
     app = create_app(core_system)
+    cfg = core_system['cfg']
+    if production is None:
+        production = cfg.config.get('gui_server', 'development') == 'production'
     url = f'http://{host}:{port}'
     browser_url = f'http://localhost:{port}'
     print(f"[WebGUI] Starting at {url}")
     print(f"[WebGUI] Press Ctrl+C to stop")
     threading.Timer(1.0, lambda: webbrowser.open(browser_url)).start()
-    app.run(host=host, port=port, debug=False, use_reloader=False)
+    # Changes made by the CLI or the --monitor daemon in other processes reach the live stream
+    core_system['db'].watch()
+    EventSpool(f"{core_system['db'].db_path}.events").follow(EVENTS)
+    if not production:
+        app.run(host=host, port=port, debug=False, use_reloader=False)
+        return
+
+    server = make_production_server(app, host, port, cfg)
+    # serve_forever() only returns once shutdown() is called from another thread
+    app.config['SERVER_SHUTDOWN'] = lambda: threading.Thread(target=server.shutdown, daemon=True).start()
+    print(f"[WebGUI] Production server: {server.workers} workers, backlog {server.backlog}")
+    server.serve_forever()  # returns on /api/stop or Ctrl+C
+    EVENTS.close()
+    grace = float(cfg.config.get('gui_shutdown_grace_seconds', 10))
+    left = server.drain(grace)
+    if left:
+        print(f"[WebGUI] {left} request(s) still running after {grace:g}s; exiting")
+    print("[WebGUI] Stopped")
 
 
 # ==========================================
@@ -840,6 +1246,7 @@ tr.selected { background: var(--accent-glow) !important; box-shadow: inset 4px 0
     <table><thead><tr><th style="width:36px"><input type="checkbox" id="sch-select-all" onchange="toggleSchSelectAll(this)"></th><th style="width:50px">{{ t('gui_sch_th_type') }}</th><th style="width:70px">{{ t('gui_browse_th_status') }}</th><th>{{ t('gui_sch_th_rs') }}</th><th>{{ t('gui_sch_th_desc') }}</th><th>{{ t('gui_browse_th_src') }}</th><th>{{ t('gui_browse_th_dest') }}</th><th>{{ t('gui_browse_th_svc') }}</th><th style="width:70px">{{ t('gui_sch_th_action') }}</th><th>{{ t('gui_sch_th_timing') }}</th><th style="width:60px">ID</th></tr></thead>
     <tbody id="sch-table"></tbody></table>
   </div>
+  <div class="pagination" id="sch-pagination"></div>
 </div>
 
 <!-- ━━━ Logs Tab ━━━ -->
@@ -946,6 +1353,7 @@ function showTab(name) {
 // ━━━ Helpers ━━━
 let currentPage = 1;
 let currentSearch = '';
+let rsVersion = null;
 function schIcon(type) {
   if (type === 'star') return '<span class="sch-star"><svg style="width:16px;height:16px;fill:currentColor" viewBox="0 0 24 24"><path d="M12,17.27L18.18,21L16.54,13.97L22,9.24L14.81,8.62L12,2L9.19,8.62L2,9.24L7.45,13.97L5.82,21L12,17.27Z" /></svg></span>';
   if (type === 'dot') return '<span class="sch-dot"><svg style="width:12px;height:12px;fill:currentColor" viewBox="0 0 24 24"><circle cx="12" cy="12" r="10" /></svg></span>';
@@ -961,17 +1369,28 @@ async function loadAllRS(page) {
   currentSearch = '';
   currentPage = page || 1;
   try {
-    const res = await fetch(`/api/rulesets?page=${currentPage}&size=50`);
+    const ver = (page && rsVersion !== null) ? `&version=${rsVersion}` : '';
+    const res = await fetch(`/api/rulesets?page=${currentPage}&size=50${ver}`);
     const data = await res.json();
+    rsVersion = data.version;
     renderRS(data);
   } catch(e) { toast('Failed to load RuleSets: ' + e.message, 'error'); }
 }
+async function clearRS() {
+  document.getElementById('rs-search-input').value = '';
+  try {
+    await fetch('/api/rulesets/refresh', {method: 'POST'});
+  } catch(e) { toast('Refresh failed: ' + e.message, 'error'); }
+  rsVersion = null;
+  loadAllRS();
+}
 async function searchRS() {
-  currentSearch = document.getElementById('search-input').value;
+  currentSearch = document.getElementById('rs-search-input').value;
   currentPage = 1;
   try {
     const res = await fetch(`/api/rulesets?q=${encodeURIComponent(currentSearch)}&page=1&size=50`);
     const data = await res.json();
+    rsVersion = data.version;
     renderRS(data);
   } catch(e) { toast('Search failed: ' + e.message, 'error'); }
 }
@@ -1012,7 +1431,7 @@ function renderRS(data) {
 }
 async function searchRSPage(page) {
   try {
-    const res = await fetch(`/api/rulesets?q=${encodeURIComponent(currentSearch)}&page=${page}&size=50`);
+    const res = await fetch(`/api/rulesets?q=${encodeURIComponent(currentSearch)}&page=${page}&size=50&version=${rsVersion}`);
     const data = await res.json();
     renderRS(data);
   } catch(e) { toast('Search failed: ' + e.message, 'error'); }
@@ -1140,44 +1559,126 @@ async function saveSchedule() {
 }
 
 // ━━━ Schedules List (with checkboxes) ━━━
-async function loadSchedules() {
-  try {
-    const res = await fetch('/api/schedules');
-    const data = await res.json();
-    const tb = document.getElementById('sch-table');
+function enabledBadge(enabled) {
+  if (enabled === null || enabled === undefined) return '<span class="badge">…</span>';
+  return `<span class="badge ${enabled===true?'badge-on':(enabled===false?'badge-off':'')}">${enabled===true?'ON':(enabled===false?'OFF':'NA')}</span>`;
+}
+function renderScheduleRows(data, append) {
+  const tb = document.getElementById('sch-table');
+  if (!append) {
     tb.innerHTML = '';
     document.getElementById('sch-select-all').checked = false;
-    data.forEach(s => {
-      const tr = document.createElement('tr');
-      const hasSrc = s.src && s.src !== 'NA';
-      const hasDst = s.dst && s.dst !== 'NA';
-      const hasSvc = s.svc && s.svc !== 'NA';
-      tr.innerHTML = `<td><input type="checkbox" class="sch-check" data-href="${s.href}"></td>
-        <td>${s.type}</td>
-        <td><span class="badge ${s.enabled===true?'badge-on':(s.enabled===false?'badge-off':'')}">${s.enabled===true?'ON':(s.enabled===false?'OFF':'NA')}</span></td>
-        <td title="${s.rs_name}">${s.rs_name}</td>
-        <td title="${s.name}">${s.name}</td>
-        <td data-field="src" class="${hasSrc?'clickable-cell':''}">${s.src}</td>
-        <td data-field="dst" class="${hasDst?'clickable-cell':''}">${s.dst}</td>
-        <td data-field="svc" class="${hasSvc?'clickable-cell':''}">${s.svc}</td>
-        <td><span class="badge ${s.action==='ENABLE'?'badge-on':(s.action==='DISABLE'?'badge-off':'')}">${s.action}</span></td>
-        <td>${s.timing}</td><td>${s.id}</td>
-        <td><button class="btn" style="padding:2px 6px;font-size:11px" onclick="editSchedule('${s.href}')">✎ Edit</button></td>`;
-        
-      const cells = tr.querySelectorAll('td[data-field]');
-      cells.forEach(td => {
-        const field = td.dataset.field;
-        const fullVal = field === 'src' ? s.src_full : (field === 'dst' ? s.dst_full : s.svc_full);
-        const hasVal  = field === 'src' ? hasSrc  : (field === 'dst' ? hasDst  : hasSvc);
-        if (hasVal) {
-          td.addEventListener('click', (e) => {
-            e.stopPropagation();
-            showDetailPopup(e, field.toUpperCase(), fullVal);
-          });
-        }
-      });
-      tb.appendChild(tr);
+  }
+  const cellsByHref = {};
+  data.forEach(s => {
+    const tr = scheduleRow(s);
+    cellsByHref[s.href] = tr.querySelector('td[data-live]');
+    tb.appendChild(tr);
+  });
+  return cellsByHref;
+}
+function scheduleRow(s) {
+    const tr = document.createElement('tr');
+    const hasSrc = s.src && s.src !== 'NA';
+    const hasDst = s.dst && s.dst !== 'NA';
+    const hasSvc = s.svc && s.svc !== 'NA';
+    tr.innerHTML = `<td><input type="checkbox" class="sch-check" data-href="${s.href}"></td>
+      <td>${s.type}</td>
+      <td data-live>${enabledBadge(s.enabled)}</td>
+      <td title="${s.rs_name}">${s.rs_name}</td>
+      <td title="${s.name}">${s.name}</td>
+      <td data-field="src" class="${hasSrc?'clickable-cell':''}">${s.src}</td>
+      <td data-field="dst" class="${hasDst?'clickable-cell':''}">${s.dst}</td>
+      <td data-field="svc" class="${hasSvc?'clickable-cell':''}">${s.svc}</td>
+      <td><span class="badge ${s.action==='ENABLE'?'badge-on':(s.action==='DISABLE'?'badge-off':'')}">${s.action}</span></td>
+      <td>${s.timing}</td><td>${s.id}</td>
+      <td><button class="btn" style="padding:2px 6px;font-size:11px" onclick="editSchedule('${s.href}')">✎ Edit</button></td>`;
+      
+    const cells = tr.querySelectorAll('td[data-field]');
+    cells.forEach(td => {
+      const field = td.dataset.field;
+      const fullVal = field === 'src' ? s.src_full : (field === 'dst' ? s.dst_full : s.svc_full);
+      const hasVal  = field === 'src' ? hasSrc  : (field === 'dst' ? hasDst  : hasSvc);
+      if (hasVal) {
+        td.addEventListener('click', (e) => {
+          e.stopPropagation();
+          showDetailPopup(e, field.toUpperCase(), fullVal);
+        });
+      }
     });
+    return tr;
+}
+async function upsertScheduleRows(rows) {
+  // Schedules changed elsewhere: patch their rows in place; new ones go on top and fetch only their own status
+  if (!schLoadSeq) return;  // Never loaded: the tab fetches everything when opened
+  const tb = document.getElementById('sch-table');
+  const added = [];
+  rows.forEach(s => {
+    const tr = scheduleRow(s), live = tr.querySelector('td[data-live]'), old = schCells[s.href];
+    if (old) {
+      const oldRow = old.closest('tr');
+      live.innerHTML = old.innerHTML;
+      tr.querySelector('.sch-check').checked = oldRow.querySelector('.sch-check').checked;
+      oldRow.replaceWith(tr);
+    } else {
+      tb.insertBefore(tr, tb.firstChild);
+      added.push(s.href);
+    }
+    schCells[s.href] = live;
+  });
+  if (!added.length) return;
+  try {
+    const res = await fetch('/api/schedules/status', { method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify({hrefs: added}) });
+    Object.entries(await res.json()).forEach(([h, en]) => { if (schCells[h]) schCells[h].innerHTML = enabledBadge(en); });
+  } catch(e) {}
+}
+let schLoadSeq = 0;
+let schCursor = null;
+let schCells = {};   // href -> live status cell of the rendered schedule rows
+function renderSchedulePager(shown, total, cursor) {
+  const pg = document.getElementById('sch-pagination');
+  pg.innerHTML = '';
+  const info = document.createElement('span');
+  info.className = 'page-info';
+  info.textContent = `${shown} / ${total}`;
+  pg.appendChild(info);
+  if (cursor) {
+    const more = document.createElement('button');
+    more.textContent = 'Load more ▼';
+    more.onclick = () => loadSchedules(true);
+    pg.appendChild(more);
+  }
+}
+async function loadSchedules(more) {
+  // Rows render from the DB at once; live ON/OFF badges fill in as the NDJSON stream arrives.
+  // Pages come from the server cursor; "Load more" appends the next one.
+  const seq = ++schLoadSeq;
+  if (!more) { schCursor = null; schCells = {}; }
+  const qs = 'limit=200' + (more && schCursor ? `&cursor=${encodeURIComponent(schCursor)}` : '');
+  try {
+    const res = await fetch('/api/schedules/stream?' + qs);
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buf = '', cells = {};
+    while (true) {
+      const {value, done} = await reader.read();
+      if (seq !== schLoadSeq) { reader.cancel(); return; }
+      if (done) break;
+      buf += decoder.decode(value, {stream: true});
+      let nl;
+      while ((nl = buf.indexOf('\n')) >= 0) {
+        const line = buf.slice(0, nl); buf = buf.slice(nl + 1);
+        if (!line) continue;
+        const msg = JSON.parse(line);
+        if (msg.rows) {
+          cells = renderScheduleRows(msg.rows, more);
+          Object.assign(schCells, cells);
+          schCursor = msg.next_cursor;
+          renderSchedulePager(document.querySelectorAll('#sch-table tr').length, msg.total, msg.next_cursor);
+        }
+        if (msg.status) Object.entries(msg.status).forEach(([href, en]) => { if (cells[href]) cells[href].innerHTML = enabledBadge(en); });
+      }
+    }
   } catch(e) { toast('Failed: ' + e.message, 'error'); }
 }
 
@@ -1229,7 +1730,11 @@ async function deleteSelectedSchedules() {
   try {
     const res = await fetch('/api/schedules/delete', { method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify({hrefs}) });
     const data = await res.json();
-    if (data.ok) { toast(`${data.count} schedule(s) deleted.`); loadSchedules(); }
+    if (data.ok) {
+      toast(`${data.count} schedule(s) deleted.`);
+      if (data.note_failed && data.note_failed.length) toast(`Note cleanup failed for ID ${data.note_failed.join(', ')}`, 'error');
+      removeScheduleRows(hrefs);
+    }
     else toast(data.error || 'Failed', 'error');
   } catch(e) { toast('Error: ' + e.message, 'error'); }
 }
@@ -1351,12 +1856,53 @@ function applyThemePreset(mode) {
   localStorage.setItem('illumio_theme', mode);
 }
 
+// ━━━ Live events (SSE) ━━━
+function tabVisible(name) { return document.getElementById('tab-' + name).classList.contains('active'); }
+function removeScheduleRows(hrefs) {
+  hrefs.forEach(h => {
+    const cell = schCells[h];
+    if (cell) { cell.closest('tr').remove(); delete schCells[h]; }
+  });
+}
+function connectEvents() {
+  if (!window.EventSource) return;
+  const es = new EventSource('/api/events');
+  es.addEventListener('transition', e => {
+    const d = JSON.parse(e.data).data;
+    if (d.ok && schCells[d.href]) schCells[d.href].innerHTML = enabledBadge(d.enabled);
+  });
+  es.addEventListener('check', e => {
+    const d = JSON.parse(e.data).data;
+    const panel = document.getElementById('log-panel');
+    panel.textContent += `[${new Date().toLocaleTimeString()}] Check: ${d.checked} schedule(s), ${d.toggled} toggled, ${d.expired.length} expired, ${d.failed.length} failed (${d.duration_ms} ms)\n`;
+    panel.scrollTop = panel.scrollHeight;
+    removeScheduleRows(d.expired);
+  });
+  es.addEventListener('schedules', e => {
+    const d = JSON.parse(e.data).data;
+    if (d.op === 'delete') removeScheduleRows(d.hrefs);
+    else if (d.op === 'put') upsertScheduleRows(d.rows);
+    else if (tabVisible('schedules')) loadSchedules();
+  });
+  es.addEventListener('rulesets', e => {
+    const d = JSON.parse(e.data).data;
+    if (!currentSearch && rsVersion !== null && d.version !== rsVersion) { rsVersion = null; loadAllRS(currentPage); }
+  });
+  es.addEventListener('resync', () => {
+    if (tabVisible('schedules')) loadSchedules();
+    if (!currentSearch) { rsVersion = null; loadAllRS(currentPage); }
+  });
+  // A rejected stream (503: too many open) is not retried by EventSource itself
+  es.onerror = () => { if (es.readyState === EventSource.CLOSED) setTimeout(connectEvents, 5000); };
+}
+
 document.addEventListener('DOMContentLoaded', () => {
   const savedTheme = localStorage.getItem('illumio_theme') || 'light';
   applyThemePreset(savedTheme);
   const themeSelect = document.getElementById('cfg-theme');
   if (themeSelect) themeSelect.value = savedTheme;
   loadAllRS(); 
+  connectEvents();
   lucide.createIcons();
 });
 
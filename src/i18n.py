@@ -118,6 +118,7 @@ _STRINGS = {
         'delete_target': 'Target:',
         'delete_cleaning': 'Cleaning up note...',
         'delete_done': 'Schedule deleted.',
+        'delete_note_failed': 'Schedule removed, but the PCE description tag could not be updated.',
         'delete_not_found': 'ID not found.',
         
         # Config
@@ -326,6 +327,7 @@ _STRINGS = {
         'delete_target': '目標:',
         'delete_cleaning': '嘗試清除 Note 標記...',
         'delete_done': '排程已刪除。',
+        'delete_note_failed': '排程已移除，但無法更新 PCE 上的描述標記。',
         'delete_not_found': '找不到該 ID。',
         
         # Config
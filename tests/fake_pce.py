@@ -0,0 +1,85 @@
+"""In-process stand-in for the PCE REST API, installed as PCEClient._request.
+
+Draft and active policy are kept apart: PUTs edit the draft, a successful provision copies
+the committed rulesets' draft to active. Every call is recorded in `calls`."""
+import collections
+import copy
+import json
+import threading
+
+from src.core import APIResponse, ConfigManager, PCEClient, extract_id, ruleset_href
+
+
+def rs_href(n):
+    return f'/orgs/1/sec_policy/draft/rule_sets/{n}'
+
+
+def rule_href(rs, n):
+    return f'{rs_href(rs)}/sec_rules/{n}'
+
+
+class FakePCE:
+    def __init__(self, rulesets=3, rules=3):
+        self.draft = {
+            rs_href(i): {'href': rs_href(i), 'enabled': True, 'description': '',
+                         'rules': [{'href': rule_href(i, i * 10 + j), 'enabled': True, 'description': ''}
+                                   for j in range(rules)]}
+            for i in range(1, rulesets + 1)}
+        self.active = copy.deepcopy(self.draft)
+        self.calls = []
+        self.edits = collections.Counter()  # draft ruleset HREF -> PUTs so far
+        self.fail_puts = set()
+        self.fail_commit = lambda rule_sets: False
+        self._lock = threading.Lock()
+
+    def client(self, tmp_path, **config):
+        cfg = ConfigManager(str(tmp_path / 'config.json'))
+        cfg.config = dict({'pce_url': 'https://pce.test', 'org_id': '1', 'api_key': 'k', 'api_secret': 's'}, **config)
+        pce = PCEClient(cfg)
+        pce._request = self.request
+        return pce
+
+    @staticmethod
+    def _find(store, href):
+        rs = store.get(ruleset_href(href))
+        if rs is None or rs['href'] == href:
+            return rs
+        return next((r for r in rs['rules'] if r['href'] == href), None)
+
+    def obj(self, href, active=False):
+        return self._find(self.active if active else self.draft, href)
+
+    def request(self, method, endpoint, payload=None, extra_headers=None):
+        with self._lock:
+            self.calls.append((method, endpoint, copy.deepcopy(payload)))
+            if method == 'GET':
+                obj = self._find(self.active if '/active/' in endpoint else self.draft,
+                                 endpoint.replace('/active/', '/draft/'))
+                return APIResponse(200, json.dumps(obj).encode()) if obj else APIResponse(404)
+            if method == 'PUT':
+                obj = self._find(self.draft, endpoint)
+                if obj is None or endpoint in self.fail_puts:
+                    return APIResponse(500, b'put failed')
+                obj.update(payload)
+                self.edits[ruleset_href(endpoint)] += 1
+                return APIResponse(204)
+            rule_sets = [r['href'] for r in payload['change_subset']['rule_sets']]
+            if endpoint.endswith('/dependencies'):
+                # The answer changes with every draft edit, so a stale cached lookup shows up
+                services = [{'href': self.dependency(rs)} for rs in rule_sets]
+                return APIResponse(200, json.dumps({'services': services}).encode())
+            if self.fail_commit(rule_sets):
+                return APIResponse(406, b'provision rejected')
+            for rs in rule_sets:
+                self.active[rs] = copy.deepcopy(self.draft[rs])
+            return APIResponse(201, b'{}')
+
+    def dependency(self, rs):
+        return f'/orgs/1/sec_policy/draft/services/{extract_id(rs)}-{self.edits[rs]}'
+
+    def commits(self):
+        """change_subset of every provision attempt, in order"""
+        return [p['change_subset'] for m, e, p in self.calls if m == 'POST' and e.endswith('/sec_policy')]
+
+    def puts(self):
+        return [(e, p) for m, e, p in self.calls if m == 'PUT']
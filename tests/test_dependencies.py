@@ -0,0 +1,39 @@
+from tests.fake_pce import FakePCE, rs_href, rule_href
+
+
+def lookups(fake):
+    return [p for m, e, p in fake.calls if e.endswith('/dependencies')]
+
+
+def test_per_item_provisions_never_reuse_a_lookup_from_before_their_put(tmp_path):
+    fake = FakePCE()
+    pce = fake.client(tmp_path)
+    with pce.dependency_cycle():
+        for n in (10, 11, 12):
+            assert pce.toggle_and_provision(rule_href(1, n), False)
+            assert fake.commits()[-1]['services'] == [{'href': fake.dependency(rs_href(1))}]
+    assert len(lookups(fake)) == 3
+
+
+def test_lookups_are_cached_until_the_ruleset_is_provisioned(tmp_path):
+    fake = FakePCE()
+    pce = fake.client(tmp_path)
+    with pce.dependency_cycle():
+        pce.toggle_batch([(rule_href(1, 10), False, False), (rule_href(1, 11), False, False),
+                          (rule_href(2, 20), False, False)])
+        # Provisioned rulesets are looked up afresh; an untouched one is answered from the cache
+        pce._build_change_subset([rs_href(1), rs_href(2)])
+        pce._build_change_subset([rs_href(3)])
+        pce._build_change_subset([rs_href(3)])
+    assert [sorted(r['href'] for r in p['change_subset']['rule_sets']) for p in lookups(fake)] == [
+        [rs_href(1), rs_href(2)], [rs_href(1), rs_href(2)], [rs_href(3)]]
+
+
+def test_cache_is_scoped_to_the_cycle(tmp_path):
+    fake = FakePCE()
+    pce = fake.client(tmp_path)
+    with pce.dependency_cycle():
+        pce._build_change_subset([rs_href(3)])
+    with pce.dependency_cycle():
+        pce._build_change_subset([rs_href(3)])
+    assert len(lookups(fake)) == 2
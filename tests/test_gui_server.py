@@ -0,0 +1,170 @@
+import socket
+import threading
+import time
+import types
+
+import pytest
+
+flask = pytest.importorskip('flask')
+
+from src.gui_ui import make_production_server  # noqa: E402
+
+
+@pytest.fixture
+def served():
+    release = threading.Event()
+    app = flask.Flask(__name__)
+
+    @app.route('/slow')
+    def slow():
+        release.wait(5)
+        return 'slow'
+
+    @app.route('/fast')
+    def fast():
+        return 'fast'
+
+    @app.route('/ignore', methods=['POST'])
+    def ignore():
+        return 'ignored'  # Leaves the request body unread
+
+    @app.route('/api/stop', methods=['POST'])
+    def stop():
+        return 'stopping'
+
+    @app.route('/api/events')
+    def events():
+        def generate():
+            yield 'data: hello\n\n'
+            release.wait(5)
+        return flask.Response(generate(), mimetype='text/event-stream')
+
+    cfg = types.SimpleNamespace(config={'gui_workers': 2, 'gui_backlog': 1, 'gui_max_streams': 2,
+                                        'gui_request_timeout_seconds': 5, 'gui_keepalive_seconds': 0.5})
+    server = make_production_server(app, '127.0.0.1', 0, cfg)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, release
+    release.set()
+    server.shutdown()
+    server.drain(2)
+    thread.join(5)
+
+
+def request(method, path, body=b'', close=True):
+    head = f'{method} {path} HTTP/1.1\r\nHost: test\r\nContent-Length: {len(body)}\r\n'
+    return (head + ('Connection: close\r\n' if close else '') + '\r\n').encode() + body
+
+
+def send(server, method, path, **kw):
+    sock = socket.create_connection(('127.0.0.1', server.port), timeout=5)
+    sock.sendall(request(method, path, **kw))
+    return sock
+
+
+def response(reader):
+    """(headers, body) of one Content-Length response read from sock.makefile('rb')"""
+    reader.readline()
+    headers = {}
+    for line in iter(reader.readline, b'\r\n'):
+        key, value = line.rstrip(b'\r\n').split(b': ', 1)
+        headers[key] = value
+    return headers, reader.read(int(headers[b'Content-Length']))
+
+
+def status(sock):
+    head = b''
+    while b'\r\n' not in head:
+        chunk = sock.recv(1024)
+        if not chunk:
+            break
+        head += chunk
+    return int(head.split(b' ', 2)[1])
+
+
+def body(sock):
+    data = b''
+    while True:
+        chunk = sock.recv(4096)
+        if not chunk:
+            return data
+        data += chunk
+
+
+def wait_for(predicate):
+    for _ in range(200):
+        if predicate():
+            return
+        time.sleep(0.01)
+    raise AssertionError('condition not reached')
+
+
+def pooled(server, path, n):
+    """Send `n` requests that go to the worker pool, each once the previous one was admitted"""
+    socks = []
+    for _ in range(n):
+        expected = server.pooled + 1
+        socks.append(send(server, 'GET', path))
+        wait_for(lambda: server.pooled == expected)
+    return socks
+
+
+def test_full_pool_queues_then_rejects(served):
+    server, release = served
+    busy = pooled(server, '/slow', 2)
+    queued = pooled(server, '/fast', 1)[0]
+    assert status(send(server, 'GET', '/fast')) == 503  # gui_workers + gui_backlog taken
+    release.set()
+    assert all(body(s).endswith(b'slow') for s in busy)
+    assert body(queued).endswith(b'fast')
+    wait_for(lambda: server.pooled == 0)
+
+
+def test_streams_and_stop_bypass_the_pool(served):
+    server, release = served
+    streams = [send(server, 'GET', '/api/events') for _ in range(2)]
+    assert [status(s) for s in streams] == [200, 200]
+    assert status(send(server, 'GET', '/api/events')) == 503  # Over gui_max_streams
+    assert body(send(server, 'GET', '/fast')).endswith(b'fast')
+    wait_for(lambda: server.pooled == 0)
+    busy = pooled(server, '/slow', 2)
+    assert body(send(server, 'POST', '/api/stop')).endswith(b'stopping')
+    release.set()
+    for s in streams + busy:
+        body(s)
+    wait_for(lambda: server.streams == 0)
+
+
+def test_keep_alive_returns_the_connection_between_requests(served):
+    server, _ = served
+    sock = send(server, 'GET', '/fast', close=False)
+    reader = sock.makefile('rb')
+    headers, data = response(reader)
+    assert data == b'fast' and b'Connection' not in headers
+    wait_for(lambda: server.pooled == 0)  # Idle between requests: no worker held
+    sock.sendall(request('POST', '/ignore', body=b'x' * 5000, close=False))
+    assert response(reader)[1] == b'ignored'
+    sock.sendall(request('GET', '/fast', close=False) + request('GET', '/fast'))  # Pipelined
+    assert response(reader)[1] == b'fast'
+    headers, data = response(reader)
+    assert data == b'fast' and headers[b'Connection'] == b'close'
+    assert reader.read(1) == b''
+
+
+def test_idle_keep_alive_connections_are_closed(served):
+    server, _ = served
+    sock = send(server, 'GET', '/fast', close=False)
+    assert body(sock).endswith(b'fast')  # EOF after gui_keepalive_seconds
+    idle = send(server, 'GET', '/fast', close=False)
+    assert response(idle.makefile('rb'))[1] == b'fast'
+    server.shutdown()
+    assert server.drain(2) == 0
+    assert idle.recv(1) == b''
+
+
+def test_drain_waits_for_running_requests(served):
+    server, release = served
+    busy = pooled(server, '/slow', 1)[0]
+    threading.Timer(0.2, release.set).start()
+    assert server.drain(3) == 0
+    assert body(busy).endswith(b'slow')
@@ -0,0 +1,56 @@
+import json
+import random
+
+import pytest
+
+from src.core import iter_json_array
+
+DOCS = [
+    '[]',
+    '[1.5,2]',
+    '[1.5e-3, -0.25E+2 ,  10, 0]',
+    '[true,false,null, 12345678901234567890]',
+    '[{"href": "/orgs/1/labels/1", "value": "caf\\u00e9 été"}, "a,b]c", [1, [2.5, {}]]]',
+    ' [ "x" , 3.14159 , {"n": -1e10} ] ',
+]
+
+
+def chunked(text, size):
+    data = text.encode('utf-8')
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize('doc', DOCS)
+@pytest.mark.parametrize('size', [1, 2, 3, 5, 7, 64])
+def test_every_chunk_size(doc, size):
+    assert list(iter_json_array(chunked(doc, size))) == json.loads(doc)
+
+
+def test_number_split_at_dot_and_exponent():
+    assert list(iter_json_array([b'[1.', b'5,2]'])) == [1.5, 2]
+    assert list(iter_json_array([b'[1', b'e3]'])) == [1000.0]
+    assert list(iter_json_array([b'[-', b'2,tr', b'ue]'])) == [-2, True]
+
+
+def test_random_splits():
+    rng = random.Random(12)
+    for _ in range(300):
+        items = [rng.choice([rng.randint(-10 ** 6, 10 ** 6), rng.uniform(-1e6, 1e6), rng.random() * 1e-9,
+                             None, True, 'déjà vu', {'k': [1.25, 'v']}]) for _ in range(rng.randint(0, 8))]
+        data = json.dumps(items).encode('utf-8')
+        cuts = sorted(rng.sample(range(1, len(data)), min(len(data) - 1, rng.randint(0, 6))))
+        chunks = [data[a:b] for a, b in zip([0] + cuts, cuts + [len(data)])]
+        assert list(iter_json_array(chunks)) == items
+
+
+@pytest.mark.parametrize('doc', ['[1', '[1.', '[{"a": 1}', '{"a": 1}', '[1x]'])
+def test_bad_input_raises(doc):
+    with pytest.raises(ValueError):
+        list(iter_json_array(chunked(doc, 2)))
+
+
+def test_stops_at_closing_bracket():
+    def chunks():
+        yield b'[1, 2]'
+        raise AssertionError('read past the end of the array')
+    assert list(iter_json_array(chunks())) == [1, 2]
@@ -0,0 +1,51 @@
+import contextlib
+import threading
+
+from src.core import ConfigManager, PCEClient
+
+
+def client(tmp_path, release):
+    cfg = ConfigManager(str(tmp_path / 'config.json'))
+    cfg.config = {'pce_url': 'https://pce.test', 'org_id': '1', 'api_key': 'k', 'api_secret': 's'}
+    pce = PCEClient(cfg)
+    started = threading.Event()
+
+    @contextlib.contextmanager
+    def open_collection(endpoint, headers=None):
+        started.set()
+        release.wait(5)
+        items = [{'href': '/orgs/1/labels/1', 'key': 'app', 'value': 'web'}] if endpoint.endswith('/labels') else []
+        yield 200, {}, iter(items)
+
+    pce.open_collection = open_collection
+    return pce, started
+
+
+def test_cold_cache_caller_waits_for_the_running_refresh(tmp_path):
+    release = threading.Event()
+    pce, started = client(tmp_path, release)
+    forced = threading.Thread(target=pce.update_label_cache, kwargs={'silent': True, 'force': True})
+    forced.start()
+    assert started.wait(5)
+    waiter = threading.Thread(target=pce.update_label_cache, kwargs={'silent': True})
+    waiter.start()
+    waiter.join(0.2)
+    assert waiter.is_alive()  # Nothing to use yet: blocked on the in-flight refresh
+    release.set()
+    waiter.join(5)
+    forced.join(5)
+    assert '/orgs/1/labels/1' in pce.label_cache
+
+
+def test_warm_cache_caller_does_not_wait(tmp_path):
+    release = threading.Event()
+    pce, started = client(tmp_path, release)
+    pce.label_cache.bind('https://pce.test|1')
+    pce.label_cache.replace_collection('/orgs/1/labels', {'/orgs/1/labels/1': 'app:old'})
+    forced = threading.Thread(target=pce.update_label_cache, kwargs={'silent': True, 'force': True})
+    forced.start()
+    assert started.wait(5)
+    pce.update_label_cache(silent=True)  # Stale but usable: returns at once
+    assert pce.label_cache['/orgs/1/labels/1'] == 'app:old'
+    release.set()
+    forced.join(5)
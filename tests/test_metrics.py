@@ -0,0 +1,29 @@
+import pytest
+
+from src.core import metric_endpoint
+
+
+@pytest.mark.parametrize('endpoint, expected', [
+    ('/orgs/1/labels', '/orgs/:id/labels'),
+    ('/orgs/1/labels/42', '/orgs/:id/labels/:id'),
+    ('/orgs/1/sec_policy', '/orgs/:id/sec_policy'),
+    ('/orgs/1/sec_policy/draft/dependencies', '/orgs/:id/sec_policy/draft/dependencies'),
+    ('/orgs/1/sec_policy/draft/rule_sets/12/sec_rules/345',
+     '/orgs/:id/sec_policy/draft/rule_sets/:id/sec_rules/:id'),
+    ('/orgs/1/sec_policy/active/rule_sets/12', '/orgs/:id/sec_policy/active/rule_sets/:id'),
+    ('/orgs/1/sec_policy/7/rule_sets', '/orgs/:id/sec_policy/:version/rule_sets'),
+    ('/orgs/1/jobs/5f0c9e3a-1b2c-4d5e-8f90-123456789abc', '/orgs/:id/jobs/:id'),
+    ('/orgs/1/datafiles/a1b2c3d4e5', '/orgs/:id/datafiles/:id'),
+    ('/api/v2/orgs/3/labels/x9', '/orgs/:id/labels/:id'),
+])
+def test_ids_are_replaced_and_nouns_kept(endpoint, expected):
+    assert metric_endpoint(endpoint) == expected
+
+
+def test_query_string_is_dropped():
+    assert metric_endpoint('/orgs/1/sec_policy/draft/rule_sets?max_results=500') == \
+        '/orgs/:id/sec_policy/draft/rule_sets'
+
+
+def test_unexpected_segments_do_not_leak_into_labels():
+    assert metric_endpoint('/orgs/1/Weird-Path/2') == '/orgs/:id/:other/:id'
@@ -0,0 +1,108 @@
+import datetime
+import random
+
+import pytest
+
+from src.core import ScheduleDB
+
+MONDAY_10AM = datetime.datetime(2026, 10, 19, 10, 0)
+
+
+def rule(rs, n):
+    return f'/orgs/1/sec_policy/draft/rule_sets/{rs}/sec_rules/{n}'
+
+
+@pytest.fixture
+def db(tmp_path):
+    rng = random.Random(19)
+    db = ScheduleDB(str(tmp_path / 'rule_schedules.json'))
+    db.load()
+    for i in range(60):
+        rs = i % 4 + 1
+        if i % 3 == 0:
+            c = {'type': 'one_time', 'name': f'once {i}', 'expire_at': f'2030-01-{i % 28 + 1:02d}T08:00'}
+        else:
+            c = {'type': 'recurring', 'name': f'rec {rng.randrange(1000)}', 'days': ['Monday'] if i % 2 else ['Friday'],
+                 'start': '09:00', 'end': '17:00', 'action': 'allow' if i % 5 else 'block'}
+        db.put(rule(rs, i), dict(c, detail_rs=f'RS {rs}'))
+    return db
+
+
+def walk(db, limit=7, **kw):
+    hrefs, cursor, totals = [], None, set()
+    while True:
+        page, total, cursor = db.query(cursor=cursor, limit=limit, **kw)
+        totals.add(total)
+        hrefs.extend(h for h, _ in page)
+        if cursor is None:
+            return hrefs, totals
+
+
+@pytest.mark.parametrize('sort', ScheduleDB.SORTS)
+@pytest.mark.parametrize('descending', [False, True])
+def test_pages_cover_the_sorted_listing(db, sort, descending):
+    hrefs, totals = walk(db, sort=sort, descending=descending)
+    expected = [k[-1] for k in sorted((db._sort_key(sort, h, c) for h, c in db.get_all().items()), reverse=descending)]
+    assert hrefs == expected and totals == {60}
+
+
+def test_filters(db):
+    all_items = db.get_all()
+    hrefs, totals = walk(db, schedule_type='one_time', sort='name')
+    assert set(hrefs) == {h for h, c in all_items.items() if c['type'] == 'one_time'} and totals == {20}
+    hrefs, _ = walk(db, action='block', day='mon')
+    assert set(hrefs) == {h for h, c in all_items.items()
+                          if c.get('action') == 'block' and c.get('days') == ['Monday']}
+    hrefs, _ = walk(db, ruleset='2', in_window=True, now=MONDAY_10AM)
+    assert set(hrefs) == {h for h, c in all_items.items()
+                          if '/rule_sets/2/' in h and c.get('days') == ['Monday']}
+    hrefs, _ = walk(db, expiring_before='2030-01-05T00:00', sort='expire_at')
+    assert [all_items[h]['expire_at'][:10] for h in hrefs] == sorted(
+        c['expire_at'][:10] for c in all_items.values() if c['type'] == 'one_time' and c['expire_at'] < '2030-01-05')
+
+
+def test_cursor_survives_writes_between_pages(db):
+    page, _, cursor = db.query(sort='href', limit=10)
+    seen = [h for h, _ in page]
+    db.delete(seen[-1])                       # The cursor row itself
+    db.put(rule(1, 0) + '0', {'type': 'one_time', 'expire_at': '2030-01-01T00:00'})  # Sorts before the cursor
+    db.put(rule(9, 999), {'type': 'one_time', 'expire_at': '2030-01-01T00:00'})      # Sorts after it
+    hrefs = []
+    while cursor:
+        page, _, cursor = db.query(sort='href', limit=10, cursor=cursor)
+        hrefs.extend(h for h, _ in page)
+    assert not set(hrefs) & set(seen)
+    assert hrefs == sorted(h for h in db.get_all() if h > seen[-1])
+
+
+def test_filtered_view_is_reused_until_the_next_write(db):
+    page, total, cursor = db.query(schedule_type='one_time', sort='href', limit=5)
+    assert len(db._views) == 1
+    db.query(schedule_type='one_time', sort='href', limit=5, cursor=cursor)
+    assert len(db._views) == 1
+    db.put(rule(9, 999), {'type': 'one_time', 'expire_at': '2030-01-01T00:00'})
+    assert not db._views
+    hrefs, totals = walk(db, schedule_type='one_time', sort='href')
+    assert hrefs[-1] == rule(9, 999) and totals == {total + 1}
+
+
+def test_ruleset_by_id_covers_the_ruleset_and_its_rules(db):
+    rs = '/orgs/1/sec_policy/draft/rule_sets/3'
+    db.put(rs.replace('/draft/', '/active/'), {'type': 'one_time', 'expire_at': '2030-01-01T00:00'})
+    expected = {h for h in db.get_all() if h.startswith(rs + '/')} | {rs.replace('/draft/', '/active/')}
+    assert set(walk(db, ruleset='3')[0]) == expected
+    assert set(walk(db, ruleset=rs)[0]) == expected
+    db.delete(rule(3, 2))
+    assert rule(3, 2) not in walk(db, ruleset='3')[0]
+
+
+def test_invalid_arguments(db):
+    _, _, cursor = db.query(sort='name', limit=5)
+    with pytest.raises(ValueError):
+        db.query(sort='href', cursor=cursor)
+    with pytest.raises(ValueError):
+        db.query(cursor='not-a-cursor')
+    with pytest.raises(ValueError):
+        db.query(sort='colour')
+    with pytest.raises(ValueError):
+        db.query(schedule_type='weekly')
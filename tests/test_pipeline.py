@@ -0,0 +1,68 @@
+import threading
+import time
+
+from src.core import ActuationPipeline, ScheduleDB, ScheduleEngine
+from tests.fake_pce import FakePCE, rs_href, rule_href
+
+
+def test_one_ruleset_at_a_time_while_rulesets_run_in_parallel():
+    running, peak, overlap = {}, [0], []
+    lock = threading.Lock()
+
+    def apply(changes):
+        rs = changes[0][0].rsplit('/', 2)[0]
+        with lock:
+            if running.get(rs):
+                overlap.append(rs)
+            running[rs] = running.get(rs, 0) + 1
+            peak[0] = max(peak[0], sum(running.values()))
+        time.sleep(0.05)
+        with lock:
+            running[rs] -= 1
+        return {h: True for h, _, _ in changes}
+
+    pipeline = ActuationPipeline(apply, workers=4, max_queue=2)
+    for n in range(3):
+        for rs in (1, 2):
+            pipeline.submit(rs_href(rs), [(rule_href(rs, n), False, {})])
+    results = pipeline.close()
+    assert results == {rule_href(rs, n): True for rs in (1, 2) for n in range(3)}
+    assert overlap == [] and peak[0] == 2
+    assert pipeline.stats['items'] == 6
+
+
+def test_failed_apply_fails_that_item_only():
+    def apply(changes):
+        if changes[0][0].startswith(rs_href(2)):
+            raise RuntimeError('boom')
+        return {h: True for h, _, _ in changes}
+
+    pipeline = ActuationPipeline(apply, workers=2)
+    pipeline.submit(rs_href(1), [(rule_href(1, 10), False, {})])
+    pipeline.submit(rs_href(2), [(rule_href(2, 20), False, {}), (rule_href(2, 21), False, {})])
+    assert pipeline.close() == {rule_href(1, 10): True, rule_href(2, 20): False, rule_href(2, 21): False}
+
+
+def test_pipeline_check_commits_each_ruleset_once(tmp_path):
+    fake = FakePCE()
+    fake.draft[rs_href(3)]['rules'][0]['description'] = 'db\n[⏳ 2020-01-01 00:00]'
+    pce = fake.client(tmp_path, provision_mode='pipeline', pipeline_workers=2, pipeline_queue_size=1)
+    db = ScheduleDB(str(tmp_path / 'rule_schedules.json'))
+    db.load()
+    never = {'type': 'recurring', 'name': 'never', 'days': ['Monday', 'Tuesday', 'Wednesday', 'Thursday',
+             'Friday', 'Saturday', 'Sunday'], 'start': '00:00', 'end': '00:00', 'action': 'allow'}
+    for href in (rule_href(1, 10), rule_href(1, 11), rule_href(2, 20)):
+        db.put(href, dict(never))
+    db.put(rule_href(2, 21), dict(never, action='block'))  # Enabled outside its window: no change
+    db.put(rule_href(3, 30), {'type': 'one_time', 'name': 'old', 'expire_at': '2020-01-01T00:00'})
+
+    engine = ScheduleEngine(db, pce)
+    engine.check(silent=True)
+
+    assert sorted(h['href'] for s in fake.commits() for h in s['rule_sets']) == [rs_href(1), rs_href(2), rs_href(3)]
+    for href in (rule_href(1, 10), rule_href(1, 11), rule_href(2, 20), rule_href(3, 30)):
+        assert not fake.obj(href, active=True)['enabled']
+    assert fake.obj(rule_href(2, 21), active=True)['enabled']
+    assert fake.obj(rule_href(3, 30), active=True)['description'] == 'db'
+    assert rule_href(3, 30) not in db.get_all()
+    assert engine.last_failed == [] and engine.last_pipeline_stats['items'] == 3
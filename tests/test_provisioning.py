@@ -0,0 +1,59 @@
+from tests.fake_pce import FakePCE, rs_href, rule_href
+
+
+def rule_sets(subset):
+    return sorted(r['href'] for r in subset['rule_sets'])
+
+
+def test_toggles_across_rulesets_go_out_in_one_provision(tmp_path):
+    fake = FakePCE()
+    pce = fake.client(tmp_path)
+    items = [(rule_href(1, 10), False, False), (rule_href(1, 11), False, False), (rule_href(3, 30), False, False)]
+    assert pce.toggle_batch(items) == {h: True for h, _, _ in items}
+    assert [rule_sets(s) for s in fake.commits()] == [[rs_href(1), rs_href(3)]]
+    assert fake.commits()[0]['services'] == [{'href': fake.dependency(rs_href(1))},
+                                             {'href': fake.dependency(rs_href(3))}]
+    assert not fake.obj(rule_href(3, 30), active=True)['enabled']
+
+
+def test_failed_batch_commit_falls_back_to_one_commit_per_ruleset(tmp_path):
+    fake = FakePCE()
+    fake.fail_commit = lambda rss: len(rss) > 1 or rss == [rs_href(2)]
+    pce = fake.client(tmp_path)
+    items = [(rule_href(1, 10), False, False), (rule_href(2, 20), False, False),
+             (rule_href(2, 21), False, False), (rule_href(3, 30), False, False)]
+    results = pce.toggle_batch(items)
+    assert [rule_sets(s) for s in fake.commits()] == [
+        [rs_href(1), rs_href(2), rs_href(3)], [rs_href(1)], [rs_href(2)], [rs_href(3)]]
+    # Only the rules of the ruleset whose own commit failed are reported as failed
+    assert results == {rule_href(1, 10): True, rule_href(2, 20): False,
+                       rule_href(2, 21): False, rule_href(3, 30): True}
+    assert fake.obj(rule_href(2, 20), active=True)['enabled']
+    assert not fake.obj(rule_href(3, 30), active=True)['enabled']
+
+
+def test_failed_put_fails_only_that_href(tmp_path):
+    fake = FakePCE()
+    fake.fail_puts.add(rule_href(1, 11))
+    pce = fake.client(tmp_path)
+    items = [(rule_href(1, 10), False, False), (rule_href(1, 11), False, False), (rule_href(2, 20), False, False)]
+    assert pce.toggle_batch(items) == {rule_href(1, 10): True, rule_href(1, 11): False, rule_href(2, 20): True}
+    assert [rule_sets(s) for s in fake.commits()] == [[rs_href(1), rs_href(2)]]
+
+
+def test_chunks_are_committed_separately(tmp_path):
+    fake = FakePCE(rulesets=5)
+    pce = fake.client(tmp_path)
+    assert pce.provision_batch([rs_href(i) for i in range(1, 6)], chunk_size=2) == []
+    assert [rule_sets(s) for s in fake.commits()] == [
+        [rs_href(1), rs_href(2)], [rs_href(3), rs_href(4)], [rs_href(5)]]
+
+
+def test_notes_share_the_toggle_provision(tmp_path):
+    fake = FakePCE()
+    fake.draft[rs_href(2)]['rules'][0]['description'] = 'web\n[⏳ 2030-01-01 08:00]'
+    pce = fake.client(tmp_path)
+    results = pce.toggle_batch([(rule_href(1, 10), False, False)], notes={rule_href(2, 20): ('', True)})
+    assert results == {rule_href(1, 10): True}
+    assert [rule_sets(s) for s in fake.commits()] == [[rs_href(1), rs_href(2)]]
+    assert fake.obj(rule_href(2, 20), active=True)['description'] == 'web'
@@ -0,0 +1,107 @@
+import threading
+import time
+
+from src.core import RateController, parse_retry_after
+
+
+def request(rc, status):
+    rc.acquire()
+    rc.release(status)
+
+
+def test_limit_halves_on_throttling_once_per_interval():
+    rc = RateController(max_concurrency=16, decrease_interval=60)
+    request(rc, 429)
+    assert rc.limit == 8
+    request(rc, 503)  # Same burst of errors: no second cut
+    assert rc.limit == 8
+    rc._last_decrease -= 60
+    request(rc, 500)
+    assert rc.limit == 4
+    assert rc.counters['throttled'] == 2 and rc.counters['server_errors'] == 1 and rc.counters['decreases'] == 2
+
+
+def test_limit_grows_back_additively_and_respects_bounds():
+    rc = RateController(max_concurrency=4, min_concurrency=2, decrease_interval=0)
+    for _ in range(5):
+        request(rc, 429)
+    assert rc.limit == 2
+    for _ in range(2):
+        request(rc, 200)
+    assert 2 < rc.limit < 4
+    for _ in range(50):
+        request(rc, 200)
+    assert rc.limit == 4
+    request(rc, 404)  # A client error says nothing about load
+    assert rc.limit == 4
+
+
+def test_in_flight_never_exceeds_the_limit():
+    rc = RateController(max_concurrency=3)
+    peak, lock = [0], threading.Lock()
+
+    def worker():
+        for _ in range(10):
+            rc.acquire()
+            with lock:
+                peak[0] = max(peak[0], rc.in_flight)
+            time.sleep(0.001)
+            rc.release(200)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert peak[0] <= 3 and rc.in_flight == 0
+
+
+def test_nested_acquire_does_not_deadlock():
+    rc = RateController(max_concurrency=1)
+    rc.acquire()
+    done = threading.Event()
+
+    def inner():
+        rc.acquire()
+        rc.release(200)
+        done.set()
+
+    t = threading.Thread(target=inner)
+    t.start()
+    assert not done.wait(0.05)  # Another thread waits for the slot
+    rc.acquire()                # The holder itself may issue a request while it streams
+    rc.release(200)
+    rc.release(200)
+    assert done.wait(1)
+    t.join()
+
+
+def test_token_bucket_paces_requests():
+    rc = RateController(rps=50, burst=5)
+    started = time.monotonic()
+    for _ in range(15):
+        request(rc, 200)
+    elapsed = time.monotonic() - started
+    assert 0.15 <= elapsed < 1.0  # 5 from the burst, 10 more at 50/s
+
+
+def test_retry_after_pauses_every_caller():
+    rc = RateController(backoff_base=0.01)
+    delay = rc.backoff(0, retry_after=0.2)
+    assert 0.2 <= delay <= 0.21
+    started = time.monotonic()
+    request(rc, 200)
+    assert time.monotonic() - started >= 0.15
+
+
+def test_backoff_is_capped():
+    rc = RateController(backoff_base=1, backoff_cap=4)
+    assert all(0.5 <= rc.backoff(0) <= 1 for _ in range(20))
+    assert all(2 <= rc.backoff(10) <= 4 for _ in range(20))
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('3') == 3.0
+    assert parse_retry_after('-1') == 0.0
+    assert parse_retry_after(None) is None and parse_retry_after('soon') is None
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
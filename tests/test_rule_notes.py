@@ -0,0 +1,48 @@
+from src.core import PCEClient
+from tests.fake_pce import FakePCE, rs_href, rule_href
+
+
+def rule_sets(subset):
+    return sorted(r['href'] for r in subset['rule_sets'])
+
+
+def test_notes_are_put_once_per_changed_rule_and_provisioned_together(tmp_path):
+    fake = FakePCE()
+    fake.draft[rs_href(1)]['rules'][0]['description'] = 'db\n[📅 Mon 09:00-17:00]'
+    fake.draft[rs_href(1)]['rules'][1]['description'] = 'db'
+    fake.draft[rs_href(3)]['rules'][2]['description'] = '[⏳ 2030-01-01 08:00]'
+    pce = fake.client(tmp_path)
+    results = pce.update_rule_notes({rule_href(1, 10): ('', True), rule_href(1, 11): ('', True),
+                                     rule_href(3, 32): ('', True), rule_href(3, 30): ('[📅 Fri]', False)},
+                                    max_workers=4)
+    assert results == dict.fromkeys([rule_href(1, 10), rule_href(1, 11), rule_href(3, 32), rule_href(3, 30)], True)
+    # rule 11 already had no tag: read but not rewritten
+    assert sorted(fake.puts()) == [(rule_href(1, 10), {'description': 'db'}),
+                                   (rule_href(3, 30), {'description': '[📅 Fri]'}),
+                                   (rule_href(3, 32), {'description': ''})]
+    assert [rule_sets(s) for s in fake.commits()] == [[rs_href(1), rs_href(3)]]
+    assert fake.obj(rule_href(1, 10), active=True)['description'] == 'db'
+
+
+def test_unchanged_notes_provision_nothing(tmp_path):
+    fake = FakePCE()
+    pce = fake.client(tmp_path)
+    assert pce.update_rule_notes({rule_href(2, 20): ('', True)}) == {rule_href(2, 20): True}
+    assert fake.puts() == [] and fake.commits() == []
+
+
+def test_failures_are_reported_per_href(tmp_path):
+    fake = FakePCE()
+    fake.fail_puts.add(rule_href(1, 10))
+    fake.fail_commit = lambda rss: rs_href(2) in rss
+    pce = fake.client(tmp_path)
+    notes = {rule_href(1, 10): ('[📅 Mon]', False), rule_href(1, 11): ('[📅 Mon]', False),
+             rule_href(2, 20): ('[📅 Mon]', False), rule_href(9, 90): ('[📅 Mon]', False)}
+    assert pce.update_rule_notes(notes) == {rule_href(1, 10): False, rule_href(1, 11): True,
+                                            rule_href(2, 20): False, rule_href(9, 90): False}
+    assert fake.obj(rule_href(1, 11), active=True)['description'] == '[📅 Mon]'
+
+
+def test_noted_description_replaces_only_the_schedule_tag():
+    assert PCEClient._noted_description('web tier\n[📅 Mon]', '[⏳ 2030-01-01]') == 'web tier\n[⏳ 2030-01-01]'
+    assert PCEClient._noted_description('[⏳ 2030-01-01] web', '', remove=True) == 'web'
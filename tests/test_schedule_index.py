@@ -0,0 +1,117 @@
+import datetime
+import random
+
+import pytest
+
+from src.core import ScheduleIndex
+
+MONDAY = datetime.datetime(2026, 10, 19)
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def recurring(days, start, end, action='allow'):
+    return {'type': 'recurring', 'days': days, 'start': start, 'end': end, 'action': action}
+
+
+def at(day, hhmm):
+    h, m = map(int, hhmm.split(':'))
+    return MONDAY + datetime.timedelta(days=day, hours=h, minutes=m)
+
+
+def expected_in_window(c, now):
+    """Straightforward per-schedule evaluation the bitsets must agree with"""
+    days = {DAYS.index(d) for d in c['days']}
+    start = int(c['start'][:2]) * 60 + int(c['start'][3:])
+    end = int(c['end'][:2]) * 60 + int(c['end'][3:])
+    mod, wd = now.hour * 60 + now.minute, now.weekday()
+    if start <= end:
+        return wd in days and start <= mod < end
+    return (wd in days and mod >= start) or ((wd - 1) % 7 in days and mod < end)
+
+
+def test_window_and_action():
+    idx = ScheduleIndex()
+    idx.rebuild({
+        'allow': recurring(['Monday'], '09:00', '17:00'),
+        'block': recurring(['Monday'], '09:00', '17:00', action='block'),
+    })
+    targets, expired = idx.evaluate(at(0, '10:00'))
+    assert targets == {'allow': True, 'block': False} and expired == []
+    targets, _ = idx.evaluate(at(0, '17:00'))
+    assert targets == {'allow': False, 'block': True}
+    targets, _ = idx.evaluate(at(1, '10:00'))
+    assert targets == {'allow': False, 'block': True}
+
+
+def test_overnight_window_spills_into_next_day():
+    idx = ScheduleIndex()
+    idx.rebuild({'night': recurring(['Sun'], '22:00', '06:00')})
+    assert idx.in_window(at(6, '23:00')) == ['night']
+    assert idx.in_window(at(7, '05:59')) == ['night']   # Monday morning
+    assert idx.in_window(at(7, '06:00')) == []
+    assert idx.in_window(at(1, '05:00')) == []          # Tuesday: Monday night is not scheduled
+
+
+def test_one_time_expiry():
+    idx = ScheduleIndex()
+    idx.rebuild({'once': {'type': 'one_time', 'expire_at': '2026-10-19T12:00'}})
+    assert idx.evaluate(at(0, '11:59')) == ({'once': True}, [])
+    assert idx.evaluate(at(0, '12:01')) == ({}, ['once'])
+    assert idx.expiring_before(at(0, '12:01').timestamp()) == ['once']
+
+
+def test_malformed_schedules_are_flagged_not_evaluated():
+    idx = ScheduleIndex()
+    idx.rebuild({'bad': {'type': 'recurring', 'days': ['Monday'], 'start': '9am'}, 'unknown': {'type': 'x'}})
+    assert idx.invalid == {'bad', 'unknown'}
+    assert idx.evaluate(at(0, '10:00')) == ({}, [])
+
+
+def test_update_and_remove_reuse_slots():
+    idx = ScheduleIndex()
+    idx.rebuild({'a': recurring(['Monday'], '09:00', '10:00'), 'b': recurring(['Monday'], '09:00', '10:00')})
+    idx.remove('a')
+    idx.update('c', recurring(['Tuesday'], '09:00', '10:00'))
+    assert len(idx._hrefs) == 2
+    assert idx.in_window(at(0, '09:30')) == ['b']
+    assert idx.in_window(at(1, '09:30')) == ['c']
+    idx.update('b', recurring(['Monday'], '11:00', '12:00', action='block'))
+    assert idx.evaluate(at(0, '09:30'))[0] == {'b': True, 'c': False}
+
+
+def test_filter_bits():
+    idx = ScheduleIndex()
+    idx.rebuild({
+        'allow': recurring(['Monday'], '09:00', '17:00'),
+        'block': recurring(['Friday'], '09:00', '17:00', action='block'),
+        'once': {'type': 'one_time', 'expire_at': '2030-01-01T00:00'},
+    })
+    def hrefs(**kw):
+        bits = idx.filter_bits(**kw)
+        return sorted(h for h in ('allow', 'block', 'once') if idx.has(bits, h))
+    assert idx.filter_bits() is None
+    assert hrefs(schedule_type='one_time') == ['once']
+    assert hrefs(action='disable') == ['block']
+    assert hrefs(action='allow', day='fri') == []
+    assert hrefs(day='Friday') == ['block']
+    assert hrefs(in_window=True, now=at(0, '10:00')) == ['allow']
+    assert hrefs(in_window=False, now=at(0, '10:00')) == ['block', 'once']
+    with pytest.raises(ValueError):
+        idx.filter_bits(action='toggle')
+
+
+def test_matches_per_schedule_evaluation():
+    rng = random.Random(6)
+    db = {}
+    for i in range(300):
+        start, end = rng.randrange(0, 1440, 15), rng.randrange(0, 1440, 15)
+        db[f'r{i}'] = recurring(rng.sample(DAYS, rng.randint(1, 7)), f'{start // 60:02d}:{start % 60:02d}',
+                                f'{end // 60:02d}:{end % 60:02d}', rng.choice(['allow', 'block']))
+    idx = ScheduleIndex()
+    idx.rebuild(db)
+    for _ in range(200):
+        now = MONDAY + datetime.timedelta(minutes=rng.randrange(7 * 1440))
+        targets, _ = idx.evaluate(now)
+        for href, c in db.items():
+            window = expected_in_window(c, now)
+            assert targets[href] == (window if c['action'] == 'allow' else not window), (href, c, now)
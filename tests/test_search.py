@@ -0,0 +1,68 @@
+from src.core import LabelCache, RulesetRecord, RulesetSearchIndex
+
+
+def make_index(*rulesets):
+    idx, pending, records = RulesetSearchIndex(), {}, []
+    for i, (name, extra) in enumerate(rulesets):
+        raw = dict({'href': f'/orgs/1/sec_policy/draft/rule_sets/{i}', 'name': name, 'updated_at': 'v1'}, **extra)
+        rec = RulesetRecord(raw)
+        records.append(rec)
+        idx.stage(pending, rec, raw)
+    idx.apply(pending, records)
+    return idx, records
+
+
+def names(idx, query, labels=None):
+    return [r.name for r in idx.search(query, labels or LabelCache())]
+
+
+def test_prefix_and_exact_ranking():
+    idx, _ = make_index(('Payroll', {}), ('Pay', {}), ('Orders', {}))
+    assert names(idx, 'pay') == ['Pay', 'Payroll']
+    assert names(idx, 'ord') == ['Orders']
+
+
+def test_substring_inside_a_name():
+    idx, _ = make_index(('Payments backend', {}), ('Orders', {}))
+    assert names(idx, 'yments') == ['Payments backend']
+    assert names(idx, 'nomatch') == []
+
+
+def test_one_and_two_character_queries():
+    idx, _ = make_index(('web-db', {}), ('app_tier', {}), ('Billing', {}))
+    assert names(idx, 'b') == ['Billing', 'web-db']
+    assert names(idx, 'db') == ['web-db']
+    assert names(idx, '-') == ['web-db']
+    assert names(idx, '_t') == ['app_tier']
+    assert names(idx, 'zz') == []
+
+
+def test_words_are_anded_and_descriptions_match():
+    idx, _ = make_index(
+        ('Payroll', {'rules': [{'href': '/r/1', 'description': 'allow gateway'}]}),
+        ('Payments', {}))
+    assert names(idx, 'gateway') == ['Payroll']
+    assert names(idx, 'pay gateway') == ['Payroll']
+
+
+def test_label_filter():
+    labels = LabelCache()
+    labels.replace_collection('/labels', {'/orgs/1/labels/1': 'app:payments'})
+    idx, _ = make_index(('RS-A', {'scopes': [[{'label': {'href': '/orgs/1/labels/1'}}]]}), ('RS-B', {}))
+    assert names(idx, 'app:payments', labels) == ['RS-A']
+    assert names(idx, 'payments', labels) == ['RS-A']
+
+
+def test_refresh_reindexes_only_changed_rulesets():
+    idx, records = make_index(('Alpha', {}), ('Beta', {}))
+    kept = idx._doc_of[records[0].href]
+    pending = {}
+    raw = {'href': records[1].href, 'name': 'Gamma', 'updated_at': 'v2'}
+    rec = RulesetRecord(raw)
+    idx.stage(pending, rec, raw)
+    idx.stage(pending, records[0], {'href': records[0].href, 'name': 'Alpha', 'updated_at': 'v1'})
+    assert list(pending) == [records[1].href]
+    idx.apply(pending, [records[0], rec])
+    assert idx._doc_of[records[0].href] == kept
+    assert names(idx, 'gam') == ['Gamma']
+    assert names(idx, 'beta') == []
@@ -0,0 +1,158 @@
+import datetime
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from src.core import ScheduleDB
+
+BACKENDS = ['json', 'journal', 'sqlite']
+
+RS = '/orgs/1/sec_policy/draft/rule_sets/1'
+
+
+def entry(name, **extra):
+    return dict({'type': 'recurring', 'name': name, 'days': ['Monday'], 'start': '09:00', 'end': '17:00',
+                 'action': 'allow'}, **extra)
+
+
+def open_db(tmp_path, backend, **kw):
+    db = ScheduleDB(str(tmp_path / 'rule_schedules.json'), backend=backend, **kw)
+    db.load()
+    return db
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_changes_survive_reopen(tmp_path, backend):
+    db = open_db(tmp_path, backend)
+    db.put(f'{RS}/sec_rules/1', entry('a'))
+    db.put(f'{RS}/sec_rules/2', entry('b'))
+    db.put(f'{RS}/sec_rules/1', entry('a2'))
+    db.delete(f'{RS}/sec_rules/2')
+    again = open_db(tmp_path, backend)
+    assert again.get_all() == {f'{RS}/sec_rules/1': entry('a2')}
+    assert again.get_schedule_type({'href': RS}) == 2
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_export_import_round_trip(tmp_path, backend):
+    db = open_db(tmp_path, backend)
+    db.put(f'{RS}/sec_rules/1', entry('a'))
+    out = tmp_path / 'export.json'
+    db.export_json(str(out))
+    db.delete(f'{RS}/sec_rules/1')
+    db.import_json(str(out))
+    assert open_db(tmp_path, backend).get_all() == {f'{RS}/sec_rules/1': entry('a')}
+
+
+def test_journal_appends_instead_of_rewriting(tmp_path):
+    db = open_db(tmp_path, 'journal')
+    db.put(f'{RS}/sec_rules/1', entry('a'))
+    db.put(f'{RS}/sec_rules/2', entry('b'))
+    journal = tmp_path / 'rule_schedules.json.journal'
+    assert [json.loads(line)['op'] for line in journal.read_text().splitlines()] == ['put', 'put']
+    assert not (tmp_path / 'rule_schedules.json').exists()
+
+
+def test_journal_torn_tail_is_dropped(tmp_path):
+    db = open_db(tmp_path, 'journal')
+    db.put(f'{RS}/sec_rules/1', entry('a'))
+    journal = tmp_path / 'rule_schedules.json.journal'
+    with open(journal, 'ab') as f:
+        f.write(b'{"op": "put", "href": "/half')
+    again = open_db(tmp_path, 'journal')
+    assert list(again.get_all()) == [f'{RS}/sec_rules/1']
+    again.put(f'{RS}/sec_rules/2', entry('b'))
+    assert len(open_db(tmp_path, 'journal').get_all()) == 2
+
+
+def test_journal_compacts_into_the_snapshot(tmp_path):
+    db = open_db(tmp_path, 'journal', compact_threshold=5)
+    for i in range(12):
+        db.put(f'{RS}/sec_rules/{i}', entry(str(i)))
+    db.storage.wait_for_compaction()
+    snapshot = json.loads((tmp_path / 'rule_schedules.json').read_text())
+    assert len(snapshot) >= 5
+    assert not os.path.exists(db.storage.compacting_path)
+    assert len(open_db(tmp_path, 'journal').get_all()) == 12
+
+
+def test_sqlite_migrates_the_json_file_once(tmp_path):
+    (tmp_path / 'rule_schedules.json').write_text(json.dumps({f'{RS}/sec_rules/1': entry('a')}))
+    db = open_db(tmp_path, 'sqlite')
+    assert db.get_all() == {f'{RS}/sec_rules/1': entry('a')}
+    db.delete(f'{RS}/sec_rules/1')
+    assert open_db(tmp_path, 'sqlite').get_all() == {}
+
+
+def test_sqlite_keeps_one_row_per_schedule(tmp_path):
+    db = open_db(tmp_path, 'sqlite')
+    db.put(f'{RS}/sec_rules/1', entry('a'))
+    db.put(f'{RS}/sec_rules/1', entry('b', type='one_time', expire_at='2030-01-01T08:00'))
+    with sqlite3.connect(str(tmp_path / 'rule_schedules.db')) as conn:
+        rows = conn.execute("SELECT href, data FROM schedules").fetchall()
+    assert [(h, json.loads(d)['name']) for h, d in rows] == [(f'{RS}/sec_rules/1', 'b')]
+
+
+def test_sqlite_drops_the_former_query_columns(tmp_path):
+    with sqlite3.connect(str(tmp_path / 'rule_schedules.db')) as conn:
+        conn.executescript("""
+            CREATE TABLE schedules (href TEXT PRIMARY KEY, ruleset_href TEXT NOT NULL, type TEXT,
+                action TEXT, is_ruleset INTEGER NOT NULL DEFAULT 0, expire_at REAL, data TEXT NOT NULL);
+            CREATE INDEX idx_schedules_type ON schedules (type);
+            CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+            INSERT INTO meta VALUES ('migrated_from_json', 'x');
+        """)
+        for i in (2, 1):
+            conn.execute("INSERT INTO schedules VALUES (?, ?, 'recurring', 'allow', 0, NULL, ?)",
+                         (f'{RS}/sec_rules/{i}', RS, json.dumps(entry(str(i)))))
+    db = open_db(tmp_path, 'sqlite')
+    assert list(db.get_all()) == [f'{RS}/sec_rules/2', f'{RS}/sec_rules/1']
+    db.put(f'{RS}/sec_rules/3', entry('3'))
+    with sqlite3.connect(str(tmp_path / 'rule_schedules.db')) as conn:
+        assert [r[1] for r in conn.execute("PRAGMA table_info(schedules)")] == ['href', 'data']
+    assert len(open_db(tmp_path, 'sqlite').get_all()) == 3
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_instances_see_each_others_writes(tmp_path, backend):
+    a, b = open_db(tmp_path, backend), open_db(tmp_path, backend)
+    a.put(f'{RS}/sec_rules/1', entry('a'))
+    b.put(f'{RS}/sec_rules/2', entry('b'))  # Reloads a's write first instead of overwriting it
+    assert sorted(a.get_all()) == sorted(b.get_all()) == [f'{RS}/sec_rules/1', f'{RS}/sec_rules/2']
+    a.delete(f'{RS}/sec_rules/2')
+    assert list(b.get_all()) == [f'{RS}/sec_rules/1']
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_concurrent_writers_lose_nothing(tmp_path, backend):
+    path = str(tmp_path / 'rule_schedules.json')
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = (f"import sys; sys.path.insert(0, {root!r})\n"
+            "from src.core import ScheduleDB\n"
+            f"db = ScheduleDB({path!r}, backend={backend!r}, compact_threshold=7)\n"
+            "for i in range(25):\n"
+            f"    db.put('{RS}/sec_rules/' + sys.argv[1] + '-' + str(i), {{'type': 'one_time', 'expire_at': '2030-01-01T00:00'}})\n"
+            "db.storage.wait_for_compaction() if hasattr(db.storage, 'wait_for_compaction') else None\n")
+    procs = [subprocess.Popen([sys.executable, '-c', code, str(n)]) for n in range(3)]
+    db = open_db(tmp_path, backend)
+    threads = [threading.Thread(target=lambda n=n: [db.put(f'{RS}/sec_rules/t{n}-{i}', entry('t')) for i in range(25)])
+               for n in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert all(p.wait(60) == 0 for p in procs)
+    assert len(open_db(tmp_path, backend).get_all()) == 150
+
+
+def test_evaluate_returns_the_snapshot_it_evaluated(tmp_path):
+    db = open_db(tmp_path, 'json')
+    db.put(f'{RS}/sec_rules/1', entry('a'))
+    snapshot, targets, expired = db.evaluate(datetime.datetime(2024, 1, 1, 10, 0))  # a Monday
+    db.put(f'{RS}/sec_rules/2', entry('b'))
+    assert set(snapshot) == set(targets) | set(expired) == {f'{RS}/sec_rules/1'}
@@ -0,0 +1,98 @@
+import datetime
+
+from src.core import ScheduleEngine, TransitionScheduler, parse_expire_at
+
+MONDAY = datetime.datetime(2026, 10, 19)
+
+
+def at(day, hhmm):
+    h, m = map(int, hhmm.split(':'))
+    return MONDAY + datetime.timedelta(days=day, hours=h, minutes=m)
+
+
+def recurring(days, start, end):
+    return {'type': 'recurring', 'days': days, 'start': start, 'end': end, 'action': 'allow'}
+
+
+def test_next_transition_within_a_day():
+    c = recurring(['Monday', 'Wednesday'], '09:00', '17:00')
+    assert ScheduleEngine.next_transition(c, at(0, '08:00')) == at(0, '09:00')
+    assert ScheduleEngine.next_transition(c, at(0, '09:00')) == at(0, '17:00')  # Strictly after
+    assert ScheduleEngine.next_transition(c, at(0, '17:00')) == at(2, '09:00')
+    assert ScheduleEngine.next_transition(c, at(2, '18:00')) == at(7, '09:00')  # Next week
+
+
+def test_next_transition_overnight():
+    c = recurring(['Sunday'], '22:00', '06:00')
+    assert ScheduleEngine.next_transition(c, at(6, '12:00')) == at(6, '22:00')
+    assert ScheduleEngine.next_transition(c, at(6, '23:00')) == at(7, '06:00')
+    # Monday morning, window opened on Sunday (yesterday) is still closing
+    assert ScheduleEngine.next_transition(c, at(0, '01:00')) == at(0, '06:00')
+
+
+def test_next_transition_one_time_and_invalid():
+    once = {'type': 'one_time', 'expire_at': '2026-10-19T12:00'}
+    assert ScheduleEngine.next_transition(once, at(0, '11:00')) == at(0, '12:00')
+    assert ScheduleEngine.next_transition(once, at(0, '12:00')) is None
+    assert ScheduleEngine.next_transition(recurring(['Monday'], '09:00', '09:00'), MONDAY) is None
+    assert ScheduleEngine.next_transition(recurring([], '09:00', '10:00'), MONDAY) is None
+    assert ScheduleEngine.next_transition({'type': 'recurring', 'days': ['Monday']}, MONDAY) is None
+
+
+def test_previous_transition():
+    c = recurring(['Monday'], '09:00', '17:00')
+    assert ScheduleEngine.previous_transition(c, at(0, '10:00')) == at(0, '09:00')
+    assert ScheduleEngine.previous_transition(c, at(0, '17:00')) == at(0, '17:00')
+    assert ScheduleEngine.previous_transition(c, at(3, '10:00')) == at(0, '17:00')
+
+
+def test_expire_at_is_wall_clock_time():
+    assert parse_expire_at('2026-10-19T12:00') == at(0, '12:00')
+    assert parse_expire_at('2026-10-19T12:00:00Z') == at(0, '12:00')
+    assert parse_expire_at('2026-10-19T12:00:00+08:00') == at(0, '12:00')
+
+
+def test_scheduler_pops_due_edges_in_order():
+    s = TransitionScheduler()
+    s.rebuild({'a': recurring(['Monday'], '09:00', '17:00'),
+               'b': recurring(['Monday'], '08:00', '09:00'),
+               'c': {'type': 'one_time', 'expire_at': '2026-10-19T08:30'}}, at(0, '07:00'))
+    assert s.next_edge() == at(0, '08:00')
+    assert s.pop_due(at(0, '07:59')) == []
+    assert s.pop_due(at(0, '09:00')) == ['b', 'c', 'a']
+    assert s.pop_due(at(0, '09:00')) == []
+
+
+def test_edge_passing_during_a_check_stays_due():
+    s = TransitionScheduler()
+    db = {'a': recurring(['Monday'], '09:00', '17:00')}
+    # The last check covered up to 08:59:59; the 09:00 edge passed while it ran
+    s.rebuild(db, at(0, '08:59'))
+    assert s.pop_due(at(0, '09:01')) == ['a']
+
+
+def test_failed_schedules_are_retried_with_backoff_then_given_up():
+    s = TransitionScheduler()
+    db = {'a': recurring(['Monday'], '09:00', '17:00')}
+    now = at(0, '09:00')
+    s.settle(['a'], ['a'], now)
+    assert s.next_edge() == now + datetime.timedelta(seconds=15)
+    s.rebuild(db, now)  # Retries outlive a rebuild
+    assert s.pop_due(now + datetime.timedelta(seconds=15)) == ['a']
+    s.settle(['a'], ['a'], now)
+    assert s._retries['a'] == (now + datetime.timedelta(seconds=30), 2)
+    s.settle(['a'], [], now)
+    assert 'a' not in s._retries
+    for _ in range(TransitionScheduler.RETRY_LIMIT + 1):
+        s.retry(['a'], now)
+    assert 'a' not in s._retries
+
+
+def test_full_check_clears_retries_and_rebuild_drops_deleted():
+    s = TransitionScheduler()
+    now = at(0, '09:00')
+    s.retry(['a', 'b'], now)
+    s.settle(None, ['b'], now)
+    assert set(s._retries) == {'b'}
+    s.rebuild({}, now)
+    assert s._retries == {} and s.next_edge() is None